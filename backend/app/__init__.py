@@ -2,6 +2,7 @@
 Flask 应用工厂函数
 """
 
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -32,6 +33,11 @@ def create_app(config_name=None):
     config_class = get_config(config_name)
     app.config.from_object(config_class)
 
+    # 选择 JSON 编码器
+    from app.utils.json_provider import create_json_provider
+
+    app.json = create_json_provider(app)
+
     # 初始化扩展
     db.init_app(app)
     migrate.init_app(app, db)
@@ -67,7 +73,15 @@ def create_app(config_name=None):
 
 def register_blueprints(app):
     """注册蓝图"""
-    from app.routes import auth_bp, packages_bp, tasks_bp, metrics_bp, data_bp, admin_bp
+    from app.routes import (
+        auth_bp,
+        packages_bp,
+        tasks_bp,
+        metrics_bp,
+        data_bp,
+        admin_bp,
+        batch_bp,
+    )
 
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(packages_bp, url_prefix="/api/packages")
@@ -75,6 +89,7 @@ def register_blueprints(app):
     app.register_blueprint(metrics_bp, url_prefix="/api/metrics")
     app.register_blueprint(data_bp, url_prefix="/api/data")
     app.register_blueprint(admin_bp, url_prefix="/api/admin")
+    app.register_blueprint(batch_bp, url_prefix="/api/batch")
 
 
 def register_error_handlers(app):
@@ -122,3 +137,75 @@ def register_commands(app):
         db.session.commit()
 
         print("✅ 测试数据添加成功！")
+
+    @app.cli.command()
+    @click.option("--start", "start_date", help="开始日期 YYYY-MM-DD（默认今天）")
+    @click.option("--end", "end_date", help="结束日期 YYYY-MM-DD（默认今天）")
+    def rollup_metrics(start_date, end_date):
+        """重建指定日期区间的每日指标汇总"""
+        from datetime import date
+        from app.models import MetricsSummary, DailyPackageMetrics
+        from app.utils.cache import invalidate
+        from app.utils.date_range import business_today
+
+        today = business_today()
+        start = date.fromisoformat(start_date) if start_date else today
+        end = date.fromisoformat(end_date) if end_date else today
+
+        days = MetricsSummary.rebuild_range(start, end)
+        DailyPackageMetrics.rebuild_range(start, end)
+        db.session.commit()
+        invalidate("metrics")
+
+        print(f"✅ 已重建 {days} 天的指标汇总: {start} ~ {end}")
+
+    @app.cli.command()
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--chunk-size", default=None, type=int, help="每批写入的行数")
+    @click.option("--cost-per-lead", default=0.0, help="登记表未填写单价时使用的单价")
+    @click.option("--no-resume", is_flag=True, help="忽略断点，从头导入")
+    def import_packages(path, chunk_size, cost_per_lead, no_resume):
+        """从 CSV/XLSX 登记表导入数据包（可断点续传）"""
+        from app.utils.cache import invalidate
+        from app.utils.package_import import import_file
+
+        result = import_file(
+            path,
+            chunk_size=chunk_size or app.config["PACKAGE_IMPORT_CHUNK_SIZE"],
+            default_cost_per_lead=cost_per_lead,
+            resume=not no_resume,
+        )
+        invalidate("packages")
+
+        if result["resumed_from"]:
+            print(f"⏩ 从第 {result['resumed_from']} 行之后继续")
+        print(
+            f"✅ 导入完成: 成功 {result['inserted']}，跳过 {result['skipped']}，"
+            f"失败 {result['failed']}，共 {result['total']} 行"
+        )
+        if result["error_path"]:
+            print(f"📝 被拒绝的行: {result['error_path']}")
+
+    @app.cli.command()
+    @click.option(
+        "--interval", default=0, help="循环生成的间隔秒数（0 表示只生成一次）"
+    )
+    def build_widget_snapshot(interval):
+        """生成 Widget 数据快照"""
+        import time
+        from app.routes.data import WIDGET_BUILDERS
+        from app.utils import widget_snapshot
+
+        path = app.config.get("WIDGET_SNAPSHOT_PATH")
+        if not path:
+            print("❌ 未设置 WIDGET_SNAPSHOT_PATH")
+            return
+
+        while True:
+            widget_snapshot.build(path, WIDGET_BUILDERS)
+            db.session.remove()
+            print(f"✅ Widget 快照已生成: {path}")
+
+            if interval <= 0:
+                break
+            time.sleep(interval)
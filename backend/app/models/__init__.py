@@ -9,6 +9,7 @@ from .call import Call
 from .call_tag import CallTag
 from .package_tag_summary import PackageTagSummary
 from .metrics_summary import MetricsSummary
+from .daily_package_metrics import DailyPackageMetrics, DailyPackageTagMetrics
 
 __all__ = [
     "User",
@@ -18,4 +19,6 @@ __all__ = [
     "CallTag",
     "PackageTagSummary",
     "MetricsSummary",
+    "DailyPackageMetrics",
+    "DailyPackageTagMetrics",
 ]
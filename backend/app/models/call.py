@@ -5,6 +5,9 @@
 from datetime import datetime
 from app import db
 
+# 批量加载标签时每条 IN 查询包含的通话数量
+TAG_LOAD_BATCH_SIZE = 500
+
 
 class Call(db.Model):
     """通话记录表"""
@@ -50,6 +53,12 @@ class Call(db.Model):
         comment="更新时间",
     )
 
+    # 索引：按任务查询通话、按时间范围统计通话结果
+    __table_args__ = (
+        db.Index("ix_calls_task_id_call_time", "task_id", "call_time"),
+        db.Index("ix_calls_call_time_result", "call_time", "result"),
+    )
+
     # 关系：一个通话有多个标签
     tags = db.relationship(
         "CallTag", backref="call", lazy="dynamic", cascade="all, delete-orphan"
@@ -58,8 +67,16 @@ class Call(db.Model):
     def __repr__(self):
         return f"<Call {self.phone_number} at {self.call_time}>"
 
-    def to_dict(self):
-        """转换为字典"""
+    def to_dict(self, tags=None):
+        """
+        转换为字典
+
+        Args:
+            tags: 预先加载好的标签列表，为空时按关系查询本通话的标签
+        """
+        if tags is None:
+            tags = self.tags
+
         return {
             "id": self.id,
             "task_id": self.task_id,
@@ -70,11 +87,37 @@ class Call(db.Model):
             "notes": self.notes,
             "customer_name": self.customer_name,
             "company": self.company,
-            "tags": [tag.to_dict() for tag in self.tags],
+            "tags": [tag.to_dict() for tag in tags],
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
 
+    @staticmethod
+    def to_dict_many(calls):
+        """
+        批量转换为字典
+
+        整页通话的标签通过一条 IN 查询加载（selectin 方式），
+        再在内存中按 call_id 分组组装，避免每条通话各查询一次标签。
+        """
+        from app.models.call_tag import CallTag
+
+        calls = list(calls)
+        tags_by_call = {call.id: [] for call in calls}
+        call_ids = list(tags_by_call)
+
+        for i in range(0, len(call_ids), TAG_LOAD_BATCH_SIZE):
+            chunk = call_ids[i : i + TAG_LOAD_BATCH_SIZE]
+            tags = (
+                CallTag.query.filter(CallTag.call_id.in_(chunk))
+                .order_by(CallTag.id)
+                .all()
+            )
+            for tag in tags:
+                tags_by_call[tag.call_id].append(tag)
+
+        return [call.to_dict(tags=tags_by_call[call.id]) for call in calls]
+
     @property
     def is_connected(self):
         """是否接通"""
@@ -34,6 +34,11 @@ class CallTag(db.Model):
     # 时间戳
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment="创建时间")
 
+    # 索引：按通话关联标签并按标签名称和值分组统计
+    __table_args__ = (
+        db.Index("ix_call_tags_call_id_tag", "call_id", "tag_name", "tag_value"),
+    )
+
     def __repr__(self):
         return f"<CallTag {self.tag_name}: {self.tag_value}>"
 
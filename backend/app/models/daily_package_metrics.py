@@ -0,0 +1,382 @@
+"""
+数据包每日指标模型（按日期 × 数据包汇总的事实表）
+"""
+
+from datetime import datetime
+from app import db
+
+# 支持汇总的维度（package 以外的维度均为 LeadPackage 的同名列）
+ROLLUP_DIMENSIONS = ("package", "source", "industry", "region")
+
+
+def _rollup_query(model, dimension, start_date, end_date, by_date, *columns):
+    """按维度（和日期）分组汇总 model 的查询，model 为按日期 × 数据包汇总的表"""
+    from .lead_package import LeadPackage
+
+    if dimension == "package":
+        key = model.package_id
+    else:
+        key = getattr(LeadPackage, dimension)
+
+    group_by = [key]
+    if by_date:
+        group_by.append(model.date)
+
+    query = (
+        db.session.query(*group_by, *columns)
+        .join(LeadPackage, LeadPackage.id == model.package_id)
+        .group_by(*group_by)
+        .order_by(*group_by)
+    )
+
+    if start_date:
+        query = query.filter(model.date >= start_date)
+    if end_date:
+        query = query.filter(model.date <= end_date)
+
+    return query
+
+
+class DailyPackageMetrics(db.Model):
+    """数据包每日指标表"""
+
+    __tablename__ = "daily_package_metrics"
+
+    # 主键
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+
+    # 维度：日期 × 数据包
+    date = db.Column(db.Date, nullable=False, comment="汇总日期（业务时区）")
+    package_id = db.Column(
+        db.Integer,
+        db.ForeignKey("lead_packages.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="数据包 ID",
+    )
+
+    # 通话指标
+    total_calls = db.Column(db.Integer, default=0, comment="总拨打次数")
+    connected_calls = db.Column(db.Integer, default=0, comment="接通次数")
+    total_duration = db.Column(db.Integer, default=0, comment="总通话时长（秒）")
+    interested_calls = db.Column(db.Integer, default=0, comment="意向客户数")
+
+    # 时间戳
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment="创建时间")
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        comment="更新时间",
+    )
+
+    # 唯一约束：同一数据包每天只有一条记录
+    __table_args__ = (
+        db.UniqueConstraint("date", "package_id", name="uix_daily_package"),
+        db.Index("ix_daily_package_metrics_package_id", "package_id"),
+    )
+
+    def __repr__(self):
+        return f"<DailyPackageMetrics {self.date} package={self.package_id}>"
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "date": self.date.isoformat() if self.date else None,
+            "package_id": self.package_id,
+            "total_calls": self.total_calls,
+            "connected_calls": self.connected_calls,
+            "total_duration": self.total_duration,
+            "interested_calls": self.interested_calls,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    @staticmethod
+    def record_calls(
+        day,
+        package_id,
+        total_calls=0,
+        connected_calls=0,
+        total_duration=0,
+        interested_calls=0,
+        tag_counts=None,
+    ):
+        """
+        增量累加某个数据包某天的指标
+
+        在写入通话记录的同一事务中调用，每张表一条 INSERT ... ON CONFLICT 语句。
+
+        Args:
+            tag_counts: {tag_name: 新增标签数}
+        """
+        from app.utils.upsert import upsert_increment
+
+        upsert_increment(
+            DailyPackageMetrics,
+            [
+                {
+                    "date": day,
+                    "package_id": package_id,
+                    "total_calls": total_calls,
+                    "connected_calls": connected_calls,
+                    "total_duration": total_duration,
+                    "interested_calls": interested_calls,
+                }
+            ],
+            ["date", "package_id"],
+            ["total_calls", "connected_calls", "total_duration", "interested_calls"],
+        )
+
+        if tag_counts:
+            upsert_increment(
+                DailyPackageTagMetrics,
+                [
+                    {
+                        "date": day,
+                        "package_id": package_id,
+                        "tag_name": tag_name,
+                        "tag_count": count,
+                    }
+                    for tag_name, count in tag_counts.items()
+                ],
+                ["date", "package_id", "tag_name"],
+                ["tag_count"],
+            )
+
+    @staticmethod
+    def rebuild_range(start_date, end_date):
+        """
+        重建 [start_date, end_date]（含两端）的数据包每日指标
+
+        先删除区间内的记录，再用按 (业务日期, 数据包) GROUP BY 的聚合结果批量插入。
+        调用方负责提交事务。
+        """
+        from .call import Call
+        from .call_tag import CallTag
+        from .dial_task import DialTask
+        from app.utils.date_range import (
+            business_date_expr,
+            date_range,
+            filter_range,
+            parse_sql_date,
+        )
+
+        start, end = date_range(start_date, end_date)
+
+        for model in (DailyPackageMetrics, DailyPackageTagMetrics):
+            db.session.query(model).filter(
+                model.date >= start_date, model.date <= end_date
+            ).delete(synchronize_session=False)
+
+        call_day = business_date_expr(Call.call_time)
+
+        # 意向通话：带有 interest_level = high 标签的通话
+        interested = (
+            db.session.query(CallTag.call_id)
+            .filter(CallTag.tag_name == "interest_level", CallTag.tag_value == "high")
+            .distinct()
+            .subquery()
+        )
+
+        call_rows = (
+            db.session.query(
+                call_day,
+                DialTask.package_id,
+                db.func.count(Call.id),
+                db.func.sum(db.case((Call.result == "connected", 1), else_=0)),
+                db.func.coalesce(db.func.sum(Call.duration), 0),
+                db.func.count(interested.c.call_id),
+            )
+            .join(DialTask, DialTask.id == Call.task_id)
+            .outerjoin(interested, interested.c.call_id == Call.id)
+            .filter(*filter_range(Call.call_time, start, end))
+            .group_by(call_day, DialTask.package_id)
+            .all()
+        )
+
+        tag_rows = (
+            db.session.query(
+                call_day,
+                DialTask.package_id,
+                CallTag.tag_name,
+                db.func.count(CallTag.id),
+            )
+            .join(Call, Call.id == CallTag.call_id)
+            .join(DialTask, DialTask.id == Call.task_id)
+            .filter(*filter_range(Call.call_time, start, end))
+            .group_by(call_day, DialTask.package_id, CallTag.tag_name)
+            .all()
+        )
+
+        if call_rows:
+            db.session.execute(
+                db.insert(DailyPackageMetrics),
+                [
+                    {
+                        "date": parse_sql_date(day),
+                        "package_id": package_id,
+                        "total_calls": calls,
+                        "connected_calls": int(connected),
+                        "total_duration": int(duration),
+                        "interested_calls": interested_count,
+                    }
+                    for day, package_id, calls, connected, duration, interested_count in call_rows
+                ],
+            )
+
+        if tag_rows:
+            db.session.execute(
+                db.insert(DailyPackageTagMetrics),
+                [
+                    {
+                        "date": parse_sql_date(day),
+                        "package_id": package_id,
+                        "tag_name": tag_name,
+                        "tag_count": count,
+                    }
+                    for day, package_id, tag_name, count in tag_rows
+                ],
+            )
+
+        return len(call_rows)
+
+    @staticmethod
+    def rollup(dimension, start_date=None, end_date=None, by_date=False, tags=False):
+        """
+        按维度汇总每日指标
+
+        Args:
+            dimension: 汇总维度 package/source/industry/region
+            start_date, end_date: 业务日期区间（含两端），为空表示不限制
+            by_date: 是否同时按日期分组（用于趋势）
+            tags: 是否同时返回标签统计（来自数据包每日标签统计表）
+
+        Returns:
+            [{"key": 维度值, "date": 日期(by_date 时), "total_calls": ...,
+              "tags": {标签名称: 次数}(tags 时), ...}]
+        """
+        if dimension not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"不支持的汇总维度: {dimension}")
+
+        query = _rollup_query(
+            DailyPackageMetrics,
+            dimension,
+            start_date,
+            end_date,
+            by_date,
+            db.func.sum(DailyPackageMetrics.total_calls),
+            db.func.sum(DailyPackageMetrics.connected_calls),
+            db.func.sum(DailyPackageMetrics.total_duration),
+            db.func.sum(DailyPackageMetrics.interested_calls),
+        )
+
+        results = []
+        for row in query.all():
+            calls, connected, duration, interested = (int(v or 0) for v in row[-4:])
+            item = {
+                "key": row[0],
+                "total_calls": calls,
+                "connected_calls": connected,
+                "total_duration": duration,
+                "interested_calls": interested,
+                "contact_rate": connected / calls if calls > 0 else 0.0,
+                "interest_rate": interested / connected if connected > 0 else 0.0,
+            }
+            if by_date:
+                item["date"] = row[1].isoformat()
+            results.append(item)
+
+        if tags:
+            tag_counts = DailyPackageTagMetrics.rollup(
+                dimension, start_date, end_date, by_date
+            )
+            for item in results:
+                item["tags"] = tag_counts.get((item["key"], item.get("date")), {})
+
+        return results
+
+
+class DailyPackageTagMetrics(db.Model):
+    """数据包每日标签统计表"""
+
+    __tablename__ = "daily_package_tag_metrics"
+
+    # 主键
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+
+    # 维度：日期 × 数据包 × 标签名称
+    date = db.Column(db.Date, nullable=False, comment="汇总日期（业务时区）")
+    package_id = db.Column(
+        db.Integer,
+        db.ForeignKey("lead_packages.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="数据包 ID",
+    )
+    tag_name = db.Column(db.String(100), nullable=False, comment="标签名称")
+
+    # 标签统计
+    tag_count = db.Column(db.Integer, default=0, comment="标签出现次数")
+
+    # 时间戳
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment="创建时间")
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        comment="更新时间",
+    )
+
+    # 唯一约束：同一数据包同一天的同一标签只有一条记录
+    __table_args__ = (
+        db.UniqueConstraint(
+            "date", "package_id", "tag_name", name="uix_daily_package_tag"
+        ),
+        db.Index("ix_daily_package_tag_metrics_package_id", "package_id"),
+    )
+
+    def __repr__(self):
+        return f"<DailyPackageTagMetrics {self.date} {self.tag_name}: {self.tag_count}>"
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "date": self.date.isoformat() if self.date else None,
+            "package_id": self.package_id,
+            "tag_name": self.tag_name,
+            "tag_count": self.tag_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    @staticmethod
+    def rollup(dimension, start_date=None, end_date=None, by_date=False):
+        """
+        按维度汇总标签统计，参数同 DailyPackageMetrics.rollup
+
+        Returns:
+            {(维度值, 日期字符串或 None): {标签名称: 次数}}，次数为 0 的标签不返回
+        """
+        if dimension not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"不支持的汇总维度: {dimension}")
+
+        query = _rollup_query(
+            DailyPackageTagMetrics,
+            dimension,
+            start_date,
+            end_date,
+            by_date,
+            DailyPackageTagMetrics.tag_name,
+            db.func.sum(DailyPackageTagMetrics.tag_count),
+        ).group_by(DailyPackageTagMetrics.tag_name)
+
+        results = {}
+        for row in query.all():
+            tag_name, count = row[-2], int(row[-1] or 0)
+            if count <= 0:
+                continue
+            key = (row[0], row[1].isoformat() if by_date else None)
+            results.setdefault(key, {})[tag_name] = count
+
+        return results
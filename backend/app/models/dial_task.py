@@ -51,6 +51,12 @@ class DialTask(db.Model):
         comment="更新时间",
     )
 
+    # 索引：按数据包和状态查询任务、按开始时间范围统计
+    __table_args__ = (
+        db.Index("ix_dial_tasks_package_id_status", "package_id", "status"),
+        db.Index("ix_dial_tasks_start_time", "start_time"),
+    )
+
     # 关系：一个任务有多个通话记录
     calls = db.relationship(
         "Call", backref="task", lazy="dynamic", cascade="all, delete-orphan"
@@ -77,20 +83,62 @@ class DialTask(db.Model):
         }
 
     def calculate_metrics(self):
-        """计算任务指标"""
+        """
+        全量重算任务指标（修复用）
+
+        日常写入通过 increment_counters 增量维护计数器，
+        只有在计数器可能失准时（如手工改库、历史数据）才需要调用本方法。
+        """
+        from app.models.call import Call
+        from app.models.call_tag import CallTag
+
         # 统计通话记录
-        self.total_calls = self.calls.count()
-        self.connected_calls = self.calls.filter_by(result="connected").count()
+        self.total_calls, self.connected_calls = (
+            db.session.query(
+                db.func.count(Call.id),
+                db.func.coalesce(
+                    db.func.sum(db.case((Call.result == "connected", 1), else_=0)), 0
+                ),
+            )
+            .filter(Call.task_id == self.id)
+            .one()
+        )
 
         # 统计意向客户（通过标签）
-        interested = 0
-        for call in self.calls:
-            if any(
-                tag.tag_name == "interest_level" and tag.tag_value == "high"
-                for tag in call.tags
-            ):
-                interested += 1
-        self.interested_calls = interested
+        self.interested_calls = (
+            db.session.query(db.func.count(db.distinct(CallTag.call_id)))
+            .join(Call, Call.id == CallTag.call_id)
+            .filter(
+                Call.task_id == self.id,
+                CallTag.tag_name == "interest_level",
+                CallTag.tag_value == "high",
+            )
+            .scalar()
+        )
+
+    @staticmethod
+    def increment_counters(
+        task_id, total_calls=0, connected_calls=0, interested_calls=0
+    ):
+        """
+        原子递增任务计数器
+
+        生成 UPDATE ... SET x = x + n，与通话记录在同一事务中提交，
+        不读取任何通话记录。
+        """
+        db.session.query(DialTask).filter(DialTask.id == task_id).update(
+            {
+                DialTask.total_calls: db.func.coalesce(DialTask.total_calls, 0)
+                + total_calls,
+                DialTask.connected_calls: db.func.coalesce(DialTask.connected_calls, 0)
+                + connected_calls,
+                DialTask.interested_calls: db.func.coalesce(
+                    DialTask.interested_calls, 0
+                )
+                + interested_calls,
+            },
+            synchronize_session=False,
+        )
 
     @property
     def contact_rate(self):
@@ -5,6 +5,9 @@
 from datetime import datetime
 from app import db
 
+# 批量统计时每条 IN 查询包含的数据包数量
+STATISTICS_BATCH_SIZE = 500
+
 
 class LeadPackage(db.Model):
     """线索数据包表"""
@@ -26,6 +29,9 @@ class LeadPackage(db.Model):
     contact_rate = db.Column(db.Float, default=0.0, comment="接通率 (0-1)")
     interest_rate = db.Column(db.Float, default=0.0, comment="意向率 (0-1)")
 
+    # 标签总数（标签汇总占比的分母，随标签写入增量维护）
+    tag_total = db.Column(db.Integer, default=0, comment="标签总数")
+
     # 成本相关
     cost_per_lead = db.Column(db.Float, default=0.0, comment="单条线索成本")
     total_cost = db.Column(db.Float, default=0.0, comment="总成本")
@@ -39,6 +45,12 @@ class LeadPackage(db.Model):
         comment="更新时间",
     )
 
+    # 索引：按行业过滤并按创建时间排序、按 (created_at, id) 游标分页
+    __table_args__ = (
+        db.Index("ix_lead_packages_industry_created_at", "industry", "created_at"),
+        db.Index("ix_lead_packages_created_at_id", "created_at", "id"),
+    )
+
     # 关系：一个数据包有多个外呼任务
     dial_tasks = db.relationship(
         "DialTask", backref="package", lazy="dynamic", cascade="all, delete-orphan"
@@ -73,7 +85,7 @@ class LeadPackage(db.Model):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
 
-    def calculate_metrics(self):
+    def calculate_metrics(self, call_stats=None):
         """
         计算数据包指标
 
@@ -81,30 +93,22 @@ class LeadPackage(db.Model):
         - 如果有实际通话记录，从通话记录中动态计算
         - 接通率 = 接通数量 / 外呼数量
         - 接通判断：result == 'connected' 或 duration > 0
+
+        Args:
+            call_stats: 预先批量查询好的通话统计（见 get_call_statistics_batch），
+                        为空时单独查询本数据包
         """
         # 计算总成本
         if self.cost_per_lead > 0:
             self.total_cost = self.total_leads * self.cost_per_lead
 
-        # 从实际通话记录计算接通率
-        from app.models.call import Call
-
-        # 获取该数据包下所有任务的所有通话记录
-        total_calls = 0
-        connected_calls = 0
-
-        for task in self.dial_tasks:
-            task_calls = Call.query.filter_by(task_id=task.id).all()
-            total_calls += len(task_calls)
-
-            # 统计接通数：result='connected' 或 duration > 0
-            for call in task_calls:
-                if call.result == "connected" or (call.duration and call.duration > 0):
-                    connected_calls += 1
+        # 从实际通话记录计算接通率（单条聚合查询，不加载通话记录）
+        if call_stats is None:
+            call_stats = self.get_call_statistics()
 
         # 计算接通率
-        if total_calls > 0:
-            self.contact_rate = connected_calls / total_calls
+        if call_stats["has_call_data"]:
+            self.contact_rate = call_stats["contact_rate"]
         else:
             # 如果没有通话记录，保持原值或默认值
             # 这适用于刚导入的历史数据，还没有实际通话
@@ -125,24 +129,76 @@ class LeadPackage(db.Model):
             'has_call_data': 是否有通话记录
         }
         """
-        from app.models.call import Call
+        if self.id is None:
+            return build_call_statistics(0, 0)
 
-        total_calls = 0
-        connected_calls = 0
+        stats = LeadPackage.get_call_statistics_batch([self.id])
+        return stats.get(self.id) or build_call_statistics(0, 0)
 
-        for task in self.dial_tasks:
-            task_calls = Call.query.filter_by(task_id=task.id).all()
-            total_calls += len(task_calls)
+    @classmethod
+    def get_call_statistics_batch(cls, package_ids=None):
+        """
+        批量获取通话统计信息（只读，不修改数据库）
 
-            for call in task_calls:
-                if call.result == "connected" or (call.duration and call.duration > 0):
-                    connected_calls += 1
+        通过 lead_packages LEFT JOIN dial_tasks LEFT JOIN calls 的
+        GROUP BY 聚合一次完成，不加载任何 Call 对象。
 
-        contact_rate = (connected_calls / total_calls) if total_calls > 0 else 0.0
+        Args:
+            package_ids: 数据包 ID 列表，为空时统计所有数据包
+
+        返回：
+        {
+            package_id: {
+                'total_calls': 外呼总数,
+                'connected_calls': 接通数量,
+                'contact_rate': 接通率,
+                'has_call_data': 是否有通话记录
+            },
+            ...
+        }
+        """
+        from app.models.call import Call
+        from app.models.dial_task import DialTask
+
+        # 接通判断：result == 'connected' 或 duration > 0
+        connected = db.case(
+            (db.or_(Call.result == "connected", Call.duration > 0), 1), else_=0
+        )
+
+        query = (
+            db.session.query(
+                cls.id,
+                db.func.count(Call.id),
+                db.func.coalesce(db.func.sum(connected), 0),
+            )
+            .outerjoin(DialTask, DialTask.package_id == cls.id)
+            .outerjoin(Call, Call.task_id == DialTask.id)
+            .group_by(cls.id)
+        )
+
+        if package_ids is None:
+            rows = query.all()
+        else:
+            # 分批 IN 查询，避免超出数据库参数数量限制
+            package_ids = list(package_ids)
+            rows = []
+            for i in range(0, len(package_ids), STATISTICS_BATCH_SIZE):
+                chunk = package_ids[i : i + STATISTICS_BATCH_SIZE]
+                rows.extend(query.filter(cls.id.in_(chunk)).all())
 
         return {
-            "total_calls": total_calls,
-            "connected_calls": connected_calls,
-            "contact_rate": contact_rate,
-            "has_call_data": total_calls > 0,
+            package_id: build_call_statistics(total_calls, int(connected_calls))
+            for package_id, total_calls, connected_calls in rows
         }
+
+
+def build_call_statistics(total_calls, connected_calls):
+    """根据外呼数量和接通数量构造通话统计字典"""
+    contact_rate = (connected_calls / total_calls) if total_calls > 0 else 0.0
+
+    return {
+        "total_calls": total_calls,
+        "connected_calls": connected_calls,
+        "contact_rate": contact_rate,
+        "has_call_data": total_calls > 0,
+    }
@@ -2,10 +2,21 @@
 指标汇总模型
 """
 
-from datetime import datetime, date
+from datetime import datetime
 from app import db
 
 
+def _package_totals():
+    """数据包累计指标的聚合表达式：数据包数、线索数、成本"""
+    from .lead_package import LeadPackage
+
+    return (
+        db.func.count(LeadPackage.id),
+        db.func.coalesce(db.func.sum(LeadPackage.total_leads), 0),
+        db.func.coalesce(db.func.sum(LeadPackage.total_cost), 0.0),
+    )
+
+
 class MetricsSummary(db.Model):
     """指标汇总表"""
 
@@ -73,54 +84,186 @@ class MetricsSummary(db.Model):
     @staticmethod
     def calculate_today_metrics():
         """计算今日指标"""
-        from .lead_package import LeadPackage
-        from .call import Call
+        from app.utils.date_range import business_today
 
-        today = date.today()
+        today = business_today()
+        MetricsSummary.rebuild_range(today, today)
 
-        # 获取或创建今日汇总
-        summary = MetricsSummary.query.filter_by(date=today).first()
-        if not summary:
-            summary = MetricsSummary(date=today)
-            db.session.add(summary)
+        db.session.commit()
+        return MetricsSummary.query.filter_by(date=today).first()
+
+    @staticmethod
+    def record_calls(day, total_calls=0, connected_calls=0, total_duration=0):
+        """
+        增量累加某天的通话指标
 
-        # 统计数据包
-        summary.total_packages = LeadPackage.query.count()
-        summary.new_packages = LeadPackage.query.filter(
-            db.func.date(LeadPackage.created_at) == today
-        ).count()
+        在写入通话记录的同一事务中调用：当天汇总行不存在时先插入
+        （数据包相关字段按 lead_packages 当时的累计值填充），
+        再用 UPDATE ... SET x = x + n 原子累加，并同步更新平均指标。
+        """
+        from app.utils.upsert import insert_ignore
+
+        exists = (
+            db.session.query(MetricsSummary.id)
+            .filter(MetricsSummary.date == day)
+            .first()
+        )
+        if exists is None:
+            insert_ignore(
+                MetricsSummary,
+                {"date": day, **MetricsSummary.package_metrics(day)},
+                ["date"],
+            )
 
-        # 统计线索
-        summary.total_leads = (
-            db.session.query(db.func.sum(LeadPackage.total_leads)).scalar() or 0
+        calls = db.func.coalesce(MetricsSummary.total_calls, 0) + total_calls
+        connected = (
+            db.func.coalesce(MetricsSummary.connected_calls, 0) + connected_calls
         )
+        duration = db.func.coalesce(MetricsSummary.total_duration, 0) + total_duration
 
-        # 统计今日通话
-        today_calls = Call.query.filter(db.func.date(Call.call_time) == today)
-        summary.total_calls = today_calls.count()
-        summary.connected_calls = today_calls.filter_by(result="connected").count()
-
-        # 计算平均接通率
-        if summary.total_calls > 0:
-            summary.avg_contact_rate = summary.connected_calls / summary.total_calls
-
-        # 计算平均通话时长
-        summary.total_duration = (
-            db.session.query(db.func.sum(Call.duration))
-            .filter(db.func.date(Call.call_time) == today)
-            .scalar()
-            or 0
+        db.session.query(MetricsSummary).filter(MetricsSummary.date == day).update(
+            {
+                MetricsSummary.total_calls: calls,
+                MetricsSummary.connected_calls: connected,
+                MetricsSummary.total_duration: duration,
+                MetricsSummary.avg_contact_rate: db.case(
+                    (calls > 0, connected * 1.0 / calls),
+                    else_=0.0,
+                ),
+                MetricsSummary.avg_call_duration: db.case(
+                    (connected > 0, duration // connected),
+                    else_=0,
+                ),
+            },
+            synchronize_session=False,
         )
 
-        if summary.connected_calls > 0:
-            summary.avg_call_duration = (
-                summary.total_duration // summary.connected_calls
+    @staticmethod
+    def package_metrics(day):
+        """
+        截至某个业务日期（含当天）的数据包指标
+
+        Returns:
+            total_packages、new_packages、total_leads、total_cost 组成的字典
+        """
+        from .lead_package import LeadPackage
+        from app.utils.date_range import day_range
+
+        start, end = day_range(day)
+        created_today = db.case((LeadPackage.created_at >= start, 1), else_=0)
+
+        total_packages, total_leads, total_cost, new_packages = (
+            db.session.query(
+                *_package_totals(),
+                db.func.coalesce(db.func.sum(created_today), 0),
             )
+            .filter(LeadPackage.created_at < end)
+            .one()
+        )
+        return {
+            "total_packages": total_packages,
+            "new_packages": int(new_packages),
+            "total_leads": int(total_leads),
+            "total_cost": float(total_cost),
+        }
+
+    @staticmethod
+    def rebuild_range(start_date, end_date):
+        """
+        重建 [start_date, end_date]（含两端）每天的汇总行
 
-        # 计算成本
-        summary.total_cost = (
-            db.session.query(db.func.sum(LeadPackage.total_cost)).scalar() or 0.0
+        通话指标通过一次按业务日期 GROUP BY 的 calls 聚合得到，
+        数据包指标通过一次按创建日期 GROUP BY 的 lead_packages 聚合累加得到，
+        最后批量 upsert，不逐天查询。调用方负责提交事务。
+
+        Returns:
+            重建的天数
+        """
+        from .lead_package import LeadPackage
+        from .call import Call
+        from app.utils.date_range import (
+            business_date_expr,
+            date_range,
+            filter_range,
+            iter_days,
+            parse_sql_date,
         )
+        from app.utils.upsert import upsert
 
-        db.session.commit()
-        return summary
+        start, end = date_range(start_date, end_date)
+
+        # 通话指标：按业务日期分组
+        call_day = business_date_expr(Call.call_time)
+        call_rows = (
+            db.session.query(
+                call_day,
+                db.func.count(Call.id),
+                db.func.sum(db.case((Call.result == "connected", 1), else_=0)),
+                db.func.coalesce(db.func.sum(Call.duration), 0),
+            )
+            .filter(*filter_range(Call.call_time, start, end))
+            .group_by(call_day)
+            .all()
+        )
+        calls_by_day = {
+            parse_sql_date(day): (calls, int(connected), int(duration))
+            for day, calls, connected, duration in call_rows
+        }
+
+        # 数据包指标：区间之前的累计值 + 区间内按创建日期分组的增量
+        package_totals = _package_totals()
+        total_packages, total_leads, total_cost = (
+            db.session.query(*package_totals)
+            .filter(LeadPackage.created_at < start)
+            .one()
+        )
+
+        package_day = business_date_expr(LeadPackage.created_at)
+        package_rows = (
+            db.session.query(package_day, *package_totals)
+            .filter(*filter_range(LeadPackage.created_at, start, end))
+            .group_by(package_day)
+            .all()
+        )
+        packages_by_day = {
+            parse_sql_date(day): (count, leads, cost)
+            for day, count, leads, cost in package_rows
+        }
+
+        if start_date > end_date:
+            return 0
+
+        now = datetime.utcnow()
+        rows = []
+
+        for day in iter_days(start_date, end_date):
+            new_packages, new_leads, new_cost = packages_by_day.get(day, (0, 0, 0.0))
+            total_packages += new_packages
+            total_leads += new_leads
+            total_cost += new_cost
+
+            calls, connected, duration = calls_by_day.get(day, (0, 0, 0))
+
+            rows.append(
+                {
+                    "date": day,
+                    "total_packages": total_packages,
+                    "new_packages": new_packages,
+                    "total_leads": int(total_leads),
+                    "total_calls": calls,
+                    "connected_calls": connected,
+                    "total_duration": duration,
+                    "avg_contact_rate": connected / calls if calls > 0 else 0.0,
+                    "avg_call_duration": duration // connected if connected > 0 else 0,
+                    "total_cost": float(total_cost),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+
+        update_columns = [
+            name for name in rows[0] if name not in ("date", "created_at")
+        ]
+        upsert(MetricsSummary, rows, ["date"], update_columns)
+
+        return len(rows)
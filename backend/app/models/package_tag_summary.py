@@ -27,7 +27,7 @@ class PackageTagSummary(db.Model):
     tag_value = db.Column(db.String(200), comment="标签值")
     tag_count = db.Column(db.Integer, default=0, comment="标签出现次数")
 
-    # 百分比
+    # 百分比（批量生成时的快照；接口返回的占比按数据包 tag_total 实时计算）
     percentage = db.Column(db.Float, default=0.0, comment="占比 (0-1)")
 
     # 时间戳
@@ -51,15 +51,239 @@ class PackageTagSummary(db.Model):
             f"<PackageTagSummary {self.tag_name}: {self.tag_value} ({self.tag_count})>"
         )
 
-    def to_dict(self):
-        """转换为字典"""
+    def to_dict(self, total=None):
+        """
+        转换为字典
+
+        Args:
+            total: 数据包的标签总数，为空时读取 self.package.tag_total
+        """
+        if total is None:
+            total = self.package.tag_total
+        total = total or 0
+
         return {
             "id": self.id,
             "package_id": self.package_id,
             "tag_name": self.tag_name,
             "tag_value": self.tag_value,
             "tag_count": self.tag_count,
-            "percentage": self.percentage,
+            "percentage": (self.tag_count or 0) / total if total > 0 else 0.0,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+    @staticmethod
+    def rebuild_all():
+        """
+        重新生成所有数据包的标签汇总
+
+        一次 call_tags JOIN calls JOIN dial_tasks 按 (数据包, 标签名称, 标签值)
+        GROUP BY 得到所有数据包的标签数量，占比用按数据包分区的窗口合计计算。
+        结果按 uix_package_tag 批量 upsert，删除本次没有出现的旧记录，
+        并同步各数据包的标签总数（tag_total）。
+        调用方在同一事务中提交，其他连接在提交前一直能读到旧的汇总。
+
+        Returns:
+            写入的汇总记录数
+        """
+        from .call import Call
+        from .call_tag import CallTag
+        from .dial_task import DialTask
+        from .lead_package import LeadPackage
+        from app.utils.upsert import upsert
+
+        run_start = datetime.utcnow()
+
+        tag_count = db.func.count(CallTag.id)
+        package_total = db.func.sum(tag_count).over(partition_by=DialTask.package_id)
+
+        rows = (
+            db.session.query(
+                DialTask.package_id,
+                CallTag.tag_name,
+                CallTag.tag_value,
+                tag_count,
+                tag_count * 1.0 / package_total,
+            )
+            .join(Call, Call.id == CallTag.call_id)
+            .join(DialTask, DialTask.id == Call.task_id)
+            .group_by(DialTask.package_id, CallTag.tag_name, CallTag.tag_value)
+            .all()
+        )
+
+        values = [
+            {
+                "package_id": package_id,
+                "tag_name": tag_name,
+                "tag_value": tag_value,
+                "tag_count": count,
+                "percentage": percentage,
+                "created_at": run_start,
+                "updated_at": run_start,
+            }
+            for package_id, tag_name, tag_value, count, percentage in rows
+        ]
+
+        # 唯一约束不把 NULL 视为相等，标签值为空的记录无法通过 ON CONFLICT 匹配
+        upsert(
+            PackageTagSummary,
+            [v for v in values if v["tag_value"] is not None],
+            ["package_id", "tag_name", "tag_value"],
+            ["tag_count", "percentage", "updated_at"],
+        )
+        for value in values:
+            if value["tag_value"] is None:
+                PackageTagSummary._upsert_null_value(value)
+
+        # 删除本次没有出现的标签（updated_at 早于本次开始时间）
+        db.session.query(PackageTagSummary).filter(
+            PackageTagSummary.updated_at < run_start
+        ).delete(synchronize_session=False)
+
+        # 同步各数据包的标签总数
+        db.session.query(LeadPackage).update(
+            {
+                LeadPackage.tag_total: db.func.coalesce(
+                    db.session.query(db.func.sum(PackageTagSummary.tag_count))
+                    .filter(PackageTagSummary.package_id == LeadPackage.id)
+                    .scalar_subquery(),
+                    0,
+                )
+            },
+            synchronize_session=False,
+        )
+
+        return len(values)
+
+    @staticmethod
+    def record_tags(package_id, tag_counts):
+        """
+        增量更新某个数据包的标签数量和标签总数
+
+        在写入或删除标签的同一事务中调用：每个标签一条 INSERT ... ON CONFLICT 累加，
+        数据包的 tag_total 一条 UPDATE 累加。数量减到 0 的记录随后删除。
+
+        Args:
+            package_id: 数据包 ID
+            tag_counts: {(tag_name, tag_value): 数量变化}，删除标签时为负数
+        """
+        from .lead_package import LeadPackage
+        from app.utils.upsert import upsert_increment
+
+        tag_counts = {key: count for key, count in tag_counts.items() if count}
+        if not tag_counts:
+            return
+
+        upsert_increment(
+            PackageTagSummary,
+            [
+                {
+                    "package_id": package_id,
+                    "tag_name": tag_name,
+                    "tag_value": tag_value,
+                    "tag_count": count,
+                }
+                for (tag_name, tag_value), count in tag_counts.items()
+                if tag_value is not None
+            ],
+            ["package_id", "tag_name", "tag_value"],
+            ["tag_count"],
+        )
+
+        # 标签值为空的记录无法通过 ON CONFLICT 匹配，先按 IS NULL 累加，不存在时插入
+        for (tag_name, tag_value), count in tag_counts.items():
+            if tag_value is not None:
+                continue
+
+            updated = (
+                db.session.query(PackageTagSummary)
+                .filter(
+                    PackageTagSummary.package_id == package_id,
+                    PackageTagSummary.tag_name == tag_name,
+                    PackageTagSummary.tag_value.is_(None),
+                )
+                .update(
+                    {
+                        PackageTagSummary.tag_count: PackageTagSummary.tag_count
+                        + count,
+                        PackageTagSummary.updated_at: datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if not updated:
+                db.session.execute(
+                    db.insert(PackageTagSummary),
+                    [
+                        {
+                            "package_id": package_id,
+                            "tag_name": tag_name,
+                            "tag_value": None,
+                            "tag_count": count,
+                        }
+                    ],
+                )
+
+        db.session.query(LeadPackage).filter(LeadPackage.id == package_id).update(
+            {
+                LeadPackage.tag_total: db.func.coalesce(LeadPackage.tag_total, 0)
+                + sum(tag_counts.values())
+            },
+            synchronize_session=False,
+        )
+
+        if any(count < 0 for count in tag_counts.values()):
+            db.session.query(PackageTagSummary).filter(
+                PackageTagSummary.package_id == package_id,
+                PackageTagSummary.tag_count <= 0,
+            ).delete(synchronize_session=False)
+
+    @staticmethod
+    def remove_task_tags(task):
+        """
+        从数据包标签汇总中减去某个任务的全部标签（删除任务前调用）
+
+        Args:
+            task: DialTask
+        """
+        from .call import Call
+        from .call_tag import CallTag
+
+        rows = (
+            db.session.query(
+                CallTag.tag_name, CallTag.tag_value, db.func.count(CallTag.id)
+            )
+            .join(Call, Call.id == CallTag.call_id)
+            .filter(Call.task_id == task.id)
+            .group_by(CallTag.tag_name, CallTag.tag_value)
+            .all()
+        )
+
+        PackageTagSummary.record_tags(
+            task.package_id,
+            {(tag_name, tag_value): -count for tag_name, tag_value, count in rows},
+        )
+
+    @staticmethod
+    def _upsert_null_value(value):
+        """写入标签值为空的汇总记录：先按 IS NULL 更新，不存在时插入"""
+        updated = (
+            db.session.query(PackageTagSummary)
+            .filter(
+                PackageTagSummary.package_id == value["package_id"],
+                PackageTagSummary.tag_name == value["tag_name"],
+                PackageTagSummary.tag_value.is_(None),
+            )
+            .update(
+                {
+                    PackageTagSummary.tag_count: value["tag_count"],
+                    PackageTagSummary.percentage: value["percentage"],
+                    PackageTagSummary.updated_at: value["updated_at"],
+                },
+                synchronize_session=False,
+            )
+        )
+
+        if not updated:
+            db.session.execute(db.insert(PackageTagSummary), [value])
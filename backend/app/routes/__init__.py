@@ -8,5 +8,14 @@ from .tasks import tasks_bp
 from .metrics import metrics_bp
 from .data import data_bp
 from .admin import admin_bp
+from .batch import batch_bp
 
-__all__ = ["auth_bp", "packages_bp", "tasks_bp", "metrics_bp", "data_bp", "admin_bp"]
+__all__ = [
+    "auth_bp",
+    "packages_bp",
+    "tasks_bp",
+    "metrics_bp",
+    "data_bp",
+    "admin_bp",
+    "batch_bp",
+]
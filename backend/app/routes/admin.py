@@ -7,12 +7,35 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models import LeadPackage, User
+from app.utils.cache import invalidate
 from datetime import datetime, timedelta
 import random
 
 admin_bp = Blueprint("admin", __name__)
 
 
+def _package_totals():
+    """
+    数据包汇总统计（一条聚合查询，不加载数据包对象）
+
+    Returns:
+        {"total_packages", "total_leads", "total_cost", "avg_contact_rate"}
+    """
+    total_packages, total_leads, total_cost, avg_contact_rate = db.session.query(
+        db.func.count(LeadPackage.id),
+        db.func.coalesce(db.func.sum(LeadPackage.total_leads), 0),
+        db.func.coalesce(db.func.sum(LeadPackage.total_cost), 0),
+        db.func.coalesce(db.func.avg(LeadPackage.contact_rate), 0),
+    ).one()
+
+    return {
+        "total_packages": total_packages,
+        "total_leads": total_leads,
+        "total_cost": total_cost,
+        "avg_contact_rate": avg_contact_rate,
+    }
+
+
 @admin_bp.route("/seed-test-data", methods=["POST"])
 @jwt_required()
 def seed_test_data():
@@ -133,10 +156,17 @@ def seed_test_data():
     packages_created = []
     packages_skipped = []
 
+    # 一次查询已存在的数据包名称
+    existing_names = {
+        name
+        for (name,) in db.session.query(LeadPackage.name).filter(
+            LeadPackage.name.in_([data["name"] for data in test_packages])
+        )
+    }
+
     for data in test_packages:
         # 检查是否已存在
-        existing = LeadPackage.query.filter_by(name=data["name"]).first()
-        if existing:
+        if data["name"] in existing_names:
             packages_skipped.append(data["name"])
             continue
 
@@ -154,16 +184,10 @@ def seed_test_data():
 
     try:
         db.session.commit()
+        invalidate("packages")
 
         # 统计信息
-        all_packages = LeadPackage.query.all()
-        total_leads = sum(p.total_leads for p in all_packages)
-        total_cost = sum(p.total_cost for p in all_packages)
-        avg_contact_rate = (
-            sum(p.contact_rate for p in all_packages) / len(all_packages)
-            if all_packages
-            else 0
-        )
+        totals = _package_totals()
 
         return (
             jsonify(
@@ -176,10 +200,12 @@ def seed_test_data():
                         "created_packages": packages_created,
                         "skipped_packages": packages_skipped,
                         "statistics": {
-                            "total_packages": len(all_packages),
-                            "total_leads": total_leads,
-                            "total_cost": round(total_cost, 2),
-                            "avg_contact_rate": round(avg_contact_rate * 100, 1),
+                            "total_packages": totals["total_packages"],
+                            "total_leads": totals["total_leads"],
+                            "total_cost": round(totals["total_cost"], 2),
+                            "avg_contact_rate": round(
+                                totals["avg_contact_rate"] * 100, 1
+                            ),
                         },
                     },
                 }
@@ -198,20 +224,19 @@ def seed_test_data():
 @admin_bp.route("/stats", methods=["GET"])
 @jwt_required()
 def get_stats():
-    """获取系统统计信息"""
-
-    packages = LeadPackage.query.all()
-    users = User.query.all()
+    """获取系统统计信息（聚合查询，不加载数据包和用户对象）"""
+    totals = _package_totals()
+    total_users = db.session.query(db.func.count(User.id)).scalar()
 
     return (
         jsonify(
             {
                 "success": True,
                 "data": {
-                    "total_packages": len(packages),
-                    "total_users": len(users),
-                    "total_leads": sum(p.total_leads for p in packages),
-                    "total_cost": sum(p.total_cost for p in packages),
+                    "total_packages": totals["total_packages"],
+                    "total_users": total_users,
+                    "total_leads": totals["total_leads"],
+                    "total_cost": totals["total_cost"],
                 },
             }
         ),
@@ -219,6 +244,52 @@ def get_stats():
     )
 
 
+@admin_bp.route("/recalculate-contact-rates", methods=["POST"])
+@jwt_required()
+def recalculate_contact_rates():
+    """
+    重算所有数据包的接通率
+    没有通话记录的数据包接通率置为 0，有通话记录的从通话数据计算
+    """
+    packages = LeadPackage.query.all()
+
+    # 一次 GROUP BY 查询获取所有数据包的通话统计
+    all_stats = LeadPackage.get_call_statistics_batch()
+
+    updated = 0
+    reset = 0
+
+    for package in packages:
+        stats = all_stats[package.id]
+
+        if not stats["has_call_data"]:
+            package.contact_rate = 0.0
+            package.interest_rate = 0.0
+            reset += 1
+        else:
+            package.calculate_metrics(call_stats=stats)
+            updated += 1
+
+    try:
+        db.session.commit()
+        invalidate("packages")
+
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "message": "接通率重算完成",
+                    "data": {"updated": updated, "reset": reset},
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "message": f"重算失败: {str(e)}"}), 500
+
+
 @admin_bp.route("/clear-all-packages", methods=["POST"])
 @jwt_required()
 def clear_all_packages():
@@ -242,6 +313,7 @@ def clear_all_packages():
     try:
         count = LeadPackage.query.delete()
         db.session.commit()
+        invalidate("packages", "tasks", "calls")
 
         return jsonify({"success": True, "message": f"已清除 {count} 个数据包"}), 200
 
@@ -0,0 +1,140 @@
+"""
+批量请求 API 路由
+
+前端一个页面往往需要依次调用多个只读接口（仪表盘、数据包详情、数据包统计……），
+每个请求都要单独经过一次网络往返。批量接口在一个 HTTP 请求内依次执行多个 GET 子请求：
+
+- 子请求按正常的路由、视图、错误处理和 after_request 执行，结果与单独调用一致
+- 所有子请求共用本请求的应用上下文，因此共用同一个数据库会话（连接只检出一次），
+  某个子请求返回 5xx 时回滚会话，不影响后续子请求
+- 本请求的 Authorization 头会转发给子请求，需要登录的接口同样可用
+"""
+
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.test import EnvironBuilder
+
+from app import db
+
+batch_bp = Blueprint("batch", __name__)
+
+# 转发给子请求的请求头
+FORWARDED_HEADERS = ("Authorization", "Accept-Language")
+
+# 子请求路径不以此开头时视为相对于 API 根路径（前端经反向代理访问时不知道后端的前缀）
+API_PREFIX = "/api"
+
+
+def _error(message, status):
+    return {"status": status, "body": {"success": False, "error": message}}
+
+
+def _dispatch(path):
+    """
+    在嵌套的请求上下文中执行一个 GET 子请求
+
+    Returns:
+        {"status": 状态码, "body": 响应 JSON}
+    """
+    if path != API_PREFIX and not path.startswith(API_PREFIX + "/"):
+        path = API_PREFIX + path
+
+    builder = EnvironBuilder(
+        path=path,
+        base_url=request.host_url,
+        method="GET",
+        headers={
+            name: request.headers[name]
+            for name in FORWARDED_HEADERS
+            if name in request.headers
+        },
+        environ_base={"REMOTE_ADDR": request.remote_addr},
+    )
+
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    # 应用上下文已存在，嵌套的请求上下文直接复用（包括数据库会话）
+    with current_app.request_context(environ):
+        try:
+            response = current_app.full_dispatch_request()
+        except Exception as e:
+            response = current_app.handle_exception(e)
+
+        # 子请求共用数据库会话：出错的子请求可能留下未提交的修改或失败的事务，
+        # 回滚后再执行后续子请求
+        if response.status_code >= 500:
+            db.session.rollback()
+
+        if response.is_streamed:
+            response.close()
+            return _error("批量请求不支持流式接口", 400)
+
+        if response.is_json:
+            body = response.get_json()
+        else:
+            body = response.get_data(as_text=True)
+
+        return {"status": response.status_code, "body": body}
+
+
+@batch_bp.route("", methods=["POST"])
+def batch():
+    """
+    批量执行只读子请求
+
+    请求体:
+        {
+            "requests": [
+                {"id": "dashboard", "path": "/metrics/dashboard"},
+                {"id": "package", "path": "/packages/1?include=dial_tasks"},
+                {"path": "/api/metrics/package/1/stats"}
+            ]
+        }
+
+    - 只支持 GET 子请求（method 可省略），按顺序执行，最多 BATCH_MAX_REQUESTS 个
+      （批量接口本身只接受 POST，因此不会被嵌套调用）
+    - path 可以是完整路径（/api/...），也可以相对于 API 根路径（/packages/1）
+    - id 可选，原样返回，便于前端对应结果
+
+    返回:
+        {
+            "success": true,
+            "data": [
+                {"id": "dashboard", "path": "...", "status": 200, "body": {...}},
+                ...
+            ]
+        }
+    """
+    data = request.get_json(silent=True)
+    sub_requests = data.get("requests") if isinstance(data, dict) else None
+
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({"success": False, "error": "缺少必填字段: requests"}), 400
+
+    max_requests = current_app.config["BATCH_MAX_REQUESTS"]
+    if len(sub_requests) > max_requests:
+        return (
+            jsonify({"success": False, "error": f"一次最多 {max_requests} 个子请求"}),
+            400,
+        )
+
+    results = []
+    for item in sub_requests:
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+            result = _error("子请求缺少 path", 400)
+        elif str(item.get("method", "GET")).upper() != "GET":
+            result = _error("批量请求只支持 GET 子请求", 405)
+        elif not item["path"].startswith("/"):
+            result = _error("path 必须以 / 开头", 400)
+        else:
+            result = _dispatch(item["path"])
+
+        entry = {"path": item.get("path") if isinstance(item, dict) else None}
+        if isinstance(item, dict) and "id" in item:
+            entry["id"] = item["id"]
+        entry.update(result)
+        results.append(entry)
+
+    return jsonify({"success": True, "data": results})
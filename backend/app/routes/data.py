@@ -2,17 +2,48 @@
 数据统计相关 API 路由（为Widget MAC提供数据）
 """
 
-from flask import Blueprint, jsonify
-from datetime import date, datetime, timedelta
+from flask import Blueprint, current_app, jsonify
+from datetime import datetime, timedelta
 from app import db
 from app.models import LeadPackage, DialTask, Call
+from app.utils import widget_snapshot
+from app.utils.date_range import (
+    business_today,
+    day_range,
+    filter_range,
+    month_bounds,
+    month_range,
+    to_business_date,
+)
 from sqlalchemy import func
 
 data_bp = Blueprint("data", __name__)
 
 
+def _package_task_totals():
+    """
+    按数据包汇总任务计数器的子查询
+
+    列：package_id, total_calls, connected_calls
+    """
+    return (
+        db.session.query(
+            DialTask.package_id.label("package_id"),
+            func.sum(DialTask.total_calls).label("total_calls"),
+            func.sum(DialTask.connected_calls).label("connected_calls"),
+        )
+        .group_by(DialTask.package_id)
+        .subquery()
+    )
+
+
 @data_bp.route("/remaining", methods=["GET"])
 def get_data_remaining():
+    """获取数据余量（快照开启时直接读取快照）"""
+    return serve_widget_data("remaining")
+
+
+def build_remaining():
     """
     获取数据余量
 
@@ -21,83 +52,69 @@ def get_data_remaining():
     # 按年级统计剩余线索数量
     # 剩余数 = total_leads - (已外呼的条数)
 
-    # 获取所有数据包的统计
-    packages = LeadPackage.query.all()
-
-    # 按年级分组统计
-    by_level = {}
-    total_remaining = 0
-
-    for pkg in packages:
-        industry = pkg.industry  # 年级字段
-
-        # 计算该包的剩余数
-        # 这里简化处理：剩余数 = valid_leads - sum(task.total_calls)
-        total_calls = sum(task.total_calls for task in pkg.dial_tasks)
-        remaining = max(0, pkg.valid_leads - total_calls)
+    # 这里简化处理：每个包的剩余数 = max(0, valid_leads - sum(task.total_calls))
+    task_totals = _package_task_totals()
+    called = func.coalesce(task_totals.c.total_calls, 0)
+    remaining = db.case(
+        (LeadPackage.valid_leads > called, LeadPackage.valid_leads - called),
+        else_=0,
+    )
 
-        if industry not in by_level:
-            by_level[industry] = 0
+    # 按年级（industry 字段）分组统计
+    rows = (
+        db.session.query(LeadPackage.industry, func.sum(remaining))
+        .outerjoin(task_totals, task_totals.c.package_id == LeadPackage.id)
+        .group_by(LeadPackage.industry)
+        .all()
+    )
 
-        by_level[industry] += remaining
-        total_remaining += remaining
+    by_level = {industry: int(level_remaining) for industry, level_remaining in rows}
+    total_remaining = sum(by_level.values())
 
     # 判断是否数据余量偏低（小于1000条）
     is_low = total_remaining < 1000
 
-    return jsonify(
-        {
-            "success": True,
-            "data": {
-                "total_remaining": total_remaining,
-                "by_level": by_level,
-                "warning": {
-                    "is_low": is_low,
-                    "threshold": 1000,
-                    "message": "数据余量偏低，请及时采买" if is_low else None,
-                },
+    return {
+        "success": True,
+        "data": {
+            "total_remaining": total_remaining,
+            "by_level": by_level,
+            "warning": {
+                "is_low": is_low,
+                "threshold": 1000,
+                "message": "数据余量偏低，请及时采买" if is_low else None,
             },
-        }
-    )
+        },
+    }
 
 
 @data_bp.route("/consumption/month-total", methods=["GET"])
 def get_month_consumption():
+    """获取本月累计消耗（快照开启时直接读取快照）"""
+    return serve_widget_data("month-total")
+
+
+def build_month_consumption():
     """
     获取本月累计消耗
 
     消耗 = 已外呼的线索条数
     """
-    # 获取本月第一天和最后一天
-    today = date.today()
-    first_day = date(today.year, today.month, 1)
-
-    # 下个月第一天
-    if today.month == 12:
-        next_month = date(today.year + 1, 1, 1)
-    else:
-        next_month = date(today.year, today.month + 1, 1)
-
-    # 统计本月所有外呼任务的total_calls
-    month_tasks = DialTask.query.filter(
-        DialTask.start_time >= first_day, DialTask.start_time < next_month
-    ).all()
-
-    # 按年级分组统计
-    by_level = {}
-    total_consumption = 0
-
-    for task in month_tasks:
-        # 获取任务对应的数据包
-        package = task.package
-        if package:
-            industry = package.industry
-
-            if industry not in by_level:
-                by_level[industry] = 0
+    # 获取本月第一天和下个月第一天（按业务时区）
+    today = business_today()
+    first_day, next_month = month_bounds(today)
+
+    # 统计本月所有外呼任务的total_calls，按年级分组
+    rows = (
+        db.session.query(LeadPackage.industry, func.sum(DialTask.total_calls))
+        .join(LeadPackage, LeadPackage.id == DialTask.package_id)
+        .filter(*filter_range(DialTask.start_time, *month_range(today)))
+        .group_by(LeadPackage.industry)
+        .all()
+    )
 
-            by_level[industry] += task.total_calls
-            total_consumption += task.total_calls
+    by_level = {industry: int(level_calls or 0) for industry, level_calls in rows}
+    total_consumption = sum(by_level.values())
 
     # 计算日均消耗
     days_passed = (today - first_day).days + 1
@@ -107,41 +124,59 @@ def get_month_consumption():
     days_in_month = (next_month - first_day).days
     projected_month_total = daily_average * days_in_month
 
-    return jsonify(
-        {
-            "success": True,
-            "data": {
-                "total_consumption": total_consumption,
-                "by_level": by_level,
-                "daily_average": round(daily_average, 2),
-                "projected_month_total": round(projected_month_total, 0),
-                "period": {
-                    "start_date": first_day.isoformat(),
-                    "end_date": today.isoformat(),
-                    "days_passed": days_passed,
-                    "days_in_month": days_in_month,
-                },
+    return {
+        "success": True,
+        "data": {
+            "total_consumption": total_consumption,
+            "by_level": by_level,
+            "daily_average": round(daily_average, 2),
+            "projected_month_total": round(projected_month_total, 0),
+            "period": {
+                "start_date": first_day.isoformat(),
+                "end_date": today.isoformat(),
+                "days_passed": days_passed,
+                "days_in_month": days_in_month,
             },
-        }
-    )
+        },
+    }
 
 
 @data_bp.route("/value/package-progress", methods=["GET"])
 def get_package_progress():
+    """获取数据包进度（快照开启时直接读取快照）"""
+    return serve_widget_data("package-progress")
+
+
+def build_package_progress():
     """
     获取数据包进度
 
     返回所有活跃数据包的外呼进度
     """
-    # 获取所有数据包
-    packages = LeadPackage.query.order_by(LeadPackage.created_at.desc()).all()
+    # 获取所有数据包及其已外呼条数（只查询需要的列）
+    task_totals = _package_task_totals()
+    packages = (
+        db.session.query(
+            LeadPackage.id,
+            LeadPackage.name,
+            LeadPackage.industry,
+            LeadPackage.total_leads,
+            LeadPackage.valid_leads,
+            LeadPackage.contact_rate,
+            LeadPackage.created_at,
+            func.coalesce(task_totals.c.total_calls, 0).label("total_calls"),
+        )
+        .outerjoin(task_totals, task_totals.c.package_id == LeadPackage.id)
+        .order_by(LeadPackage.created_at.desc())
+        .all()
+    )
 
     package_list = []
     total_progress = 0
 
     for pkg in packages:
         # 计算该包的进度
-        total_calls = sum(task.total_calls for task in pkg.dial_tasks)
+        total_calls = pkg.total_calls
         progress_rate = (
             (total_calls / pkg.valid_leads * 100) if pkg.valid_leads > 0 else 0
         )
@@ -166,53 +201,55 @@ def get_package_progress():
     # 计算平均进度
     avg_progress = total_progress / len(packages) if packages else 0
 
-    return jsonify(
-        {
-            "success": True,
-            "data": {
-                "packages": package_list,
-                "summary": {
-                    "total_packages": len(packages),
-                    "avg_progress": round(avg_progress, 2),
-                },
+    return {
+        "success": True,
+        "data": {
+            "packages": package_list,
+            "summary": {
+                "total_packages": len(packages),
+                "avg_progress": round(avg_progress, 2),
             },
-        }
-    )
+        },
+    }
 
 
 @data_bp.route("/value/connect-rate", methods=["GET"])
 def get_connect_rate():
+    """获取接通率分析（快照开启时直接读取快照）"""
+    return serve_widget_data("connect-rate")
+
+
+def build_connect_rate():
     """
     获取接通率分析
 
     返回各维度的接通率统计
     """
     # 按年级统计接通率
-    packages = LeadPackage.query.all()
+    rows = (
+        db.session.query(
+            LeadPackage.industry,
+            func.coalesce(func.sum(DialTask.total_calls), 0),
+            func.coalesce(func.sum(DialTask.connected_calls), 0),
+        )
+        .outerjoin(DialTask, DialTask.package_id == LeadPackage.id)
+        .group_by(LeadPackage.industry)
+        .all()
+    )
 
     by_level = {}
     total_calls = 0
     total_connected = 0
 
-    for pkg in packages:
-        industry = pkg.industry
-
-        # 统计该包的通话数据
-        pkg_total_calls = sum(task.total_calls for task in pkg.dial_tasks)
-        pkg_connected = sum(task.connected_calls for task in pkg.dial_tasks)
-
-        if industry not in by_level:
-            by_level[industry] = {
-                "total_calls": 0,
-                "connected_calls": 0,
-                "contact_rate": 0,
-            }
-
-        by_level[industry]["total_calls"] += pkg_total_calls
-        by_level[industry]["connected_calls"] += pkg_connected
+    for industry, level_calls, level_connected in rows:
+        by_level[industry] = {
+            "total_calls": int(level_calls),
+            "connected_calls": int(level_connected),
+            "contact_rate": 0,
+        }
 
-        total_calls += pkg_total_calls
-        total_connected += pkg_connected
+        total_calls += int(level_calls)
+        total_connected += int(level_connected)
 
     # 计算各年级的接通率
     for industry in by_level:
@@ -226,17 +263,19 @@ def get_connect_rate():
     overall_rate = (total_connected / total_calls * 100) if total_calls > 0 else 0
 
     # 获取最近7天的趋势
-    seven_days_ago = date.today() - timedelta(days=7)
+    seven_days_ago = business_today() - timedelta(days=7)
     recent_tasks = (
-        DialTask.query.filter(DialTask.start_time >= seven_days_ago)
-        .order_by(DialTask.start_time.asc())
+        db.session.query(
+            DialTask.start_time, DialTask.total_calls, DialTask.connected_calls
+        )
+        .filter(DialTask.start_time >= day_range(seven_days_ago)[0])
         .all()
     )
 
     # 按日期分组统计
     daily_stats = {}
     for task in recent_tasks:
-        day = task.start_time.date().isoformat()
+        day = to_business_date(task.start_time).isoformat()
         if day not in daily_stats:
             daily_stats[day] = {"total_calls": 0, "connected_calls": 0}
 
@@ -260,18 +299,33 @@ def get_connect_rate():
             }
         )
 
-    return jsonify(
-        {
-            "success": True,
-            "data": {
-                "overall_rate": round(overall_rate, 2),
-                "by_level": by_level,
-                "total_calls": total_calls,
-                "total_connected": total_connected,
-                "trend_7days": trend,
-            },
-        }
-    )
+    return {
+        "success": True,
+        "data": {
+            "overall_rate": round(overall_rate, 2),
+            "by_level": by_level,
+            "total_calls": total_calls,
+            "total_connected": total_connected,
+            "trend_7days": trend,
+        },
+    }
+
+
+# Widget 数据构建函数，快照按名称预先计算这些响应
+WIDGET_BUILDERS = {
+    "remaining": build_remaining,
+    "month-total": build_month_consumption,
+    "package-progress": build_package_progress,
+    "connect-rate": build_connect_rate,
+}
+
+
+def serve_widget_data(name):
+    """返回 Widget 数据：快照开启时读取快照，否则实时计算"""
+    if not current_app.config.get("WIDGET_SNAPSHOT_PATH"):
+        return jsonify(WIDGET_BUILDERS[name]())
+
+    return widget_snapshot.serve(name, WIDGET_BUILDERS)
 
 
 @data_bp.route("/purchase/week-plan", methods=["GET"])
@@ -286,7 +340,7 @@ def get_week_purchase_plan():
         {
             "success": True,
             "data": {
-                "week": f"{date.today().isocalendar()[1]}周",
+                "week": f"{business_today().isocalendar()[1]}周",
                 "plans": [],
                 "message": "采买计划功能开发中",
             },
@@ -2,15 +2,28 @@
 指标查询相关 API 路由
 """
 
-from flask import Blueprint, request, jsonify
-from datetime import date, datetime, timedelta
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    request,
+    jsonify,
+    stream_with_context,
+)
+from datetime import datetime, timedelta
 from app import db
-from app.models import LeadPackage, DialTask, Call, MetricsSummary
+from app.models import LeadPackage, DialTask, Call, MetricsSummary, DailyPackageMetrics
+from app.models.daily_package_metrics import ROLLUP_DIMENSIONS
+from app.utils.cache import cached, get_cache, invalidate
+from app.utils.date_range import business_today, date_range, day_range, filter_range
+from app.utils.export import EXPORT_FORMATS, MIMETYPES, iter_export
+from app.utils.serializers import METRICS_SUMMARY, PACKAGE, dump_tag_summaries
 
 metrics_bp = Blueprint("metrics", __name__)
 
 
 @metrics_bp.route("/dashboard", methods=["GET"])
+@cached("packages", "calls")
 def get_dashboard_metrics():
     """
     获取仪表盘数据
@@ -33,17 +46,17 @@ def get_dashboard_metrics():
         db.session.query(db.func.avg(LeadPackage.interest_rate)).scalar() or 0.0
     )
 
-    # 今日通话统计
-    today = date.today()
-    today_calls = Call.query.filter(db.func.date(Call.call_time) == today).count()
+    # 今日通话统计（按业务时区划分今天）
+    today_range = filter_range(Call.call_time, *day_range(business_today()))
+    today_calls = Call.query.filter(*today_range).count()
 
     today_connected = Call.query.filter(
-        db.func.date(Call.call_time) == today, Call.result == "connected"
+        *today_range, Call.result == "connected"
     ).count()
 
     # 最近的数据包（前10个）
     recent_packages = (
-        LeadPackage.query.order_by(LeadPackage.created_at.desc()).limit(10).all()
+        PACKAGE.query().order_by(LeadPackage.created_at.desc()).limit(10).all()
     )
 
     return jsonify(
@@ -58,13 +71,14 @@ def get_dashboard_metrics():
                     "today_calls": today_calls,
                     "today_connected": today_connected,
                 },
-                "recent_packages": [pkg.to_dict() for pkg in recent_packages],
+                "recent_packages": PACKAGE.dump_many(recent_packages),
             },
         }
     )
 
 
 @metrics_bp.route("/summary", methods=["GET"])
+@cached("packages", "calls", "metrics")
 def get_metrics_summary():
     """
     获取指标汇总
@@ -77,7 +91,7 @@ def get_metrics_summary():
     start_date_str = request.args.get("start_date")
     end_date_str = request.args.get("end_date")
 
-    query = MetricsSummary.query
+    query = METRICS_SUMMARY.query()
 
     if start_date_str:
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
@@ -90,15 +104,14 @@ def get_metrics_summary():
     # 排序：最新的在前
     summaries = query.order_by(MetricsSummary.date.desc()).all()
 
-    return jsonify(
-        {"success": True, "data": [summary.to_dict() for summary in summaries]}
-    )
+    return jsonify({"success": True, "data": METRICS_SUMMARY.dump_many(summaries)})
 
 
 @metrics_bp.route("/summary/today", methods=["POST"])
 def calculate_today_summary():
     """计算今日指标汇总"""
     summary = MetricsSummary.calculate_today_metrics()
+    invalidate("metrics")
 
     return jsonify(
         {"success": True, "data": summary.to_dict(), "message": "今日指标计算成功"}
@@ -106,6 +119,7 @@ def calculate_today_summary():
 
 
 @metrics_bp.route("/trends", methods=["GET"])
+@cached("packages", "calls", "metrics")
 def get_trends():
     """
     获取趋势数据（最近7天、30天）
@@ -116,12 +130,12 @@ def get_trends():
     days = request.args.get("days", 7, type=int)
 
     # 计算日期范围
-    end_date = date.today()
+    end_date = business_today()
     start_date = end_date - timedelta(days=days - 1)
 
     # 查询汇总数据
     summaries = (
-        MetricsSummary.query.filter(
+        METRICS_SUMMARY.query(
             MetricsSummary.date >= start_date, MetricsSummary.date <= end_date
         )
         .order_by(MetricsSummary.date.asc())
@@ -135,7 +149,7 @@ def get_trends():
     current_date = start_date
     while current_date <= end_date:
         if current_date in date_map:
-            trends.append(date_map[current_date].to_dict())
+            trends.append(METRICS_SUMMARY.dump(date_map[current_date]))
         else:
             # 填充空数据
             trends.append(
@@ -152,7 +166,58 @@ def get_trends():
     return jsonify({"success": True, "data": trends})
 
 
+@metrics_bp.route("/rollup", methods=["GET"])
+@cached("packages", "calls", "metrics")
+def get_rollup():
+    """
+    按维度汇总每日指标（数据来自数据包每日指标表，不扫描通话记录）
+
+    查询参数:
+        - dimension: 汇总维度 package/source/industry/region (默认 source)
+        - start_date: 开始日期 (YYYY-MM-DD)
+        - end_date: 结束日期 (YYYY-MM-DD)
+        - by_date: 是否按日期展开 (1/0，默认 0)
+        - tags: 是否返回标签统计 {标签名称: 次数} (1/0，默认 0)
+    """
+    dimension = request.args.get("dimension", "source")
+    by_date = request.args.get("by_date", 0, type=int) == 1
+    tags = request.args.get("tags", 0, type=int) == 1
+
+    if dimension not in ROLLUP_DIMENSIONS:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": f"dimension 只能是: {', '.join(ROLLUP_DIMENSIONS)}",
+                }
+            ),
+            400,
+        )
+
+    try:
+        start_date, end_date = (
+            datetime.strptime(value, "%Y-%m-%d").date() if value else None
+            for value in (request.args.get("start_date"), request.args.get("end_date"))
+        )
+    except ValueError:
+        return (
+            jsonify({"success": False, "error": "日期格式错误，应为 YYYY-MM-DD"}),
+            400,
+        )
+
+    data = DailyPackageMetrics.rollup(
+        dimension,
+        start_date=start_date,
+        end_date=end_date,
+        by_date=by_date,
+        tags=tags,
+    )
+
+    return jsonify({"success": True, "data": data})
+
+
 @metrics_bp.route("/package/<int:package_id>/stats", methods=["GET"])
+@cached("packages", "tasks", "calls")
 def get_package_stats(package_id):
     """
     获取单个数据包的详细统计
@@ -165,26 +230,25 @@ def get_package_stats(package_id):
     """
     package = LeadPackage.query.get_or_404(package_id)
 
-    # 统计外呼任务
-    tasks = package.dial_tasks.all()
-    total_tasks = len(tasks)
-    completed_tasks = sum(1 for t in tasks if t.status == "completed")
-
-    # 统计所有通话记录
-    all_calls = []
-    for task in tasks:
-        all_calls.extend(task.calls.all())
-
-    total_calls = len(all_calls)
+    # 按状态统计外呼任务
+    task_status = dict(
+        db.session.query(DialTask.status, db.func.count(DialTask.id))
+        .filter(DialTask.package_id == package_id)
+        .group_by(DialTask.status)
+        .all()
+    )
 
-    # 通话结果分布
-    result_distribution = {}
-    for call in all_calls:
-        result = call.result
-        result_distribution[result] = result_distribution.get(result, 0) + 1
+    # 按结果统计通话记录（在数据库中聚合，不加载通话记录）
+    result_distribution = dict(
+        db.session.query(Call.result, db.func.count(Call.id))
+        .join(DialTask, Call.task_id == DialTask.id)
+        .filter(DialTask.package_id == package_id)
+        .group_by(Call.result)
+        .all()
+    )
 
     # 获取标签汇总
-    tag_summaries = [s.to_dict() for s in package.tag_summaries.all()]
+    tag_summaries = dump_tag_summaries(package_id, package.tag_total)
 
     return jsonify(
         {
@@ -192,13 +256,13 @@ def get_package_stats(package_id):
             "data": {
                 "package": package.to_dict(),
                 "task_stats": {
-                    "total": total_tasks,
-                    "completed": completed_tasks,
-                    "in_progress": sum(1 for t in tasks if t.status == "in_progress"),
-                    "pending": sum(1 for t in tasks if t.status == "pending"),
+                    "total": sum(task_status.values()),
+                    "completed": task_status.get("completed", 0),
+                    "in_progress": task_status.get("in_progress", 0),
+                    "pending": task_status.get("pending", 0),
                 },
                 "call_stats": {
-                    "total": total_calls,
+                    "total": sum(result_distribution.values()),
                     "result_distribution": result_distribution,
                 },
                 "tag_summaries": tag_summaries,
@@ -207,15 +271,145 @@ def get_package_stats(package_id):
     )
 
 
+@metrics_bp.route("/cache", methods=["GET"])
+def get_cache_stats():
+    """响应缓存命中统计（当前进程）"""
+    return jsonify({"success": True, "data": get_cache().stats()})
+
+
+EXPORT_TYPES = ("calls", "summaries", "package_summaries")
+
+
+def _export_statement(export_type, start_date, end_date, package_id, result):
+    """构建导出查询（只选择导出需要的列）"""
+    if export_type == "calls":
+        stmt = (
+            db.select(
+                Call.id,
+                Call.task_id,
+                DialTask.package_id,
+                DialTask.task_name,
+                Call.phone_number,
+                Call.call_time,
+                Call.duration,
+                Call.result,
+                Call.customer_name,
+                Call.company,
+                Call.notes,
+            )
+            .join(DialTask, Call.task_id == DialTask.id)
+            .where(*filter_range(Call.call_time, *date_range(start_date, end_date)))
+            .order_by(Call.call_time, Call.id)
+        )
+        if package_id:
+            stmt = stmt.where(DialTask.package_id == package_id)
+        if result:
+            stmt = stmt.where(Call.result == result)
+        return stmt
+
+    if export_type == "package_summaries":
+        stmt = (
+            db.select(
+                DailyPackageMetrics.date,
+                DailyPackageMetrics.package_id,
+                LeadPackage.name.label("package_name"),
+                DailyPackageMetrics.total_calls,
+                DailyPackageMetrics.connected_calls,
+                DailyPackageMetrics.total_duration,
+                DailyPackageMetrics.interested_calls,
+            )
+            .join(LeadPackage, DailyPackageMetrics.package_id == LeadPackage.id)
+            .order_by(DailyPackageMetrics.date, DailyPackageMetrics.package_id)
+        )
+        model = DailyPackageMetrics
+        if package_id:
+            stmt = stmt.where(DailyPackageMetrics.package_id == package_id)
+    else:
+        stmt = db.select(
+            MetricsSummary.date,
+            MetricsSummary.total_packages,
+            MetricsSummary.new_packages,
+            MetricsSummary.total_leads,
+            MetricsSummary.total_calls,
+            MetricsSummary.connected_calls,
+            MetricsSummary.total_duration,
+            MetricsSummary.avg_contact_rate,
+            MetricsSummary.avg_call_duration,
+        ).order_by(MetricsSummary.date)
+        model = MetricsSummary
+
+    if start_date:
+        stmt = stmt.where(model.date >= start_date)
+    if end_date:
+        stmt = stmt.where(model.date <= end_date)
+    return stmt
+
+
 @metrics_bp.route("/export", methods=["GET"])
 def export_metrics():
     """
-    导出指标数据（CSV 格式）
+    流式导出指标数据
 
     查询参数:
-        - start_date: 开始日期
-        - end_date: 结束日期
-        - format: 导出格式 (csv/json)
+        - type: 导出内容 (默认 calls)
+            - calls: 通话记录明细
+            - summaries: 每日指标汇总
+            - package_summaries: 数据包每日指标
+        - format: 导出格式 csv/ndjson (默认 csv，json 等同于 ndjson)
+        - start_date: 开始日期 (YYYY-MM-DD，按业务时区，含当天)
+        - end_date: 结束日期 (YYYY-MM-DD，按业务时区，含当天)
+        - package_id: 数据包 ID（calls、package_summaries）
+        - result: 通话结果（calls）
+
+    数据通过服务端游标分批读取并以分块传输写出，导出整月数据时内存占用也保持不变。
     """
-    # TODO: 实现 CSV 导出功能
-    return jsonify({"success": False, "error": "导出功能开发中"}), 501
+    export_type = request.args.get("type", "calls")
+    fmt = request.args.get("format", "csv")
+    fmt = "ndjson" if fmt == "json" else fmt
+    package_id = request.args.get("package_id", type=int)
+    result = request.args.get("result")
+
+    if export_type not in EXPORT_TYPES:
+        return (
+            jsonify(
+                {"success": False, "error": f"type 只能是: {', '.join(EXPORT_TYPES)}"}
+            ),
+            400,
+        )
+
+    if fmt not in EXPORT_FORMATS:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": f"format 只能是: {', '.join(EXPORT_FORMATS)}",
+                }
+            ),
+            400,
+        )
+
+    try:
+        start_date, end_date = (
+            datetime.strptime(value, "%Y-%m-%d").date() if value else None
+            for value in (request.args.get("start_date"), request.args.get("end_date"))
+        )
+    except ValueError:
+        return (
+            jsonify({"success": False, "error": "日期格式错误，应为 YYYY-MM-DD"}),
+            400,
+        )
+
+    stmt = _export_statement(export_type, start_date, end_date, package_id, result)
+
+    filename = "_".join(
+        [export_type]
+        + [value.strftime("%Y%m%d") for value in (start_date, end_date) if value]
+    )
+
+    return Response(
+        stream_with_context(
+            iter_export(stmt, fmt, batch_size=current_app.config["EXPORT_BATCH_SIZE"])
+        ),
+        mimetype=MIMETYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{fmt}"},
+    )
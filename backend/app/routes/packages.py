@@ -2,14 +2,58 @@
 数据包相关 API 路由
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, current_app, request, jsonify
 from app import db
-from app.models import LeadPackage, DialTask
+from app.models import LeadPackage, DialTask, PackageTagSummary
+from app.utils.cache import invalidate
+from app.utils.etag import etag, fingerprint, table_fingerprint
+from app.utils.package_import import ImportRowError, PackageImporter, read_rows
+from app.utils.pagination import InvalidCursor, clamp_per_page, keyset_paginate
+from app.utils.serializers import (
+    PACKAGE,
+    TASK,
+    InvalidFields,
+    dump_tag_summaries,
+    parse_list,
+)
 
 packages_bp = Blueprint("packages", __name__)
 
+# 数据包详情可内嵌的关联数据（?include=）
+PACKAGE_INCLUDES = ("dial_tasks", "tag_summaries")
+
+
+def _package_filters():
+    """列表查询参数对应的过滤条件"""
+    conditions = []
+    for field in ("source", "industry", "region"):
+        value = request.args.get(field, type=str)
+        if value:
+            conditions.append(getattr(LeadPackage, field) == value)
+    return conditions
+
+
+def _packages_fingerprint():
+    """数据包列表的指纹：满足过滤条件的行数、max(id)、max(updated_at)"""
+    return fingerprint(*table_fingerprint(LeadPackage, *_package_filters()))
+
+
+def _package_fingerprint(package_id):
+    """数据包详情的指纹：数据包本身、外呼任务和标签汇总，数据包不存在时返回 None"""
+    package = db.select(LeadPackage).where(LeadPackage.id == package_id)
+    parts = fingerprint(
+        package.with_only_columns(LeadPackage.updated_at).scalar_subquery(),
+        package.with_only_columns(LeadPackage.tag_total).scalar_subquery(),
+        *table_fingerprint(DialTask, DialTask.package_id == package_id),
+        *table_fingerprint(
+            PackageTagSummary, PackageTagSummary.package_id == package_id
+        ),
+    )
+    return parts if parts[0] is not None else None
+
 
 @packages_bp.route("", methods=["GET"])
+@etag(_packages_fingerprint)
 def get_packages():
     """
     获取所有数据包
@@ -20,24 +64,46 @@ def get_packages():
         - source: 数据来源过滤
         - industry: 行业过滤
         - region: 地区过滤
+        - cursor: 游标分页（按 created_at, id 倒序）。传空值获取第一页，
+                  之后传上一页返回的 next_cursor；传入时忽略 page
+        - with_total: 游标分页时是否返回总数 (1/0，默认 0)
+        - fields: 只返回指定字段，逗号分隔（总是包含 id），如 fields=name,total_leads
     """
     # 获取查询参数
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
-    source = request.args.get("source", type=str)
-    industry = request.args.get("industry", type=str)
-    region = request.args.get("region", type=str)
 
-    # 构建查询
-    query = LeadPackage.query
-
-    # 应用过滤
-    if source:
-        query = query.filter(LeadPackage.source == source)
-    if industry:
-        query = query.filter(LeadPackage.industry == industry)
-    if region:
-        query = query.filter(LeadPackage.region == region)
+    # 只查询需要的列（游标分页需要排序列）
+    try:
+        projection = PACKAGE.only(
+            parse_list(request.args.get("fields")), hidden=("created_at",)
+        )
+    except InvalidFields as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    # 构建查询并应用过滤
+    query = projection.query(*_package_filters())
+
+    # 游标分页
+    if "cursor" in request.args:
+        try:
+            packages, pagination = keyset_paginate(
+                query,
+                (LeadPackage.created_at, LeadPackage.id),
+                cursor=request.args.get("cursor"),
+                per_page=clamp_per_page(per_page),
+                with_total=request.args.get("with_total", 0, type=int) == 1,
+            )
+        except InvalidCursor as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        return jsonify(
+            {
+                "success": True,
+                "data": projection.dump_many(packages),
+                "pagination": pagination,
+            }
+        )
 
     # 排序：最新的在前
     query = query.order_by(LeadPackage.created_at.desc())
@@ -48,7 +114,7 @@ def get_packages():
     return jsonify(
         {
             "success": True,
-            "data": [package.to_dict() for package in pagination.items],
+            "data": projection.dump_many(pagination.items),
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -98,6 +164,7 @@ def create_package():
     # 保存到数据库
     db.session.add(package)
     db.session.commit()
+    invalidate("packages")
 
     return (
         jsonify(
@@ -107,20 +174,88 @@ def create_package():
     )
 
 
-@packages_bp.route("/<int:package_id>", methods=["GET"])
-def get_package(package_id):
-    """获取单个数据包详情"""
-    package = LeadPackage.query.get_or_404(package_id)
+@packages_bp.route("/import", methods=["POST"])
+def import_packages():
+    """
+    从登记表批量导入数据包
+
+    请求体（multipart/form-data）:
+        - file: CSV 或 XLSX 文件，表头见 app/utils/package_import.py
+        - cost_per_lead: 登记表未填写单价时使用的单价 (默认 0)
 
-    # 获取关联的外呼任务
-    tasks = [task.to_dict() for task in package.dial_tasks.all()]
+    名称已存在的数据包跳过；不合法的行不影响其他行，在 errors 中返回行号和原因。
+    """
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"success": False, "error": "缺少上传文件: file"}), 400
 
-    # 获取标签汇总
-    tag_summaries = [summary.to_dict() for summary in package.tag_summaries.all()]
+    importer = PackageImporter(
+        chunk_size=current_app.config["PACKAGE_IMPORT_CHUNK_SIZE"],
+        default_cost_per_lead=request.form.get("cost_per_lead", 0.0, type=float),
+    )
 
-    result = package.to_dict()
-    result["dial_tasks"] = tasks
-    result["tag_summaries"] = tag_summaries
+    try:
+        result = importer.run(read_rows(upload.stream, upload.filename))
+    except (ImportRowError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": f"文件无法读取: {e}"}), 400
+
+    result.pop("resumed_from")
+    if result["inserted"]:
+        invalidate("packages")
+
+    return jsonify(
+        {
+            "success": True,
+            "data": result,
+            "message": f"成功导入 {result['inserted']} 个数据包",
+        }
+    )
+
+
+@packages_bp.route("/<int:package_id>", methods=["GET"])
+@etag(_package_fingerprint)
+def get_package(package_id):
+    """
+    获取单个数据包详情
+
+    查询参数:
+        - fields: 只返回指定字段，逗号分隔（总是包含 id）
+        - include: 内嵌的关联数据，逗号分隔: dial_tasks, tag_summaries（默认不内嵌）
+    """
+    include = parse_list(request.args.get("include"))
+    unknown = [name for name in include if name not in PACKAGE_INCLUDES]
+    if unknown:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": f"include 只能是: {', '.join(PACKAGE_INCLUDES)}",
+                }
+            ),
+            400,
+        )
+
+    try:
+        projection = PACKAGE.only(
+            parse_list(request.args.get("fields")), hidden=("tag_total",)
+        )
+    except InvalidFields as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    package = projection.query(LeadPackage.id == package_id).first()
+    if package is None:
+        abort(404)
+
+    result = projection.dump(package)
+
+    # 按需内嵌外呼任务和标签汇总
+    if "dial_tasks" in include:
+        result["dial_tasks"] = TASK.dump_many(
+            TASK.query(DialTask.package_id == package_id)
+        )
+    if "tag_summaries" in include:
+        result["tag_summaries"] = dump_tag_summaries(package_id, package.tag_total)
 
     return jsonify({"success": True, "data": result})
 
@@ -161,6 +296,7 @@ def update_package(package_id):
     package.calculate_metrics()
 
     db.session.commit()
+    invalidate("packages")
 
     return jsonify(
         {"success": True, "data": package.to_dict(), "message": "数据包更新成功"}
@@ -174,6 +310,7 @@ def delete_package(package_id):
 
     db.session.delete(package)
     db.session.commit()
+    invalidate("packages", "tasks", "calls")
 
     return jsonify({"success": True, "message": "数据包删除成功"})
 
@@ -181,9 +318,9 @@ def delete_package(package_id):
 @packages_bp.route("/<int:package_id>/tasks", methods=["GET"])
 def get_package_tasks(package_id):
     """获取数据包的所有外呼任务"""
-    package = LeadPackage.query.get_or_404(package_id)
+    LeadPackage.query.get_or_404(package_id)
 
-    tasks = [task.to_dict() for task in package.dial_tasks.all()]
+    tasks = TASK.dump_many(TASK.query(DialTask.package_id == package_id))
 
     return jsonify({"success": True, "data": tasks})
 
@@ -227,6 +364,7 @@ def create_package_task(package_id):
 
     db.session.add(task)
     db.session.commit()
+    invalidate("tasks")
 
     return (
         jsonify(
@@ -2,28 +2,140 @@
 外呼任务相关 API 路由
 """
 
-from flask import Blueprint, request, jsonify
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    request,
+    jsonify,
+    stream_with_context,
+)
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 from app import db
-from app.models import DialTask, Call, CallTag
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import DialTask, Call, PackageTagSummary
+from app.utils.cache import invalidate
+from app.utils.etag import etag, fingerprint, table_fingerprint
+from app.utils.call_ingest import (
+    CallValidationError,
+    insert_calls,
+    iter_json_array,
+    iter_ndjson,
+    parse_call,
+    remove_task_calls,
+)
+from app.utils.ingest_buffer import WriteInProgress, get_ingest_buffer
+from app.utils.pagination import InvalidCursor, clamp_per_page, keyset_paginate
+from app.utils.serializers import (
+    CALL,
+    TASK,
+    InvalidFields,
+    dump_calls,
+    parse_list,
+)
 
 tasks_bp = Blueprint("tasks", __name__)
 
+# 任务详情可内嵌的关联数据（?include=）
+TASK_INCLUDES = ("calls",)
+
+
+def _task_fingerprint(task_id):
+    """任务详情的指纹：任务本身（含计数器）和通话记录，任务不存在时返回 None"""
+    parts = fingerprint(
+        db.select(DialTask.updated_at).where(DialTask.id == task_id).scalar_subquery(),
+        *table_fingerprint(Call, Call.task_id == task_id),
+    )
+    return parts if parts[0] is not None else None
+
 
 @tasks_bp.route("/<int:task_id>", methods=["GET"])
+@etag(_task_fingerprint)
 def get_task(task_id):
-    """获取外呼任务详情"""
-    task = DialTask.query.get_or_404(task_id)
+    """
+    获取外呼任务详情
 
-    # 获取通话记录
-    calls = [call.to_dict() for call in task.calls.all()]
+    查询参数:
+        - fields: 只返回指定字段，逗号分隔（总是包含 id）
+        - include: 内嵌的关联数据，逗号分隔: calls；
+          缺省时内嵌通话记录（与之前一致），include= 为空时不内嵌
 
-    result = task.to_dict()
-    result["calls"] = calls
+    内嵌的通话记录只有最新的一页（TASK_DETAIL_CALLS_LIMIT 条）和下一页游标，
+    后续页通过 GET /<task_id>/calls?cursor=... 获取，
+    完整列表通过 GET /<task_id>/calls/stream 流式获取。
+    """
+    include = parse_list(request.args.get("include", "calls"))
+    unknown = [name for name in include if name not in TASK_INCLUDES]
+    if unknown:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": f"include 只能是: {', '.join(TASK_INCLUDES)}",
+                }
+            ),
+            400,
+        )
+
+    try:
+        projection = TASK.only(parse_list(request.args.get("fields")))
+    except InvalidFields as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    task = projection.query(DialTask.id == task_id).first()
+    if task is None:
+        abort(404)
+
+    result = projection.dump(task)
+
+    # 获取第一页通话记录
+    if "calls" in include:
+        calls, pagination = keyset_paginate(
+            CALL.query(Call.task_id == task_id),
+            (Call.call_time, Call.id),
+            per_page=current_app.config["TASK_DETAIL_CALLS_LIMIT"],
+        )
+        result["calls"] = dump_calls(calls)
+        result["calls_pagination"] = pagination
 
     return jsonify({"success": True, "data": result})
 
 
+@tasks_bp.route("/<int:task_id>/calls/stream", methods=["GET"])
+def stream_task_calls(task_id):
+    """
+    流式获取任务的全部通话记录（NDJSON，每行一条通话记录）
+
+    按 (call_time, id) 倒序分批读取，每批的标签一次加载，
+    内存占用与任务的通话总数无关。
+    """
+    DialTask.query.get_or_404(task_id)
+    batch_size = current_app.config["CALL_STREAM_BATCH_SIZE"]
+
+    def generate():
+        cursor = None
+        while True:
+            calls, pagination = keyset_paginate(
+                CALL.query(Call.task_id == task_id),
+                (Call.call_time, Call.id),
+                cursor=cursor,
+                per_page=batch_size,
+            )
+
+            # 只读取列值，不构造 ORM 对象
+            lines = [current_app.json.dumps(call) for call in dump_calls(calls)]
+            if lines:
+                yield "\n".join(lines) + "\n"
+
+            cursor = pagination["next_cursor"]
+            if cursor is None:
+                break
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 @tasks_bp.route("/<int:task_id>", methods=["PUT"])
 def update_task(task_id):
     """
@@ -53,6 +165,7 @@ def update_task(task_id):
         task.end_time = datetime.fromisoformat(data["end_time"])
 
     db.session.commit()
+    invalidate("tasks")
 
     return jsonify({"success": True, "data": task.to_dict(), "message": "任务更新成功"})
 
@@ -62,16 +175,31 @@ def delete_task(task_id):
     """删除外呼任务"""
     task = DialTask.query.get_or_404(task_id)
 
+    # 从标签汇总、每日汇总和数据包每日指标中减去该任务的通话（与删除同一事务）
+    PackageTagSummary.remove_task_tags(task)
+    remove_task_calls(task)
+
     db.session.delete(task)
     db.session.commit()
+    invalidate("packages", "tasks", "calls")
 
     return jsonify({"success": True, "message": "任务删除成功"})
 
 
 @tasks_bp.route("/<int:task_id>/calls", methods=["GET"])
 def get_task_calls(task_id):
-    """获取任务的所有通话记录"""
-    task = DialTask.query.get_or_404(task_id)
+    """
+    获取任务的所有通话记录
+
+    查询参数:
+        - page: 页码 (默认 1)
+        - per_page: 每页数量 (默认 50)
+        - result: 通话结果过滤
+        - cursor: 游标分页（按 call_time, id 倒序）。传空值获取第一页，
+                  之后传上一页返回的 next_cursor；传入时忽略 page
+        - with_total: 游标分页时是否返回总数 (1/0，默认 0)
+    """
+    DialTask.query.get_or_404(task_id)
 
     # 获取查询参数
     page = request.args.get("page", 1, type=int)
@@ -79,12 +207,33 @@ def get_task_calls(task_id):
     result_filter = request.args.get("result", type=str)
 
     # 构建查询
-    query = task.calls
+    query = CALL.query(Call.task_id == task_id)
 
     # 应用过滤
     if result_filter:
         query = query.filter(Call.result == result_filter)
 
+    # 游标分页
+    if "cursor" in request.args:
+        try:
+            calls, pagination = keyset_paginate(
+                query,
+                (Call.call_time, Call.id),
+                cursor=request.args.get("cursor"),
+                per_page=clamp_per_page(per_page),
+                with_total=request.args.get("with_total", 0, type=int) == 1,
+            )
+        except InvalidCursor as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        return jsonify(
+            {
+                "success": True,
+                "data": dump_calls(calls),
+                "pagination": pagination,
+            }
+        )
+
     # 排序：最新的在前
     query = query.order_by(Call.call_time.desc())
 
@@ -94,7 +243,7 @@ def get_task_calls(task_id):
     return jsonify(
         {
             "success": True,
-            "data": [call.to_dict() for call in pagination.items],
+            "data": dump_calls(pagination.items),
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -105,6 +254,28 @@ def get_task_calls(task_id):
     )
 
 
+def _wait_for_call(future):
+    """
+    等待写入缓冲区提交一条通话记录，返回通话记录 ID
+
+    超过 INGEST_BUFFER_TIMEOUT 时取消该记录：取消成功说明记录还在队列中，
+    之后不会再写入，抛出 FutureTimeoutError，客户端可以安全重试；
+    取消失败说明已经开始写入，再最多等待一个 INGEST_BUFFER_TIMEOUT，
+    仍没有结果时抛出 WriteInProgress（记录可能已经保存）。
+    """
+    timeout = current_app.config["INGEST_BUFFER_TIMEOUT"]
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        if future.cancel():
+            raise
+
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        raise WriteInProgress(f"等待写入结果超过 {timeout * 2} 秒") from None
+
+
 @tasks_bp.route("/<int:task_id>/calls", methods=["POST"])
 def create_call(task_id):
     """
@@ -124,63 +295,164 @@ def create_call(task_id):
                 {"tag_name": "industry", "tag_value": "科技"}
             ]
         }
+
+    启用 INGEST_BUFFER_ENABLED 时，记录经写入缓冲区与其他请求的记录合并提交。
     """
     task = DialTask.query.get_or_404(task_id)
-    data = request.get_json()
 
-    if not data.get("phone_number"):
-        return jsonify({"success": False, "error": "缺少必填字段: phone_number"}), 400
-
-    # 创建通话记录
-    call = Call(
-        task_id=task_id,
-        phone_number=data["phone_number"],
-        call_time=(
-            datetime.fromisoformat(data["call_time"])
-            if data.get("call_time")
-            else datetime.utcnow()
+    try:
+        row = parse_call(request.get_json())
+    except CallValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    buffer = get_ingest_buffer(current_app._get_current_object())
+
+    if buffer is not None:
+        # 交给写入缓冲区与其他请求的记录一起提交，提交成功后再返回
+        try:
+            future = buffer.submit(task.id, row)
+        except RuntimeError:
+            return jsonify({"success": False, "error": "写入缓冲区已关闭，请重试"}), 503
+
+        try:
+            call_id = _wait_for_call(future)
+        except WriteInProgress:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "error": "写入超时，记录可能已保存，请查询确认后再重试",
+                    }
+                ),
+                503,
+            )
+        except FutureTimeoutError:
+            return (
+                jsonify({"success": False, "error": "写入超时，记录未保存，请重试"}),
+                503,
+            )
+        except LookupError as e:
+            return jsonify({"success": False, "error": str(e)}), 404
+        except Exception:
+            current_app.logger.exception("写入通话记录失败: task_id=%s", task_id)
+            return jsonify({"success": False, "error": "写入数据库失败，请重试"}), 503
+    else:
+        # 写入通话记录和标签，并增量更新任务指标和每日汇总（同一事务）
+        (call_id,) = insert_calls(task, [row])
+        db.session.commit()
+        invalidate("tasks", "calls")
+
+    return (
+        jsonify(
+            {
+                "success": True,
+                "data": db.session.get(Call, call_id).to_dict(),
+                "message": "通话记录创建成功",
+            }
         ),
-        duration=data.get("duration", 0),
-        result=data.get("result", "no_answer"),
-        notes=data.get("notes"),
-        customer_name=data.get("customer_name"),
-        company=data.get("company"),
+        201,
     )
 
-    db.session.add(call)
-    db.session.flush()  # 获取 call.id
-
-    # 添加标签
-    if data.get("tags"):
-        for tag_data in data["tags"]:
-            tag = CallTag(
-                call_id=call.id,
-                tag_name=tag_data["tag_name"],
-                tag_value=tag_data.get("tag_value"),
-                tag_type=tag_data.get("tag_type", "custom"),
-            )
-            db.session.add(tag)
 
-    db.session.commit()
+@tasks_bp.route("/<int:task_id>/calls:bulk", methods=["POST"])
+def bulk_create_calls(task_id):
+    """
+    批量导入通话记录
 
-    # 更新任务指标
-    task.calculate_metrics()
-    db.session.commit()
+    请求体（流式读取，不要求一次读入内存）:
+        - Content-Type: application/json —— 通话记录数组 [{...}, {...}]
+        - 其他（如 application/x-ndjson）—— NDJSON，每行一条通话记录
+
+    每条记录的格式与 POST /<task_id>/calls 相同。
+    逐条校验，合法记录每 CALL_BULK_CHUNK_SIZE 条用多行 INSERT 写入并提交一次，
+    任务计数器和每日汇总按批更新。不合法的记录跳过并在 errors 中返回
+    （最多 CALL_BULK_MAX_ERRORS 条），某一批写入失败时该批全部计为失败。
+
+    返回:
+        {
+            "received": 收到的记录数,
+            "inserted": 成功写入数,
+            "failed": 失败数,
+            "errors": [{"index": 记录序号（从 0 开始）, "error": "错误信息"}]
+        }
+    """
+    task = DialTask.query.get_or_404(task_id)
+    chunk_size = current_app.config["CALL_BULK_CHUNK_SIZE"]
+    max_errors = current_app.config["CALL_BULK_MAX_ERRORS"]
+
+    if request.mimetype == "application/json":
+        records = iter_json_array(request.stream)
+    else:
+        records = iter_ndjson(request.stream)
+
+    summary = {"received": 0, "inserted": 0, "failed": 0}
+    errors = []
+    chunk = []
+
+    def add_error(index, error):
+        summary["failed"] += 1
+        if len(errors) < max_errors:
+            errors.append({"index": index, "error": error})
+
+    def flush():
+        try:
+            insert_calls(task, [row for _, row in chunk])
+            db.session.commit()
+            invalidate("tasks", "calls")
+            summary["inserted"] += len(chunk)
+        except SQLAlchemyError:
+            db.session.rollback()
+            current_app.logger.exception("批量写入通话记录失败: task_id=%s", task_id)
+            for index, _ in chunk:
+                add_error(index, "写入数据库失败")
+        chunk.clear()
+
+    while True:
+        # 只有读取和解码请求体的错误才算格式错误，写入过程中的异常照常抛出
+        try:
+            index, data = next(records)
+        except StopIteration:
+            break
+        except ValueError as e:
+            # 请求体格式错误：已读取的记录照常写入，之后的内容无法解析
+            add_error(summary["received"], str(e))
+            break
+
+        summary["received"] += 1
+        try:
+            if isinstance(data, CallValidationError):
+                raise data
+            chunk.append((index, parse_call(data)))
+        except CallValidationError as e:
+            add_error(index, str(e))
+            continue
+
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    status = 200 if summary["inserted"] or not summary["failed"] else 400
 
     return (
         jsonify(
-            {"success": True, "data": call.to_dict(), "message": "通话记录创建成功"}
+            {
+                "success": summary["failed"] == 0,
+                "data": {**summary, "errors": errors},
+            }
         ),
-        201,
+        status,
     )
 
 
 @tasks_bp.route("/<int:task_id>/metrics", methods=["POST"])
 def update_task_metrics(task_id):
-    """手动触发任务指标更新"""
+    """手动触发任务指标全量重算（修复计数器用）"""
     task = DialTask.query.get_or_404(task_id)
 
     task.calculate_metrics()
     db.session.commit()
+    invalidate("tasks")
 
     return jsonify({"success": True, "data": task.to_dict(), "message": "指标更新成功"})
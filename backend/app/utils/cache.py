@@ -0,0 +1,382 @@
+"""
+接口响应缓存
+
+仪表盘和指标接口每次请求都要重新计算多个聚合，而前端在窗口聚焦时就会刷新。
+这里按 (接口, 路径, 查询参数, 相关实体的版本号) 缓存完整的 JSON 响应：
+
+- 每类实体（packages / tasks / calls / metrics）有一个版本号，
+  写入路径提交后调用 invalidate() 把版本号加一，之前的缓存键自然失效，不需要逐个删除
+- 缓存同时带有 TTL（CACHE_DEFAULT_TTL 秒），兜底处理“今天”这类随时间变化的数据
+  以及其他进程（CLI、脚本）直接写库的情况
+
+后端由 CACHE_BACKEND 选择：
+- sqlite：本机共享的 SQLite 文件（CACHE_SQLITE_PATH），所有 worker 共用缓存和版本号（默认）
+- memory：进程内 LRU + TTL，只适用于单进程部署。多个 gunicorn worker 各自缓存，
+  版本号也只在本进程内递增，写入后其他 worker 仍会返回旧数据直到 TTL 过期
+- 多台机器（多个容器副本）之间不共享缓存，依赖 TTL 过期
+- null：不缓存
+
+200 响应带有由缓存键（接口、查询参数、实体版本号）和 TTL 时间片得到的弱 ETag，
+在调用接口之前就能算出：请求的 If-None-Match 一致时直接返回 304，不查缓存也不执行接口。
+时间片使 ETag 至少每个 TTL 变化一次，与缓存过期一致（缓存条目在时间片结束时过期）；
+各缓存键的时间片起点按键错开，避免所有接口同时过期。
+null 后端没有版本号（以及 TTL 不大于 0 时）不缓存，ETag 退回到对响应体做哈希。
+
+命中/未命中次数按接口统计（当前进程），通过 GET /api/metrics/cache 查看。
+"""
+
+import functools
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask import current_app, request
+
+_init_lock = threading.Lock()
+
+
+class MemoryBackend:
+    """进程内 LRU + TTL 缓存"""
+
+    name = "memory"
+    versioned = True
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counters(self, names):
+        with self._lock:
+            return [self._counters.get(name, 0) for name in names]
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """
+    本机共享的 SQLite 文件缓存
+
+    每个线程使用自己的连接，并且在第一次使用时才连接，
+    不会在 gunicorn fork 之前打开连接。
+    """
+
+    name = "sqlite"
+    versioned = True
+
+    # 每次写入时清理过期记录的概率
+    PURGE_PROBABILITY = 0.01
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_counters "
+                "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = (
+            self._connect()
+            .execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) "
+            "VALUES (?, ?, ?)",
+            (key, value, now + ttl),
+        )
+        if random.random() < self.PURGE_PROBABILITY:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+
+    def get_counters(self, names):
+        placeholders = ", ".join("?" for _ in names)
+        rows = (
+            self._connect()
+            .execute(
+                f"SELECT name, value FROM cache_counters WHERE name IN ({placeholders})",
+                list(names),
+            )
+            .fetchall()
+        )
+        values = dict(rows)
+        return [values.get(name, 0) for name in names]
+
+    def incr(self, name):
+        self._connect().execute(
+            "INSERT INTO cache_counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache_entries")
+
+
+class NullBackend:
+    """不缓存"""
+
+    name = "null"
+    versioned = False
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def get_counters(self, names):
+        return [0 for _ in names]
+
+    def incr(self, name):
+        pass
+
+    def clear(self):
+        pass
+
+
+class ResponseCache:
+    """
+    响应缓存
+
+    Args:
+        backend: 缓存后端
+        default_ttl: 默认过期时间（秒）
+    """
+
+    def __init__(self, backend, default_ttl=60):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def invalidate(self, *entities):
+        """实体写入后调用：版本号加一，相关接口的缓存随之失效"""
+        for entity in entities:
+            self.backend.incr(f"generation:{entity}")
+
+    def make_key(self, entities):
+        """缓存键：接口 + 路径 + 排序后的查询参数 + 实体版本号"""
+        generations = self.backend.get_counters(
+            [f"generation:{entity}" for entity in entities]
+        )
+        args = sorted(request.args.items(multi=True))
+        return json.dumps(
+            [request.endpoint, request.path, args, generations],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    @staticmethod
+    def time_slice(key, ttl):
+        """
+        当前所在的时间片编号和剩余秒数
+
+        时间片长度为 ttl，起点按缓存键的哈希错开。
+        """
+        now = time.time() + zlib.crc32(key.encode("utf-8")) % ttl
+        return int(now // ttl), ttl - now % ttl
+
+    def serve(self, entities, ttl, view):
+        """
+        返回缓存的响应；未命中时调用 view 生成并缓存（只缓存 200 响应）
+
+        If-None-Match 与当前 ETag 一致时直接返回 304，不调用 view。
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if not self.backend.versioned or ttl <= 0:
+            return self._serve_uncached(view)
+
+        key = self.make_key(entities)
+        slice_id, remaining = self.time_slice(key, ttl)
+        key = f"{key}#{slice_id}"
+        tag = hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+        if request.if_none_match.contains_weak(tag):
+            self._record(request.endpoint, hit=True)
+            response = current_app.response_class(status=304)
+            response.set_etag(tag, weak=True)
+            response.headers["X-Cache"] = "HIT"
+            return response
+
+        cached = self.backend.get(key)
+
+        if cached is not None:
+            self._record(request.endpoint, hit=True)
+            entry = json.loads(cached)
+            response = current_app.response_class(
+                entry["body"], status=entry["status"], mimetype=entry["mimetype"]
+            )
+            response.set_etag(tag, weak=True)
+            response.headers["X-Cache"] = "HIT"
+            return response
+
+        self._record(request.endpoint, hit=False)
+        response = current_app.make_response(view())
+        response.headers["X-Cache"] = "MISS"
+
+        if response.status_code != 200 or response.is_streamed:
+            return response
+
+        response.set_etag(tag, weak=True)
+        self.backend.set(
+            key,
+            json.dumps(
+                {
+                    "body": response.get_data(as_text=True),
+                    "status": response.status_code,
+                    "mimetype": response.mimetype,
+                },
+                ensure_ascii=False,
+            ).encode("utf-8"),
+            remaining,
+        )
+        return response
+
+    def _serve_uncached(self, view):
+        """不缓存时：调用 view，200 响应附带响应体的 ETag"""
+        self._record(request.endpoint, hit=False)
+        response = current_app.make_response(view())
+        response.headers["X-Cache"] = "MISS"
+
+        if response.status_code != 200 or response.is_streamed:
+            return response
+
+        response.add_etag()
+        return response.make_conditional(request)
+
+    def _record(self, endpoint, hit):
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def stats(self):
+        """命中统计（当前进程）"""
+        with self._stats_lock:
+            endpoints = {name: dict(stats) for name, stats in self._stats.items()}
+
+        hits = sum(stats["hits"] for stats in endpoints.values())
+        misses = sum(stats["misses"] for stats in endpoints.values())
+
+        return {
+            "backend": self.backend.name,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+def _create_backend(config):
+    """根据配置创建缓存后端"""
+    name = config.get("CACHE_BACKEND", "sqlite")
+
+    if name == "memory":
+        return MemoryBackend(max_entries=config.get("CACHE_MAX_ENTRIES", 1024))
+    if name == "sqlite":
+        return SQLiteBackend(config["CACHE_SQLITE_PATH"])
+    if name == "null":
+        return NullBackend()
+
+    raise ValueError(f"不支持的缓存后端: {name}")
+
+
+def get_cache(app=None):
+    """获取应用的响应缓存（第一次使用时按配置创建）"""
+    app = app or current_app._get_current_object()
+
+    cache = app.extensions.get("response_cache")
+    if cache is None:
+        with _init_lock:
+            cache = app.extensions.get("response_cache")
+            if cache is None:
+                cache = ResponseCache(
+                    _create_backend(app.config),
+                    default_ttl=app.config.get("CACHE_DEFAULT_TTL", 60),
+                )
+                app.extensions["response_cache"] = cache
+
+    return cache
+
+
+def invalidate(*entities):
+    """写入路径提交后调用，使依赖这些实体的缓存失效"""
+    get_cache().invalidate(*entities)
+
+
+def cached(*entities, ttl=None):
+    """
+    缓存接口响应的装饰器
+
+    用法:
+        @metrics_bp.route("/dashboard")
+        @cached("packages", "calls")
+        def get_dashboard_metrics(): ...
+
+    Args:
+        entities: 接口依赖的实体，任一实体写入后缓存失效
+        ttl: 过期时间（秒），为空时使用 CACHE_DEFAULT_TTL
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return get_cache().serve(entities, ttl, lambda: view(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,377 @@
+"""
+通话记录写入
+
+单条创建（POST /api/tasks/<id>/calls）和批量导入（POST /api/tasks/<id>/calls:bulk）
+共用这里的校验和写入逻辑：
+
+- parse_call：校验并规范化一条通话记录（含标签）
+- insert_calls：在当前事务中批量插入通话和标签，并一次性更新任务计数器、每日汇总和标签汇总
+- remove_task_calls：删除任务前从每日汇总和数据包每日指标中减去该任务的通话
+- iter_ndjson / iter_json_array：增量读取请求体，不把整个请求体读入内存
+"""
+
+import codecs
+import json
+from datetime import datetime
+
+from app import db
+from app.models import (
+    Call,
+    CallTag,
+    DailyPackageMetrics,
+    DialTask,
+    MetricsSummary,
+    PackageTagSummary,
+)
+from app.utils.date_range import (
+    business_date_expr,
+    parse_sql_date,
+    to_business_date,
+    to_utc,
+)
+
+# 通话记录字段（标签以外）
+CALL_FIELDS = (
+    "phone_number",
+    "call_time",
+    "duration",
+    "result",
+    "notes",
+    "customer_name",
+    "company",
+)
+
+# 请求体每次读取的字节数
+READ_SIZE = 64 * 1024
+
+
+class CallValidationError(ValueError):
+    """通话记录校验失败"""
+
+
+def parse_call(data):
+    """
+    校验并规范化一条通话记录
+
+    Returns:
+        {"phone_number": ..., "call_time": datetime, ..., "tags": [...]}
+
+    Raises:
+        CallValidationError: 数据不合法
+    """
+    if not isinstance(data, dict):
+        raise CallValidationError("通话记录必须是 JSON 对象")
+
+    if not data.get("phone_number"):
+        raise CallValidationError("缺少必填字段: phone_number")
+
+    try:
+        call_time = (
+            datetime.fromisoformat(data["call_time"])
+            if data.get("call_time")
+            else datetime.utcnow()
+        )
+    except (TypeError, ValueError):
+        raise CallValidationError("call_time 格式错误，应为 ISO 8601 时间")
+
+    # 带时区偏移的时间换算为 UTC naive（与数据库存储一致），不带偏移的按 UTC 处理
+    if call_time.tzinfo is not None:
+        call_time = to_utc(call_time)
+
+    try:
+        duration = int(data.get("duration") or 0)
+    except (TypeError, ValueError):
+        raise CallValidationError("duration 必须是整数")
+    if duration < 0:
+        raise CallValidationError("duration 不能为负数")
+
+    tags = []
+    for tag_data in data.get("tags") or []:
+        if not isinstance(tag_data, dict) or not tag_data.get("tag_name"):
+            raise CallValidationError("标签缺少必填字段: tag_name")
+
+        tags.append(
+            {
+                "tag_name": tag_data["tag_name"],
+                "tag_value": tag_data.get("tag_value"),
+                "tag_type": tag_data.get("tag_type", "custom"),
+            }
+        )
+
+    return {
+        "phone_number": data["phone_number"],
+        "call_time": call_time,
+        "duration": duration,
+        "result": data.get("result", "no_answer"),
+        "notes": data.get("notes"),
+        "customer_name": data.get("customer_name"),
+        "company": data.get("company"),
+        "tags": tags,
+    }
+
+
+def insert_calls(task, rows):
+    """
+    批量插入同一任务的通话记录（不提交事务）
+
+    通话和标签各用一条多行 INSERT 写入，
+    任务计数器、每日汇总、数据包每日指标和标签汇总按本批数据合并后各更新一次。
+
+    Args:
+        task: DialTask
+        rows: parse_call 返回的记录列表
+
+    Returns:
+        新通话记录的 ID 列表（与 rows 顺序一致）
+    """
+    if not rows:
+        return []
+
+    call_ids = (
+        db.session.execute(
+            db.insert(Call).returning(Call.id, sort_by_parameter_order=True),
+            [
+                {"task_id": task.id, **{name: row[name] for name in CALL_FIELDS}}
+                for row in rows
+            ],
+        )
+        .scalars()
+        .all()
+    )
+
+    tag_values = []
+    tag_summary_counts = {}
+    total = {"calls": 0, "connected": 0, "interested": 0}
+    by_day = {}
+
+    for call_id, row in zip(call_ids, rows):
+        connected = 1 if row["result"] == "connected" else 0
+        interested = 0
+        tag_counts = {}
+
+        for tag in row["tags"]:
+            tag_values.append({"call_id": call_id, **tag})
+            key = (tag["tag_name"], tag["tag_value"])
+            tag_summary_counts[key] = tag_summary_counts.get(key, 0) + 1
+            tag_counts[tag["tag_name"]] = tag_counts.get(tag["tag_name"], 0) + 1
+            if tag["tag_name"] == "interest_level" and tag["tag_value"] == "high":
+                interested = 1
+
+        total["calls"] += 1
+        total["connected"] += connected
+        total["interested"] += interested
+
+        day = by_day.setdefault(
+            to_business_date(row["call_time"]),
+            {
+                "calls": 0,
+                "connected": 0,
+                "duration": 0,
+                "interested": 0,
+                "tag_counts": {},
+            },
+        )
+        day["calls"] += 1
+        day["connected"] += connected
+        day["duration"] += row["duration"]
+        day["interested"] += interested
+        for tag_name, count in tag_counts.items():
+            day["tag_counts"][tag_name] = day["tag_counts"].get(tag_name, 0) + count
+
+    if tag_values:
+        db.session.execute(db.insert(CallTag), tag_values)
+
+        # 增量更新数据包标签汇总
+        PackageTagSummary.record_tags(task.package_id, tag_summary_counts)
+
+    # 增量更新任务指标（与通话记录同一事务）
+    DialTask.increment_counters(
+        task.id,
+        total_calls=total["calls"],
+        connected_calls=total["connected"],
+        interested_calls=total["interested"],
+    )
+
+    # 增量累加每日指标汇总
+    for call_date, day in by_day.items():
+        MetricsSummary.record_calls(
+            call_date,
+            total_calls=day["calls"],
+            connected_calls=day["connected"],
+            total_duration=day["duration"],
+        )
+        DailyPackageMetrics.record_calls(
+            call_date,
+            task.package_id,
+            total_calls=day["calls"],
+            connected_calls=day["connected"],
+            total_duration=day["duration"],
+            interested_calls=day["interested"],
+            tag_counts=day["tag_counts"],
+        )
+
+    return call_ids
+
+
+def remove_task_calls(task):
+    """
+    从每日汇总和数据包每日指标中减去某个任务的全部通话（删除任务前调用，不提交事务）
+
+    按业务日期聚合该任务的通话和标签，再以负数增量调用 record_calls，
+    与 insert_calls 的累加互为逆操作。
+
+    Args:
+        task: DialTask
+    """
+    call_day = business_date_expr(Call.call_time)
+
+    interested = (
+        db.session.query(CallTag.call_id)
+        .filter(CallTag.tag_name == "interest_level", CallTag.tag_value == "high")
+        .distinct()
+        .subquery()
+    )
+
+    call_rows = (
+        db.session.query(
+            call_day,
+            db.func.count(Call.id),
+            db.func.sum(db.case((Call.result == "connected", 1), else_=0)),
+            db.func.coalesce(db.func.sum(Call.duration), 0),
+            db.func.count(interested.c.call_id),
+        )
+        .outerjoin(interested, interested.c.call_id == Call.id)
+        .filter(Call.task_id == task.id)
+        .group_by(call_day)
+        .all()
+    )
+
+    tag_rows = (
+        db.session.query(call_day, CallTag.tag_name, db.func.count(CallTag.id))
+        .join(Call, Call.id == CallTag.call_id)
+        .filter(Call.task_id == task.id)
+        .group_by(call_day, CallTag.tag_name)
+        .all()
+    )
+
+    tag_counts = {}
+    for day, tag_name, count in tag_rows:
+        tag_counts.setdefault(parse_sql_date(day), {})[tag_name] = -count
+
+    for day, calls, connected, duration, interested_count in call_rows:
+        day = parse_sql_date(day)
+        MetricsSummary.record_calls(
+            day,
+            total_calls=-calls,
+            connected_calls=-int(connected),
+            total_duration=-int(duration),
+        )
+        DailyPackageMetrics.record_calls(
+            day,
+            task.package_id,
+            total_calls=-calls,
+            connected_calls=-int(connected),
+            total_duration=-int(duration),
+            interested_calls=-interested_count,
+            tag_counts=tag_counts.get(day),
+        )
+
+
+def _iter_text(stream):
+    """按块读取二进制流并增量解码为文本"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(chunk)
+
+
+def iter_ndjson(stream):
+    """
+    逐行读取 NDJSON 请求体
+
+    Yields:
+        (行号, 解析结果)：解析失败时解析结果为 CallValidationError
+    """
+    index = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            yield index, json.loads(line)
+        except (UnicodeDecodeError, ValueError):
+            yield index, CallValidationError("JSON 格式错误")
+        index += 1
+
+
+def iter_json_array(stream):
+    """
+    增量读取 JSON 数组请求体（元素必须是对象）
+
+    Yields:
+        (下标, 对象)
+
+    Raises:
+        ValueError: 数组格式错误（错误之前的元素已经产出）
+    """
+    decoder = json.JSONDecoder()
+    chunks = _iter_text(stream)
+    buffer = ""
+    pos = 0
+    index = 0
+    expect = "["  # 期望的下一个符号：[ / 元素 / , 或 ]
+
+    def more():
+        nonlocal buffer, pos
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    while True:
+        # 跳过空白
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos >= len(buffer):
+            if not more():
+                raise ValueError("JSON 数组不完整")
+            continue
+
+        char = buffer[pos]
+
+        if expect == "[":
+            if char != "[":
+                raise ValueError("请求体必须是 JSON 数组或 NDJSON")
+            pos += 1
+            expect = "value_or_end"
+        elif expect in ("value", "value_or_end"):
+            if char == "]" and expect == "value_or_end":
+                return
+            if char != "{":
+                raise ValueError(f"第 {index} 个元素必须是 JSON 对象")
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # 对象还没有读完整
+                if not more():
+                    raise ValueError(f"第 {index} 个元素 JSON 格式错误")
+                continue
+            pos = end
+            yield index, value
+            index += 1
+            expect = "separator"
+        else:
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"第 {index} 个元素之前缺少逗号")
+            pos += 1
+            expect = "value"
@@ -0,0 +1,152 @@
+"""
+日期范围工具
+
+数据库中的时间字段（call_time、start_time、created_at 等）统一按 UTC 存储，
+而业务上的“今天”“本月”按呼叫中心所在时区（默认 UTC+8）划分。
+
+这里把业务日期转换成半开区间 [start, end) 的 UTC 时间戳，
+查询时直接比较原始列（column >= start AND column < end），
+避免 func.date(column) == day 这类写法导致索引失效。
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import cast, func, literal_column
+from sqlalchemy.types import Date
+
+from app import db
+
+DEFAULT_BUSINESS_TIMEZONE = "Asia/Shanghai"
+
+
+def get_business_timezone():
+    """获取业务时区（配置项 BUSINESS_TIMEZONE）"""
+    name = current_app.config.get("BUSINESS_TIMEZONE") or DEFAULT_BUSINESS_TIMEZONE
+    return ZoneInfo(name)
+
+
+def business_now():
+    """业务时区的当前时间"""
+    return datetime.now(get_business_timezone())
+
+
+def business_today():
+    """业务时区的今天"""
+    return business_now().date()
+
+
+def to_utc(value):
+    """把业务时区的日期/时间转换为 UTC naive 时间（与数据库存储一致）"""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=get_business_timezone())
+
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_business_date(value):
+    """把数据库中的 UTC naive 时间转换为业务日期"""
+    if value is None:
+        return None
+
+    return value.replace(tzinfo=timezone.utc).astimezone(get_business_timezone()).date()
+
+
+def day_range(day):
+    """
+    某个业务日期对应的 UTC 时间区间
+
+    Returns:
+        (start, end)：满足 start <= column < end 即属于该日期
+    """
+    return to_utc(day), to_utc(day + timedelta(days=1))
+
+
+def date_range(start_date, end_date):
+    """
+    业务日期区间 [start_date, end_date]（含两端）对应的 UTC 时间区间
+
+    任一端为 None 时对应的边界也为 None，表示不限制。
+    """
+    start = to_utc(start_date) if start_date else None
+    end = to_utc(end_date + timedelta(days=1)) if end_date else None
+    return start, end
+
+
+def month_bounds(day):
+    """
+    某个业务日期所在月份的第一天和下个月第一天
+
+    Returns:
+        (first_day, next_month_first_day)
+    """
+    first_day = date(day.year, day.month, 1)
+
+    if day.month == 12:
+        next_month = date(day.year + 1, 1, 1)
+    else:
+        next_month = date(day.year, day.month + 1, 1)
+
+    return first_day, next_month
+
+
+def month_range(day):
+    """
+    某个业务日期所在月份对应的 UTC 时间区间
+
+    Returns:
+        (start, end)：满足 start <= column < end 即属于该月份
+    """
+    first_day, next_month = month_bounds(day)
+    return to_utc(first_day), to_utc(next_month)
+
+
+def filter_range(column, start, end):
+    """
+    生成半开区间过滤条件列表
+
+    用法：query.filter(*filter_range(Call.call_time, *day_range(today)))
+    """
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    return conditions
+
+
+def business_date_expr(column):
+    """
+    把 UTC 时间列转换为业务日期的 SQL 表达式（用于 GROUP BY 日期）
+
+    按当前时刻的时区偏移换算，适用于没有夏令时的时区（如 Asia/Shanghai）。
+    SQLite 返回 'YYYY-MM-DD' 字符串，其他数据库返回日期，
+    读取结果时用 parse_sql_date 统一转换。
+    """
+    # 偏移量以字面量写入 SQL：SELECT 和 GROUP BY 中的表达式必须完全一致，
+    # 使用绑定参数时 PostgreSQL 无法判断两处参数相同
+    seconds = int(business_now().utcoffset().total_seconds())
+
+    if db.session.get_bind().dialect.name == "sqlite":
+        return func.date(column, literal_column(f"'{seconds:+d} seconds'"))
+
+    return cast(column + literal_column(f"INTERVAL '{seconds} seconds'"), Date)
+
+
+def parse_sql_date(value):
+    """把 business_date_expr 查询结果转换为 date"""
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def iter_days(start_date, end_date):
+    """按天遍历 [start_date, end_date]（含两端）"""
+    current = start_date
+    while current <= end_date:
+        yield current
+        current += timedelta(days=1)
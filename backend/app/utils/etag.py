@@ -0,0 +1,92 @@
+"""
+ETag / If-None-Match 条件请求
+
+前端 SWR 轮询时大部分数据并没有变化。这里不对序列化后的响应体做哈希，
+而是先用一条廉价的聚合查询得到数据的“指纹”（行数、max(updated_at)、max(id) 等），
+由指纹生成强 ETag：
+
+- 请求携带的 If-None-Match 与当前 ETag 一致时直接返回 304，不执行接口查询也不序列化
+- 否则正常生成响应并附带 ETag
+
+指纹必须覆盖响应中的所有数据：updated_at 由模型的 onupdate 维护，
+计数器的批量 UPDATE 同样会刷新 updated_at；删除通过行数变化体现。
+"""
+
+import functools
+import hashlib
+import json
+from datetime import date, datetime
+
+from flask import current_app, request
+
+from app import db
+
+
+def make_etag(*parts):
+    """由指纹生成 ETag 值（不含引号）"""
+    raw = json.dumps(
+        [request.full_path, *parts],
+        default=lambda v: v.isoformat() if isinstance(v, (datetime, date)) else str(v),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def table_fingerprint(model, *conditions):
+    """
+    某张表（满足条件的行）的指纹表达式：行数、max(id)、max(updated_at)
+
+    Returns:
+        三个标量子查询，可直接放进一条 SELECT 中
+    """
+    columns = (
+        db.func.count(model.id),
+        db.func.max(model.id),
+        db.func.max(model.updated_at),
+    )
+    return tuple(
+        db.select(column).where(*conditions).scalar_subquery() for column in columns
+    )
+
+
+def fingerprint(*expressions):
+    """用一条 SELECT 计算多个指纹表达式"""
+    return list(db.session.execute(db.select(*expressions)).one())
+
+
+def etag(compute):
+    """
+    条件请求装饰器
+
+    用法:
+        @packages_bp.route("/<int:package_id>")
+        @etag(lambda package_id: package_fingerprint(package_id))
+        def get_package(package_id): ...
+
+    Args:
+        compute: 接收视图参数、返回指纹的函数；返回 None 时不处理（如资源不存在）
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            parts = compute(*args, **kwargs)
+            if parts is None:
+                return view(*args, **kwargs)
+
+            tag = make_etag(*parts)
+
+            if request.if_none_match.contains(tag):
+                response = current_app.response_class(status=304)
+                response.set_etag(tag)
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(tag)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,229 @@
+"""
+通话记录写入缓冲区（组提交）
+
+外呼平台逐条推送通话记录时，每个请求都要单独提交一次事务。
+启用缓冲区（INGEST_BUFFER_ENABLED）后，各请求线程把校验好的记录交给后台写入线程，
+写入线程每 INGEST_BUFFER_FLUSH_INTERVAL_MS 毫秒或攒够 INGEST_BUFFER_MAX_ROWS 条
+就用一个事务写入这一组记录，提交成功后才通知各请求返回。
+
+- 吞吐量随每组记录数增长，而不是受限于单次提交的延迟
+- 单个请求的额外等待时间不超过一个刷新间隔加一次写入的耗时
+- 整组写入失败时逐条重试，只有出错的记录返回失败
+- 请求等待超时后取消自己的记录，写入线程跳过已取消的记录，客户端重试不会产生重复数据
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app import db
+from app.models import DialTask
+from app.utils.cache import invalidate
+from app.utils.call_ingest import insert_calls
+
+logger = logging.getLogger(__name__)
+
+# 通知写入线程退出的标记
+_STOP = object()
+
+_init_lock = threading.Lock()
+
+
+class WriteInProgress(Exception):
+    """记录已经开始写入，但在等待时间内没有得到结果（记录可能已经保存）"""
+
+
+class IngestBuffer:
+    """
+    通话记录写入缓冲区
+
+    Args:
+        app: Flask 应用（写入线程在该应用的上下文中运行）
+        flush_interval: 刷新间隔（秒）
+        max_rows: 每组最多记录数
+    """
+
+    def __init__(self, app, flush_interval=0.02, max_rows=500):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.stats = {"groups": 0, "rows": 0, "retried_groups": 0}
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, task_id, row):
+        """
+        提交一条通话记录
+
+        Args:
+            task_id: 任务 ID
+            row: parse_call 返回的记录
+
+        Returns:
+            Future：所在组提交成功后结果为通话记录 ID，失败时为对应的异常。
+            写入前 cancel() 成功的记录不会再写入
+
+        Raises:
+            RuntimeError: 缓冲区已关闭
+        """
+        future = Future()
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("写入缓冲区已关闭")
+
+            # 写入线程在第一次提交时启动（避免在 gunicorn fork 之前创建线程）
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="ingest-buffer", daemon=True
+                )
+                self._thread.start()
+
+            self._queue.put((task_id, row, future))
+
+        return future
+
+    def close(self, timeout=None):
+        """写入剩余的记录并停止写入线程"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self):
+        """写入线程：收集一组记录并写入"""
+        stopping = False
+
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            # 从收到第一条记录开始计时，最多等待一个刷新间隔
+            group = [item]
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(group) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+                if item is _STOP:
+                    stopping = True
+                    break
+                group.append(item)
+
+            self._flush(group)
+
+    def _flush(self, group):
+        """用一个事务写入一组记录，失败时逐条重试"""
+        # 跳过已取消（请求等待超时）的记录；其余记录标记为写入中，之后不能再取消
+        group = [item for item in group if item[2].set_running_or_notify_cancel()]
+        if not group:
+            return
+
+        results = []
+        try:
+            with self.app.app_context():
+                try:
+                    results = self._write(group)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("组提交失败，逐条重试: %d 条", len(group))
+                    self.stats["retried_groups"] += 1
+                    results = [self._write_one(item) for item in group]
+                finally:
+                    db.session.remove()
+
+            self.stats["groups"] += 1
+            self.stats["rows"] += len(group)
+        except Exception as e:
+            logger.exception("写入线程处理失败: %d 条", len(group))
+            results = [e] * len(group)
+        finally:
+            # 无论如何都要通知每个请求，否则请求线程会一直等待
+            for i, (_, _, future) in enumerate(group):
+                result = results[i] if i < len(results) else None
+                if result is None:
+                    future.set_exception(RuntimeError("写入线程异常退出"))
+                elif isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _write_one(self, item):
+        """单独写入一条记录"""
+        try:
+            return self._write([item])[0]
+        except Exception as e:
+            db.session.rollback()
+            return e
+
+    def _write(self, group):
+        """
+        写入一组记录并提交
+
+        Returns:
+            与 group 顺序一致的结果列表：通话记录 ID，或任务不存在时的 LookupError
+        """
+        task_ids = {task_id for task_id, _, _ in group}
+        tasks = {
+            task.id: task
+            for task in DialTask.query.filter(DialTask.id.in_(task_ids)).all()
+        }
+
+        results = [None] * len(group)
+        by_task = {}
+        for i, (task_id, row, _) in enumerate(group):
+            if task_id in tasks:
+                by_task.setdefault(task_id, []).append((i, row))
+            else:
+                results[i] = LookupError(f"任务不存在: {task_id}")
+
+        for task_id, items in by_task.items():
+            call_ids = insert_calls(tasks[task_id], [row for _, row in items])
+            for (i, _), call_id in zip(items, call_ids):
+                results[i] = call_id
+
+        db.session.commit()
+        invalidate("tasks", "calls")
+        return results
+
+
+def get_ingest_buffer(app):
+    """
+    获取应用的写入缓冲区，未启用时返回 None
+
+    缓冲区在第一次使用时创建，进程退出前写入剩余的记录。
+    """
+    if not app.config.get("INGEST_BUFFER_ENABLED"):
+        return None
+
+    with _init_lock:
+        buffer = app.extensions.get("ingest_buffer")
+        if buffer is None:
+            buffer = IngestBuffer(
+                app,
+                flush_interval=app.config["INGEST_BUFFER_FLUSH_INTERVAL_MS"] / 1000,
+                max_rows=app.config["INGEST_BUFFER_MAX_ROWS"],
+            )
+            app.extensions["ingest_buffer"] = buffer
+            atexit.register(buffer.close)
+
+    return buffer
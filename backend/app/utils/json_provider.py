@@ -0,0 +1,183 @@
+"""
+JSON 编码器
+
+jsonify 默认使用标准库 json 编码，列表接口和导出中序列化占了大部分 CPU 时间。
+这里提供基于 orjson 的 JSON provider，由 JSON_ENCODER 选择：
+
+- auto：安装了 orjson 时使用 orjson，否则使用标准库（默认）
+- orjson：使用 orjson（未安装时启动报错）
+- stdlib：使用 Flask 默认的标准库编码器
+
+orjson 编码结果与标准库解析后完全一致：键同样排序，datetime、Decimal 等类型
+仍交给 Flask 默认的转换函数处理。与标准库一样按 ensure_ascii（默认开启）
+把非 ASCII 字符转义为 \\uXXXX，很小或很大的浮点数同样写成 1e-05、1e+16，
+接口响应与标准库逐字节相同；dumps() 的区别只在空白：输出总是紧凑格式。
+遇到 orjson 不支持的参数或数据（如超过 64 位的整数，以及 NaN、Infinity ——
+orjson 会输出 null，标准库输出 NaN）时回退到标准库。
+"""
+
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 是可选依赖
+    orjson = None
+
+JSON_ENCODERS = ("auto", "orjson", "stdlib")
+
+# orjson 能够处理的 json.dumps 参数，其余参数回退到标准库
+_SUPPORTED_ARGS = {"default", "sort_keys", "ensure_ascii", "indent", "separators"}
+
+# backslashreplace 生成的 JSON 不支持的转义：\xNN 和 \UNNNNNNNN（成对的 \\ 原样跳过）
+_PYTHON_ESCAPE = re.compile(rb"\\(?:\\|x([0-9a-f]{2})|U([0-9a-f]{8}))")
+
+
+def _json_escape(match):
+    """把 Python 的转义改写为 JSON 的 \\uXXXX（BMP 以外的字符转为代理对）"""
+    if match.group(1) is not None:
+        return b"\\u00" + match.group(1)
+    if match.group(2) is not None:
+        code = int(match.group(2), 16) - 0x10000
+        return b"\\u%04x\\u%04x" % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return match.group()
+
+
+def escape_non_ascii(data):
+    """
+    把 orjson 输出中的非 ASCII 字符转义为 \\uXXXX（与标准库 ensure_ascii=True 一致）
+
+    中文等 BMP 字符由 backslashreplace 直接生成 \\uXXXX，
+    只有少见的 \\xNN（U+0080-U+00FF）和 \\UNNNNNNNN（如 emoji）需要再改写。
+    """
+    if not data.isascii():
+        data = data.decode("utf-8").encode("ascii", "backslashreplace")
+        if b"\\x" in data or b"\\U" in data:
+            data = _PYTHON_ESCAPE.sub(_json_escape, data)
+    # 标准库同样转义 DEL
+    return data.replace(b"\x7f", b"\\u007f")
+
+
+# 浮点数：orjson 对很小或很大的数输出 0.00001、1e16，标准库（repr）输出 1e-05、1e+16。
+# 先粗筛（小于 1e-4 的小数、指数），命中后再逐个数字重新格式化（跳过字符串）
+_EXPONENT_HINT = re.compile(rb"e[-1-9]")
+_NUMBER = re.compile(rb'"(?:[^"\\]|\\.)*"|-?[0-9]+(?:\.[0-9]+)?(?:e-?[0-9]+)?')
+
+
+def _python_float(match):
+    """浮点数按 Python repr 重新格式化，字符串和整数原样返回"""
+    token = match.group()
+    if token[:1] == b'"' or (b"." not in token and b"e" not in token):
+        return token
+    return repr(float(token)).encode("ascii")
+
+
+def normalize_floats(data):
+    """把 orjson 输出中浮点数的写法改为与标准库一致"""
+    if b"0.0000" not in data and _EXPONENT_HINT.search(data) is None:
+        return data
+    return _NUMBER.sub(_python_float, data)
+
+
+def has_non_finite(obj):
+    """数据中是否含有 NaN 或 Infinity（orjson 会把它们编码为 null）"""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        for item in value.values() if type(value) is dict else value:
+            kind = type(item)
+            if kind is float:
+                if item - item != 0.0:
+                    return True
+            elif kind is dict or kind is list or kind is tuple:
+                stack.append(item)
+    return False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """使用 orjson 编码的 JSON provider（解码仍使用标准库）"""
+
+    def _option(self, sort_keys, indent):
+        """
+        json.dumps 参数对应的 orjson 选项
+
+        datetime/date/time 交给 default 处理（Flask 输出 HTTP 日期格式），
+        非字符串的键与标准库一样转为字符串。
+        """
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _encode(self, obj, default, option, ensure_ascii):
+        """
+        用 orjson 编码，输出与标准库一致
+
+        Returns:
+            编码后的 bytes；orjson 无法与标准库输出一致时返回 None
+        """
+        try:
+            data = orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            return None
+
+        # 只有输出中出现 null 时才可能含有 NaN/Infinity
+        if b"null" in data and isinstance(obj, (dict, list, tuple)):
+            if has_non_finite(obj):
+                return None
+        elif isinstance(obj, float) and obj - obj != 0.0:
+            return None
+
+        data = normalize_floats(data)
+        if ensure_ascii:
+            data = escape_non_ascii(data)
+        return data
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.get("indent")
+        if set(kwargs) - _SUPPORTED_ARGS or indent not in (None, 2):
+            return super().dumps(obj, **kwargs)
+
+        data = self._encode(
+            obj,
+            kwargs.get("default", self.default),
+            self._option(kwargs.get("sort_keys", self.sort_keys), indent),
+            kwargs.get("ensure_ascii", self.ensure_ascii),
+        )
+        if data is None:
+            return super().dumps(obj, **kwargs)
+        return data.decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+
+        body = self._encode(
+            obj,
+            self.default,
+            self._option(self.sort_keys, indent),
+            self.ensure_ascii,
+        )
+        if body is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def create_json_provider(app):
+    """根据 JSON_ENCODER 配置创建应用的 JSON provider"""
+    name = app.config.get("JSON_ENCODER", "auto")
+
+    if name == "auto":
+        name = "stdlib" if orjson is None else "orjson"
+
+    if name == "orjson":
+        if orjson is None:
+            raise RuntimeError("JSON_ENCODER=orjson 但未安装 orjson")
+        return OrjsonProvider(app)
+    if name == "stdlib":
+        return DefaultJSONProvider(app)
+
+    raise ValueError(f"不支持的 JSON 编码器: {name}")
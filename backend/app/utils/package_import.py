@@ -0,0 +1,416 @@
+"""
+数据包批量导入
+
+从 CSV / XLSX 数据包登记表流式读取数据包，逐行校验后分批写入：
+
+- 已有的数据包名称一次性加载到集合中去重（文件内重复的名称同样跳过）
+- 每批用一条多行 INSERT 写入并提交；某一批写入失败时逐行重试，只拒绝出错的行
+- 每批提交后写入断点文件，中断后重新执行会从断点继续
+- 被拒绝的行连同原因写入错误文件（CSV）
+
+表头支持字段名、中文列名和旧版导入脚本的键名，见 HEADER_ALIASES。
+"""
+
+import csv
+import io
+import json
+import os
+
+from app import db
+from app.models import LeadPackage
+from app.models.lead_package import build_call_statistics
+
+# 表头别名 -> 字段名
+HEADER_ALIASES = {
+    "name": "name",
+    "名称": "name",
+    "数据包名称": "name",
+    "source": "source",
+    "来源": "source",
+    "数据来源": "source",
+    "industry": "industry",
+    "grade": "industry",
+    "行业": "industry",
+    "年级": "industry",
+    "region": "region",
+    "地区": "region",
+    "total_leads": "total_leads",
+    "total": "total_leads",
+    "总量": "total_leads",
+    "线索总数": "total_leads",
+    "valid_leads": "valid_leads",
+    "valid": "valid_leads",
+    "有效量": "valid_leads",
+    "有效线索数": "valid_leads",
+    "cost_per_lead": "cost_per_lead",
+    "单价": "cost_per_lead",
+    "单条线索成本": "cost_per_lead",
+}
+
+# 写入数据库的列
+INSERT_COLUMNS = (
+    "name",
+    "source",
+    "industry",
+    "region",
+    "total_leads",
+    "valid_leads",
+    "contact_rate",
+    "interest_rate",
+    "cost_per_lead",
+    "total_cost",
+)
+
+
+class ImportRowError(ValueError):
+    """导入行校验失败"""
+
+
+def read_rows(fileobj, filename):
+    """
+    读取数据包登记表
+
+    Args:
+        fileobj: 二进制文件对象（XLSX 需要支持 seek）
+        filename: 文件名，按扩展名判断格式（.csv / .xlsx）
+
+    Yields:
+        (行号, {表头: 值})：行号从 2 开始（第 1 行是表头）
+    """
+    extension = os.path.splitext(filename)[1].lower()
+
+    if extension == ".csv":
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+        for line_no, row in enumerate(csv.DictReader(text), 2):
+            yield line_no, row
+        return
+
+    if extension == ".xlsx":
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportRowError("导入 XLSX 需要安装 openpyxl")
+
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(v).strip() if v is not None else "" for v in next(rows, ())]
+            for line_no, values in enumerate(rows, 2):
+                if all(v is None for v in values):
+                    continue
+                yield line_no, dict(zip(header, values))
+        finally:
+            workbook.close()
+        return
+
+    raise ImportRowError(f"不支持的文件格式: {extension or filename}")
+
+
+def _to_int(value, field):
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ImportRowError(f"{field} 必须是整数")
+    # Excel 中的整数读出来是 1000.0，允许；1000.7 这类小数不截断，直接拒绝
+    if not number.is_integer():
+        raise ImportRowError(f"{field} 必须是整数")
+    number = int(number)
+    if number < 0:
+        raise ImportRowError(f"{field} 不能为负数")
+    return number
+
+
+def _to_float(value, field):
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ImportRowError(f"{field} 必须是数字")
+    if number < 0:
+        raise ImportRowError(f"{field} 不能为负数")
+    return number
+
+
+def parse_package(raw, default_cost_per_lead=0.0):
+    """
+    校验并转换一行登记表数据
+
+    指标按 LeadPackage.calculate_metrics 对无通话记录数据包的规则计算。
+
+    Returns:
+        INSERT_COLUMNS 对应的字典
+
+    Raises:
+        ImportRowError: 数据不合法
+    """
+    data = {}
+    for header, value in raw.items():
+        field = HEADER_ALIASES.get(str(header or "").strip())
+        if field is not None:
+            data[field] = value.strip() if isinstance(value, str) else value
+
+    if not data.get("name") or not data.get("source"):
+        raise ImportRowError("缺少必填字段: name, source")
+
+    total_leads = _to_int(data.get("total_leads"), "total_leads") or 0
+    valid_leads = _to_int(data.get("valid_leads"), "valid_leads")
+    if valid_leads is None:
+        valid_leads = total_leads
+    if valid_leads > total_leads:
+        raise ImportRowError("valid_leads 不能大于 total_leads")
+
+    cost_per_lead = _to_float(data.get("cost_per_lead"), "cost_per_lead")
+
+    package = LeadPackage(
+        name=str(data["name"]),
+        source=str(data["source"]),
+        industry=str(data["industry"]) if data.get("industry") else None,
+        region=str(data["region"]) if data.get("region") else None,
+        total_leads=total_leads,
+        valid_leads=valid_leads,
+        cost_per_lead=(
+            default_cost_per_lead if cost_per_lead is None else cost_per_lead
+        ),
+        contact_rate=0.0,
+        interest_rate=0.0,
+        total_cost=0.0,
+    )
+    package.calculate_metrics(call_stats=build_call_statistics(0, 0))
+
+    return {name: getattr(package, name) for name in INSERT_COLUMNS}
+
+
+class PackageImporter:
+    """
+    数据包导入器
+
+    Args:
+        chunk_size: 每批写入的行数
+        default_cost_per_lead: 登记表未填写单价时使用的单价
+        checkpoint_path: 断点文件路径，为空时不记录断点
+        error_path: 错误文件路径，为空时只在结果中返回错误
+        max_errors: 结果中最多返回的错误条数
+    """
+
+    def __init__(
+        self,
+        chunk_size=1000,
+        default_cost_per_lead=0.0,
+        checkpoint_path=None,
+        error_path=None,
+        max_errors=100,
+    ):
+        self.chunk_size = chunk_size
+        self.default_cost_per_lead = default_cost_per_lead
+        self.checkpoint_path = checkpoint_path
+        self.error_path = error_path
+        self.max_errors = max_errors
+
+    def run(self, rows, source_id=None):
+        """
+        执行导入
+
+        Args:
+            rows: read_rows 返回的 (行号, 数据) 迭代器
+            source_id: 数据源标识（如文件大小和修改时间），
+                       与断点记录不一致时忽略断点重新导入
+
+        Returns:
+            {"total", "inserted", "skipped", "failed", "errors", "resumed_from"}
+        """
+        checkpoint = self._load_checkpoint(source_id)
+        resume_line = checkpoint["line"] if checkpoint else 0
+
+        # 重新导入时清空上次的错误文件；从断点继续时截掉断点之后写入的部分再追加，
+        # 避免断点之后被拒绝的行重复出现
+        if self.error_path and os.path.exists(self.error_path):
+            if checkpoint is None:
+                os.remove(self.error_path)
+            else:
+                with open(self.error_path, "r+b") as f:
+                    f.truncate(checkpoint.get("error_size", 0))
+
+        self.stats = (
+            dict(checkpoint["stats"])
+            if checkpoint
+            else {"total": 0, "inserted": 0, "skipped": 0, "failed": 0}
+        )
+        self.errors = []
+        self._source_id = source_id
+        self._error_file = None
+        self._error_writer = None
+
+        # 已有名称一次性加载，之后只在内存中判断重复
+        self._names = set(db.session.scalars(db.select(LeadPackage.name)))
+
+        chunk = []
+        last_line = resume_line
+
+        try:
+            for line_no, raw in rows:
+                if line_no <= resume_line:
+                    continue
+
+                last_line = line_no
+                self.stats["total"] += 1
+
+                try:
+                    values = parse_package(raw, self.default_cost_per_lead)
+                except ImportRowError as e:
+                    self._reject(line_no, raw, str(e))
+                    continue
+
+                if values["name"] in self._names:
+                    self.stats["skipped"] += 1
+                    continue
+
+                self._names.add(values["name"])
+                chunk.append((line_no, raw, values))
+
+                if len(chunk) >= self.chunk_size:
+                    self._flush(chunk, last_line)
+                    chunk = []
+
+            self._flush(chunk, last_line)
+        finally:
+            if self._error_file is not None:
+                self._error_file.close()
+
+        # 导入完成，删除断点
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        return {
+            **self.stats,
+            "errors": self.errors,
+            "resumed_from": resume_line or None,
+        }
+
+    def _flush(self, chunk, last_line):
+        """写入一批数据并记录断点"""
+        if chunk:
+            try:
+                db.session.execute(
+                    db.insert(LeadPackage), [values for _, _, values in chunk]
+                )
+                db.session.commit()
+                self.stats["inserted"] += len(chunk)
+            except Exception:
+                db.session.rollback()
+                self._insert_one_by_one(chunk)
+
+        self._save_checkpoint(last_line)
+
+    def _insert_one_by_one(self, chunk):
+        """整批写入失败时逐行写入，只拒绝出错的行"""
+        for line_no, raw, values in chunk:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(db.insert(LeadPackage), [values])
+                self.stats["inserted"] += 1
+            except Exception as e:
+                self._names.discard(values["name"])
+                self._reject(line_no, raw, f"写入数据库失败: {e.__class__.__name__}")
+
+        db.session.commit()
+
+    def _reject(self, line_no, raw, error):
+        """记录被拒绝的行"""
+        self.stats["failed"] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_no, "error": error})
+
+        if self.error_path:
+            if self._error_writer is None:
+                self._error_file = open(
+                    self.error_path, "a", encoding="utf-8-sig", newline=""
+                )
+                self._error_writer = csv.writer(self._error_file)
+                if self._error_file.tell() == 0:
+                    self._error_writer.writerow(["line", "error", "data"])
+
+            self._error_writer.writerow(
+                [line_no, error, json.dumps(raw, ensure_ascii=False, default=str)]
+            )
+
+    def _load_checkpoint(self, source_id):
+        """读取断点，数据源不一致或文件损坏时返回 None"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if checkpoint.get("source") != source_id:
+            return None
+
+        return checkpoint
+
+    def _save_checkpoint(self, line):
+        """原子写入断点：已处理到的行号、累计统计和错误文件大小"""
+        if not self.checkpoint_path:
+            return
+
+        error_size = 0
+        if self._error_file is not None:
+            self._error_file.flush()
+        if self.error_path and os.path.exists(self.error_path):
+            error_size = os.path.getsize(self.error_path)
+
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "source": self._source_id,
+                    "line": line,
+                    "stats": self.stats,
+                    "error_size": error_size,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+def import_file(path, chunk_size=1000, default_cost_per_lead=0.0, resume=True):
+    """
+    导入数据包登记表文件
+
+    断点文件为 <path>.checkpoint.json，错误文件为 <path>.errors.csv。
+    文件内容变化（大小或修改时间不同）时不使用旧断点。
+
+    Args:
+        path: CSV / XLSX 文件路径
+        chunk_size: 每批写入的行数
+        default_cost_per_lead: 登记表未填写单价时使用的单价
+        resume: 是否从断点继续；为 False 时删除旧断点重新导入
+
+    Returns:
+        导入结果，另含 error_path（没有被拒绝的行时为 None）
+    """
+    checkpoint_path = f"{path}.checkpoint.json"
+    error_path = f"{path}.errors.csv"
+
+    if not resume and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    stat = os.stat(path)
+    importer = PackageImporter(
+        chunk_size=chunk_size,
+        default_cost_per_lead=default_cost_per_lead,
+        checkpoint_path=checkpoint_path,
+        error_path=error_path,
+    )
+
+    with open(path, "rb") as f:
+        result = importer.run(
+            read_rows(f, path), source_id=f"{stat.st_size}:{stat.st_mtime_ns}"
+        )
+
+    result["error_path"] = error_path if os.path.exists(error_path) else None
+    return result
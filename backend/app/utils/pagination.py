@@ -0,0 +1,145 @@
+"""
+游标（keyset）分页工具
+
+偏移分页每页都要执行 COUNT(*) 和 OFFSET 扫描，翻到深页时越来越慢。
+游标分页按 (排序列, id) 记住上一页最后一条记录的位置，
+下一页直接用 WHERE (排序列, id) < (上次的值) 定位，只读取需要的行。
+
+游标是对排序键值的 base64 编码，对客户端不透明。
+
+排序列（如 Call.call_time）允许为空，而 PostgreSQL 和 SQLite 对 NULL 的排序位置不同，
+NULL 也无法参与 < 比较。这里统一把排序列为 NULL 的记录放在最后，按 id 倒序单独分页：
+先遍历非空记录，取完后再接着取 NULL 记录，游标中的排序键为 null 即表示已进入 NULL 部分。
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+
+
+class InvalidCursor(ValueError):
+    """游标格式错误"""
+
+
+def encode_cursor(values):
+    """把排序键值编码为游标字符串"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, columns):
+    """
+    解码游标字符串
+
+    Args:
+        cursor: 游标字符串
+        columns: 排序列，用于把 datetime 字段还原
+
+    Raises:
+        InvalidCursor: 游标无法解析或与排序列不匹配
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor("无效的分页游标") from e
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursor("无效的分页游标")
+
+    decoded = []
+    for column, value in zip(columns, values):
+        if value is not None and isinstance(column.type, db.DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError) as e:
+                raise InvalidCursor("无效的分页游标") from e
+        decoded.append(value)
+
+    return decoded
+
+
+def _after(columns, values):
+    """按降序排序时位于 values 之后的记录条件：(c0, c1, ...) < (v0, v1, ...)"""
+    column, value = columns[0], values[0]
+
+    if len(columns) == 1:
+        return column < value
+
+    return db.or_(
+        column < value,
+        db.and_(column == value, _after(columns[1:], values[1:])),
+    )
+
+
+def clamp_per_page(per_page):
+    """把客户端传入的每页数量限制在 [1, MAX_PAGE_SIZE] 之间"""
+    return max(1, min(per_page, current_app.config["MAX_PAGE_SIZE"]))
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, with_total=False):
+    """
+    游标分页（按 columns 降序，最后一列应为唯一的 id，第一列为 NULL 的记录排在最后）
+
+    Args:
+        query: 已应用过滤条件的查询（不要包含排序）
+        columns: 排序列，如 (Call.call_time, Call.id)
+        cursor: 上一页返回的 next_cursor，为空表示第一页
+        per_page: 每页数量
+        with_total: 是否统计总数（需要额外的 COUNT 查询）
+
+    Returns:
+        (items, pagination)：pagination 包含 per_page、next_cursor、has_more，
+        with_total 时另含 total
+
+    Raises:
+        InvalidCursor: 游标无法解析
+    """
+    pagination = {"per_page": per_page}
+
+    if with_total:
+        pagination["total"] = query.order_by(None).count()
+
+    sort_column, tie_columns = columns[0], columns[1:]
+    values = decode_cursor(cursor, columns) if cursor else None
+    in_null_tail = values is not None and values[0] is None
+
+    # 多取一条判断是否还有下一页
+    items = []
+    if not in_null_tail:
+        head = query.filter(sort_column.isnot(None))
+        if values is not None:
+            head = head.filter(_after(columns, values))
+        items = (
+            head.order_by(*[column.desc() for column in columns])
+            .limit(per_page + 1)
+            .all()
+        )
+
+    # 非空记录不足一页时接着取排序列为 NULL 的记录
+    if len(items) <= per_page:
+        tail = query.filter(sort_column.is_(None))
+        if in_null_tail:
+            tail = tail.filter(_after(tie_columns, values[1:]))
+        items += (
+            tail.order_by(*[column.desc() for column in tie_columns])
+            .limit(per_page + 1 - len(items))
+            .all()
+        )
+
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    pagination["has_more"] = has_more
+    pagination["next_cursor"] = (
+        encode_cursor([getattr(items[-1], column.key) for column in columns])
+        if has_more
+        else None
+    )
+
+    return items, pagination
@@ -0,0 +1,237 @@
+"""
+列投影序列化器
+
+模型的 to_dict() 需要先构造 ORM 对象（加入 identity map、跟踪属性状态），
+再逐个字段读取。列表和导出接口只需要只读数据，这里直接查询所需的列，
+把结果行转换为与 to_dict() 完全相同的字典，不构造任何 ORM 对象。
+
+    rows = PACKAGE.query(LeadPackage.industry == "高中").all()
+    data = PACKAGE.dump_many(rows)
+
+query() 返回普通的 Query，可以继续 filter、order_by、paginate，
+也可以交给 keyset_paginate（结果行同样可以按列名取值）。
+
+only() 按客户端的 ?fields= 生成字段子集，在 SQL 层面只查询这些列。
+"""
+
+from app import db
+from app.models import (
+    Call,
+    CallTag,
+    DialTask,
+    LeadPackage,
+    MetricsSummary,
+    PackageTagSummary,
+)
+from app.models.call import TAG_LOAD_BATCH_SIZE
+
+
+class InvalidFields(ValueError):
+    """请求的字段不存在"""
+
+
+def parse_list(value):
+    """解析逗号分隔的参数（去除空白和重复项，保持顺序），为空时返回空列表"""
+    items = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if item and item not in items:
+            items.append(item)
+    return items
+
+
+class Projection:
+    """
+    某个模型的列投影
+
+    Args:
+        model: 模型类
+        fields: 输出的字段（列名），顺序与 to_dict() 一致
+        hidden: 需要查询但不输出的列（如分页的排序列）
+    """
+
+    def __init__(self, model, fields, hidden=()):
+        self.model = model
+        self.fields = tuple(fields)
+        self.hidden = tuple(field for field in hidden if field not in self.fields)
+        self.columns = [getattr(model, field) for field in self.fields + self.hidden]
+
+        # 日期时间列输出为 ISO 8601 字符串
+        self._temporal = [
+            i
+            for i, column in enumerate(self.columns[: len(self.fields)])
+            if isinstance(column.type, (db.DateTime, db.Date))
+        ]
+
+    def only(self, fields, hidden=()):
+        """
+        字段子集（总是包含 id）
+
+        Args:
+            fields: 需要输出的字段，为空时输出全部字段
+            hidden: 需要查询但不输出的列
+
+        Raises:
+            InvalidFields: 字段不在本投影中
+        """
+        unknown = [field for field in fields if field not in self.fields]
+        if unknown:
+            raise InvalidFields(
+                f"不支持的字段: {', '.join(unknown)}；"
+                f"可选字段: {', '.join(self.fields)}"
+            )
+
+        if fields:
+            fields = ["id"] + [field for field in fields if field != "id"]
+        else:
+            fields = self.fields
+        return Projection(self.model, fields, hidden=self.hidden + tuple(hidden))
+
+    def query(self, *criteria):
+        """只查询投影列的 Query"""
+        return db.session.query(*self.columns).filter(*criteria)
+
+    def dump(self, row):
+        """把一行结果转换为字典（不含 hidden 列）"""
+        values = list(row)
+        for i in self._temporal:
+            if values[i] is not None:
+                values[i] = values[i].isoformat()
+        return dict(zip(self.fields, values))
+
+    def dump_many(self, rows):
+        """把多行结果转换为字典列表"""
+        return [self.dump(row) for row in rows]
+
+
+PACKAGE = Projection(
+    LeadPackage,
+    (
+        "id",
+        "name",
+        "source",
+        "industry",
+        "region",
+        "total_leads",
+        "valid_leads",
+        "contact_rate",
+        "interest_rate",
+        "cost_per_lead",
+        "total_cost",
+        "created_at",
+        "updated_at",
+    ),
+)
+
+TASK = Projection(
+    DialTask,
+    (
+        "id",
+        "package_id",
+        "task_name",
+        "description",
+        "start_time",
+        "end_time",
+        "status",
+        "total_calls",
+        "connected_calls",
+        "interested_calls",
+        "created_at",
+        "updated_at",
+    ),
+)
+
+CALL = Projection(
+    Call,
+    (
+        "id",
+        "task_id",
+        "phone_number",
+        "call_time",
+        "duration",
+        "result",
+        "notes",
+        "customer_name",
+        "company",
+        "created_at",
+        "updated_at",
+    ),
+)
+
+CALL_TAG = Projection(
+    CallTag, ("id", "call_id", "tag_name", "tag_value", "tag_type", "created_at")
+)
+
+TAG_SUMMARY = Projection(
+    PackageTagSummary,
+    (
+        "id",
+        "package_id",
+        "tag_name",
+        "tag_value",
+        "tag_count",
+        "created_at",
+        "updated_at",
+    ),
+)
+
+METRICS_SUMMARY = Projection(
+    MetricsSummary,
+    (
+        "id",
+        "date",
+        "total_packages",
+        "new_packages",
+        "total_leads",
+        "total_calls",
+        "connected_calls",
+        "total_duration",
+        "avg_contact_rate",
+        "avg_interest_rate",
+        "avg_call_duration",
+        "total_cost",
+        "total_revenue",
+        "roi",
+        "created_at",
+        "updated_at",
+    ),
+)
+
+
+def dump_calls(rows):
+    """
+    通话记录行转换为字典（与 Call.to_dict_many 输出一致）
+
+    整批通话的标签分批用 IN 查询加载，再按 call_id 分组。
+    """
+    calls = CALL.dump_many(rows)
+    tags_by_call = {call["id"]: [] for call in calls}
+    call_ids = list(tags_by_call)
+
+    for i in range(0, len(call_ids), TAG_LOAD_BATCH_SIZE):
+        chunk = call_ids[i : i + TAG_LOAD_BATCH_SIZE]
+        tags = CALL_TAG.query(CallTag.call_id.in_(chunk)).order_by(CallTag.id)
+        for tag in tags:
+            tags_by_call[tag.call_id].append(CALL_TAG.dump(tag))
+
+    for call in calls:
+        call["tags"] = tags_by_call[call["id"]]
+    return calls
+
+
+def dump_tag_summaries(package_id, total):
+    """
+    数据包的标签汇总（与 PackageTagSummary.to_dict(total=...) 输出一致）
+
+    Args:
+        package_id: 数据包 ID
+        total: 数据包的标签总数（LeadPackage.tag_total）
+    """
+    total = total or 0
+    summaries = TAG_SUMMARY.dump_many(
+        TAG_SUMMARY.query(PackageTagSummary.package_id == package_id)
+    )
+    for summary in summaries:
+        count = summary["tag_count"] or 0
+        summary["percentage"] = count / total if total > 0 else 0.0
+    return summaries
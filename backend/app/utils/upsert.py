@@ -0,0 +1,86 @@
+"""
+INSERT ... ON CONFLICT 工具
+
+SQLite 和 PostgreSQL 都支持 ON CONFLICT 子句，但需要使用各自方言的 insert 构造。
+这里根据当前数据库连接选择对应的方言。
+"""
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+
+_DIALECT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def dialect_insert(model):
+    """返回当前数据库方言的 insert 构造（支持 on_conflict_do_*）"""
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect not in _DIALECT_INSERTS:
+        raise NotImplementedError(f"不支持的数据库类型: {dialect}")
+
+    return _DIALECT_INSERTS[dialect](model)
+
+
+def insert_ignore(model, values, index_elements):
+    """
+    插入记录，唯一键冲突时忽略
+
+    Args:
+        model: 模型类
+        values: 单条记录字典或记录列表
+        index_elements: 唯一键列名列表
+    """
+    stmt = dialect_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    db.session.execute(stmt, values if isinstance(values, list) else [values])
+
+
+def upsert(model, values, index_elements, update_columns):
+    """
+    插入记录，唯一键冲突时更新指定列为新值
+
+    Args:
+        model: 模型类
+        values: 记录列表
+        index_elements: 唯一键列名列表
+        update_columns: 冲突时需要更新的列名列表
+    """
+    if not values:
+        return
+
+    stmt = dialect_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={name: stmt.excluded[name] for name in update_columns},
+    )
+    db.session.execute(stmt, values)
+
+
+def upsert_increment(model, values, index_elements, increment_columns):
+    """
+    插入记录，唯一键冲突时把指定列累加上新值
+
+    生成 INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x，
+    单条语句完成“不存在则创建、存在则累加”，并发写入时也不会丢失计数。
+    同一批 values 中唯一键不能重复（PostgreSQL 限制），调用方需先按键合并。
+
+    Args:
+        model: 模型类
+        values: 记录列表
+        index_elements: 唯一键列名列表
+        increment_columns: 冲突时需要累加的列名列表
+    """
+    if not values:
+        return
+
+    table = model.__table__
+    stmt = dialect_insert(model)
+    set_ = {name: table.c[name] + stmt.excluded[name] for name in increment_columns}
+    if "updated_at" in table.c:
+        set_["updated_at"] = stmt.excluded["updated_at"]
+
+    stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+    db.session.execute(stmt, values)
@@ -0,0 +1,232 @@
+"""
+Widget 数据快照
+
+Widget 客户端持续轮询 /api/data/* 接口，每个 gunicorn worker 都会重复计算相同的数据。
+快照把这些接口的 JSON 响应预先计算好，打包写入一个本地文件：
+
+    {
+        "version": 快照格式版本,
+        "generated_at": 生成时间（Unix 时间戳）,
+        "bodies": {接口名称: 响应体 JSON 字符串}
+    }
+
+接口直接返回快照中的响应体（与实时计算的响应逐字节一致），
+并通过 X-Snapshot-Age 响应头告知快照的年龄（秒）。
+
+推荐通过 `flask build-widget-snapshot --interval N` 定期生成快照。
+请求路径上只在以下情况生成，并用锁文件（<快照路径>.lock）保证同一时间只有一个生成者：
+
+- 快照不存在（冷启动）：等待锁，拿到锁后若其他进程已生成则直接使用
+- 快照超过 WIDGET_SNAPSHOT_MAX_AGE 秒：非阻塞地尝试加锁，拿到锁的请求重新生成，
+  其他请求（所有 worker）继续返回旧快照，不会同时重算
+- 快照超过 WIDGET_SNAPSHOT_MAX_STALE 秒（生成者卡住或反复失败）：不再返回旧快照，
+  等待锁并重新生成
+
+等待锁最多 WIDGET_SNAPSHOT_LOCK_TIMEOUT 秒，超时返回 503。
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import current_app, jsonify
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 开发环境只做进程内互斥
+    fcntl = None
+
+SNAPSHOT_VERSION = 1
+
+# 进程内缓存：按文件 (mtime, size) 判断是否需要重新读取
+_cache = {}
+_cache_lock = threading.Lock()
+
+# 没有 fcntl 时使用的进程内生成锁
+_build_lock = threading.Lock()
+
+# 有超时的等待锁时，两次尝试之间的间隔（秒）
+_LOCK_POLL_INTERVAL = 0.05
+
+
+@contextlib.contextmanager
+def _locked(path, blocking, timeout=None):
+    """
+    获取快照生成锁（跨进程的文件锁）
+
+    Args:
+        blocking: 是否等待锁
+        timeout: 等待锁的最长时间（秒），为空时一直等待
+
+    Yields:
+        是否拿到了锁（blocking=True 且没有 timeout 时总是 True）
+    """
+    if fcntl is None:
+        if blocking and timeout is not None:
+            acquired = _build_lock.acquire(True, timeout)
+        else:
+            acquired = _build_lock.acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _build_lock.release()
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a") as lock_file:
+        if blocking and timeout is None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            # flock 不支持超时：非阻塞地重试到超时为止
+            deadline = time.monotonic() + (timeout if blocking else 0)
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        yield False
+                        return
+                    time.sleep(_LOCK_POLL_INTERVAL)
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build(path, builders):
+    """
+    计算所有 Widget 接口的响应并原子写入快照文件
+
+    Args:
+        path: 快照文件路径
+        builders: {接口名称: 构建函数}，构建函数返回响应字典
+
+    Returns:
+        快照字典
+    """
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "generated_at": time.time(),
+        "bodies": {
+            name: current_app.json.response(builder()).get_data(as_text=True)
+            for name, builder in builders.items()
+        },
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    # 先写临时文件再替换，读取方永远不会读到写了一半的快照
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".widget-snapshot-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return snapshot
+
+
+def load(path):
+    """
+    读取快照文件
+
+    文件未变化时直接返回进程内缓存的结果，只需一次 stat。
+    文件不存在、格式错误或版本不匹配时返回 None。
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    with _cache_lock:
+        _cache[path] = (key, snapshot)
+
+    return snapshot
+
+
+def _usable(snapshot, name):
+    return snapshot is not None and name in snapshot["bodies"]
+
+
+def _unavailable():
+    """等待生成锁超时"""
+    return (
+        jsonify({"success": False, "error": "数据快照正在生成，请稍后重试"}),
+        503,
+    )
+
+
+def serve(name, builders):
+    """
+    从快照返回指定接口的响应
+
+    快照不存在、缺少该接口或超过最大容忍年龄时等待生成；
+    已过期时由拿到锁的一个请求重新生成，其他请求返回旧快照。
+    """
+    path = current_app.config["WIDGET_SNAPSHOT_PATH"]
+    max_age = current_app.config.get("WIDGET_SNAPSHOT_MAX_AGE", 60)
+    max_stale = current_app.config.get("WIDGET_SNAPSHOT_MAX_STALE", 300)
+    lock_timeout = current_app.config.get("WIDGET_SNAPSHOT_LOCK_TIMEOUT", 30)
+
+    snapshot = load(path)
+
+    if not _usable(snapshot, name) or (
+        time.time() - snapshot["generated_at"] > max_stale
+    ):
+        # 冷启动或旧快照不能再用：排队等待，第一个拿到锁的生成，
+        # 后面的直接读取它生成的快照
+        with _locked(path, blocking=True, timeout=lock_timeout) as acquired:
+            if not acquired:
+                return _unavailable()
+
+            snapshot = load(path)
+            if not _usable(snapshot, name) or (
+                time.time() - snapshot["generated_at"] > max_age
+            ):
+                snapshot = build(path, builders)
+    elif time.time() - snapshot["generated_at"] > max_age:
+        with _locked(path, blocking=False) as acquired:
+            if acquired:
+                # 拿到锁后再检查一次，其他进程可能刚刚生成过
+                latest = load(path)
+                if (
+                    _usable(latest, name)
+                    and time.time() - latest["generated_at"] <= max_age
+                ):
+                    snapshot = latest
+                else:
+                    snapshot = build(path, builders)
+
+    age = time.time() - snapshot["generated_at"]
+
+    response = current_app.response_class(
+        snapshot["bodies"][name], mimetype="application/json"
+    )
+    response.headers["X-Snapshot-Age"] = str(int(max(age, 0)))
+    return response
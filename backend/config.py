@@ -4,6 +4,7 @@ Flask 应用配置文件
 """
 
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -33,6 +34,56 @@ class Config:
     PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
 
+    # 任务详情内嵌的通话记录条数、流式导出每批读取的通话记录条数
+    TASK_DETAIL_CALLS_LIMIT = 50
+    CALL_STREAM_BATCH_SIZE = 500
+
+    # 指标导出每批读取的行数
+    EXPORT_BATCH_SIZE = 1000
+
+    # 数据包导入每批写入的行数
+    PACKAGE_IMPORT_CHUNK_SIZE = 1000
+
+    # JSON 编码器：auto（安装了 orjson 时使用 orjson）/ orjson / stdlib
+    JSON_ENCODER = os.getenv("JSON_ENCODER", "auto")
+
+    # 接口响应缓存：sqlite（本机多进程共享，默认）/ memory（进程内 LRU）/ null（不缓存）
+    # memory 只适用于单进程：gunicorn 多个 worker 时版本号只在本进程递增，其他 worker 会返回旧数据
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+    CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", 60))  # 秒
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_SQLITE_PATH = os.getenv(
+        "CACHE_SQLITE_PATH",
+        os.path.join(tempfile.gettempdir(), "lead_management_cache.db"),
+    )
+
+    # 批量请求（POST /api/batch）一次最多包含的子请求数
+    BATCH_MAX_REQUESTS = 20
+
+    # 通话记录批量导入：每批写入条数、最多返回的错误条数
+    CALL_BULK_CHUNK_SIZE = 1000
+    CALL_BULK_MAX_ERRORS = 100
+
+    # 单条通话记录写入缓冲区（组提交）：攒够条数或到达间隔时用一个事务写入
+    INGEST_BUFFER_ENABLED = (
+        os.getenv("INGEST_BUFFER_ENABLED", "false").lower() == "true"
+    )
+    INGEST_BUFFER_FLUSH_INTERVAL_MS = int(
+        os.getenv("INGEST_BUFFER_FLUSH_INTERVAL_MS", 20)
+    )
+    INGEST_BUFFER_MAX_ROWS = int(os.getenv("INGEST_BUFFER_MAX_ROWS", 500))
+    INGEST_BUFFER_TIMEOUT = 10  # 等待提交的最长时间（秒）
+
+    # 业务时区（按该时区划分“今天”“本月”，数据库时间按 UTC 存储）
+    BUSINESS_TIMEZONE = os.getenv("BUSINESS_TIMEZONE", "Asia/Shanghai")
+
+    # Widget 数据快照（为空时不启用，每次请求实时计算）
+    WIDGET_SNAPSHOT_PATH = os.getenv("WIDGET_SNAPSHOT_PATH")
+    WIDGET_SNAPSHOT_MAX_AGE = int(os.getenv("WIDGET_SNAPSHOT_MAX_AGE", 60))  # 秒
+    # 旧快照的最大容忍年龄（秒），超过后请求等待重新生成而不是返回旧快照
+    WIDGET_SNAPSHOT_MAX_STALE = int(os.getenv("WIDGET_SNAPSHOT_MAX_STALE", 300))
+    WIDGET_SNAPSHOT_LOCK_TIMEOUT = 30  # 等待生成锁的最长时间（秒），超时返回 503
+
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
@@ -53,6 +104,9 @@ class TestingConfig(Config):
     # 测试环境使用较短的 Token 有效期
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
 
+    # 测试直接写库后立即断言接口结果，默认不缓存
+    CACHE_BACKEND = "null"
+
 
 class ProductionConfig(Config):
     """生产环境配置"""
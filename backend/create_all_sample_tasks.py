@@ -3,7 +3,7 @@
 """
 
 from app import create_app, db
-from app.models import LeadPackage, DialTask, Call, CallTag
+from app.models import LeadPackage, DialTask, Call, CallTag, PackageTagSummary
 from datetime import datetime, timedelta
 import random
 
@@ -205,6 +205,9 @@ def create_all_sample_tasks():
                 f"  📊 更新数据包指标 - 接通率: {package.contact_rate:.2f}%, 意向率: {package.interest_rate:.2f}%\n"
             )
 
+        # 标签直接写入 call_tags，统一重建标签汇总
+        PackageTagSummary.rebuild_all()
+
         # 提交所有更改
         db.session.commit()
         print("✅ 所有测试数据创建完成！")
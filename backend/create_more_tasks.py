@@ -3,7 +3,7 @@
 """
 
 from app import create_app, db
-from app.models import LeadPackage, DialTask, Call, CallTag
+from app.models import LeadPackage, DialTask, Call, CallTag, PackageTagSummary
 from datetime import datetime, timedelta
 import random
 
@@ -223,6 +223,9 @@ def create_more_tasks():
             package.calculate_metrics()
             print(f"  📊 创建{num_tasks}个任务 - 接通率: {package.contact_rate:.2f}%\n")
 
+        # 标签直接写入 call_tags，统一重建标签汇总
+        PackageTagSummary.rebuild_all()
+
         # 提交所有更改
         db.session.commit()
         print("✅ 所有外呼任务创建完成！")
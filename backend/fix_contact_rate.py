@@ -20,9 +20,12 @@ def fix_contact_rates():
         packages = LeadPackage.query.all()
         fixed_count = 0
 
+        # 一次 GROUP BY 查询获取所有数据包的通话统计
+        all_stats = LeadPackage.get_call_statistics_batch()
+
         for package in packages:
             # 检查是否有通话记录
-            stats = package.get_call_statistics()
+            stats = all_stats[package.id]
 
             if not stats["has_call_data"]:
                 # 没有通话记录，设置接通率为0
@@ -35,7 +38,7 @@ def fix_contact_rates():
             else:
                 # 有通话记录，从通话数据计算
                 old_rate = package.contact_rate
-                package.calculate_metrics()
+                package.calculate_metrics(call_stats=stats)
 
                 print(
                     f"📊 更新: {package.name} - 接通率从 {old_rate:.2%} 改为 {package.contact_rate:.2%}"
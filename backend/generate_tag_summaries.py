@@ -3,83 +3,20 @@
 """
 
 from app import create_app, db
-from app.models import LeadPackage, PackageTagSummary, CallTag, DialTask
+from app.models import PackageTagSummary
 from sqlalchemy import func
 
 
 def generate_tag_summaries():
-    """为每个数据包生成标签汇总"""
+    """为所有数据包生成标签汇总"""
     app = create_app()
 
     with app.app_context():
-        # 清空现有标签汇总
-        print("🗑️  清除现有标签汇总...")
-        PackageTagSummary.query.delete()
+        # 一次聚合查询生成所有数据包的标签汇总，upsert 覆盖旧记录
+        print("📦 开始生成标签汇总...\n")
+        summaries = PackageTagSummary.rebuild_all()
         db.session.commit()
-        print("✅ 清除完成\n")
-
-        # 获取所有数据包
-        packages = LeadPackage.query.all()
-
-        if not packages:
-            print("❌ 没有找到数据包")
-            return
-
-        print(f"📦 找到 {len(packages)} 个数据包，开始生成标签汇总...\n")
-
-        for package in packages:
-            print(f"处理数据包: {package.name} (ID: {package.id})")
-
-            # 获取该数据包的所有外呼任务ID
-            task_ids = [task.id for task in package.dial_tasks.all()]
-
-            if not task_ids:
-                print(f"  ⏭️  跳过：没有外呼任务\n")
-                continue
-
-            # 统计该数据包所有通话的标签
-            # 按 tag_name 和 tag_value 分组统计
-            from app.models import Call
-
-            tag_stats = (
-                db.session.query(
-                    CallTag.tag_name,
-                    CallTag.tag_value,
-                    func.count(CallTag.id).label("tag_count"),
-                )
-                .join(Call, CallTag.call_id == Call.id)
-                .filter(Call.task_id.in_(task_ids))
-                .group_by(CallTag.tag_name, CallTag.tag_value)
-                .all()
-            )
-
-            # 计算所有标签的总数（用于计算占比）
-            total_tags = sum(stat.tag_count for stat in tag_stats)
-
-            # 创建标签汇总记录
-            summaries_created = 0
-            for stat in tag_stats:
-                tag_name = stat.tag_name  # 标签代码（AS1, AF2等）
-                tag_value = stat.tag_value  # 标签含义
-                tag_count = stat.tag_count
-
-                # 计算占比（相对于所有标签）
-                percentage = tag_count / total_tags if total_tags > 0 else 0
-
-                summary = PackageTagSummary(
-                    package_id=package.id,
-                    tag_name=tag_name,
-                    tag_value=tag_value,
-                    tag_count=tag_count,
-                    percentage=percentage,
-                )
-                db.session.add(summary)
-                summaries_created += 1
-
-            db.session.commit()
-            print(
-                f"  ✅ 创建 {summaries_created} 条标签汇总记录 (总标签数: {total_tags})\n"
-            )
+        print(f"  ✅ 写入 {summaries} 条标签汇总记录\n")
 
         print("✅ 所有标签汇总生成完成！")
 
@@ -87,10 +24,12 @@ def generate_tag_summaries():
         print("\n" + "=" * 60)
         print("📊 数据摘要")
         print("=" * 60)
-        total_packages = LeadPackage.query.count()
+        total_packages = db.session.query(
+            func.count(func.distinct(PackageTagSummary.package_id))
+        ).scalar()
         total_summaries = PackageTagSummary.query.count()
 
-        print(f"数据包总数: {total_packages}")
+        print(f"有标签的数据包: {total_packages}")
         print(f"标签汇总总数: {total_summaries}")
         print(
             f"平均每个数据包: {total_summaries / total_packages:.1f} 条汇总"
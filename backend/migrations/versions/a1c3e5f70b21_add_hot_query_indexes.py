@@ -0,0 +1,49 @@
+"""add hot query indexes
+
+Revision ID: a1c3e5f70b21
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a1c3e5f70b21"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (索引名, 表名, 列)
+INDEXES = [
+    ("ix_calls_task_id_call_time", "calls", ["task_id", "call_time"]),
+    ("ix_calls_call_time_result", "calls", ["call_time", "result"]),
+    ("ix_call_tags_call_id_tag", "call_tags", ["call_id", "tag_name", "tag_value"]),
+    ("ix_dial_tasks_package_id_status", "dial_tasks", ["package_id", "status"]),
+    ("ix_dial_tasks_start_time", "dial_tasks", ["start_time"]),
+    (
+        "ix_lead_packages_industry_created_at",
+        "lead_packages",
+        ["industry", "created_at"],
+    ),
+]
+
+
+def _existing_indexes(table_name):
+    """获取表上已存在的索引名（应用启动时 db.create_all 可能已经创建）"""
+    inspector = sa.inspect(op.get_bind())
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade():
+    for name, table_name, columns in INDEXES:
+        if name not in _existing_indexes(table_name):
+            op.create_index(name, table_name, columns)
+
+
+def downgrade():
+    for name, table_name, columns in reversed(INDEXES):
+        if name in _existing_indexes(table_name):
+            op.drop_index(name, table_name=table_name)
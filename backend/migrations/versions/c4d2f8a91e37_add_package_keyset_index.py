@@ -0,0 +1,37 @@
+"""add package keyset index
+
+Revision ID: c4d2f8a91e37
+Revises: a1c3e5f70b21
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c4d2f8a91e37"
+down_revision = "a1c3e5f70b21"
+branch_labels = None
+depends_on = None
+
+
+INDEX_NAME = "ix_lead_packages_created_at_id"
+
+
+def _index_exists():
+    """应用启动时 db.create_all 可能已经创建了索引"""
+    inspector = sa.inspect(op.get_bind())
+    return INDEX_NAME in {
+        index["name"] for index in inspector.get_indexes("lead_packages")
+    }
+
+
+def upgrade():
+    if not _index_exists():
+        op.create_index(INDEX_NAME, "lead_packages", ["created_at", "id"])
+
+
+def downgrade():
+    if _index_exists():
+        op.drop_index(INDEX_NAME, table_name="lead_packages")
@@ -0,0 +1,57 @@
+"""add package tag total
+
+Revision ID: e7b1a4c9d562
+Revises: c4d2f8a91e37
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e7b1a4c9d562"
+down_revision = "c4d2f8a91e37"
+branch_labels = None
+depends_on = None
+
+
+def _column_exists():
+    """应用启动时 db.create_all 不会修改已有的表，但新建的库可能已经有该列"""
+    inspector = sa.inspect(op.get_bind())
+    return "tag_total" in {
+        column["name"] for column in inspector.get_columns("lead_packages")
+    }
+
+
+def upgrade():
+    if not _column_exists():
+        op.add_column(
+            "lead_packages",
+            sa.Column(
+                "tag_total",
+                sa.Integer(),
+                nullable=True,
+                server_default="0",
+                comment="标签总数",
+            ),
+        )
+
+    # 按现有标签汇总回填
+    op.execute("""
+        UPDATE lead_packages
+        SET tag_total = COALESCE(
+            (
+                SELECT SUM(tag_count)
+                FROM package_tag_summaries
+                WHERE package_tag_summaries.package_id = lead_packages.id
+            ),
+            0
+        )
+        """)
+
+
+def downgrade():
+    if _column_exists():
+        with op.batch_alter_table("lead_packages") as batch_op:
+            batch_op.drop_column("tag_total")
@@ -0,0 +1,94 @@
+"""add daily package metrics
+
+Revision ID: f3a9c2d71b48
+Revises: e7b1a4c9d562
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f3a9c2d71b48"
+down_revision = "e7b1a4c9d562"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(table_name):
+    """应用启动时 db.create_all 可能已经创建了该表"""
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table(table_name)
+
+
+def upgrade():
+    if not _table_exists("daily_package_metrics"):
+        op.create_table(
+            "daily_package_metrics",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column(
+                "date", sa.Date(), nullable=False, comment="汇总日期（业务时区）"
+            ),
+            sa.Column("package_id", sa.Integer(), nullable=False, comment="数据包 ID"),
+            sa.Column("total_calls", sa.Integer(), nullable=True, comment="总拨打次数"),
+            sa.Column(
+                "connected_calls", sa.Integer(), nullable=True, comment="接通次数"
+            ),
+            sa.Column(
+                "total_duration",
+                sa.Integer(),
+                nullable=True,
+                comment="总通话时长（秒）",
+            ),
+            sa.Column(
+                "interested_calls", sa.Integer(), nullable=True, comment="意向客户数"
+            ),
+            sa.Column("created_at", sa.DateTime(), nullable=True, comment="创建时间"),
+            sa.Column("updated_at", sa.DateTime(), nullable=True, comment="更新时间"),
+            sa.ForeignKeyConstraint(
+                ["package_id"], ["lead_packages.id"], ondelete="CASCADE"
+            ),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("date", "package_id", name="uix_daily_package"),
+        )
+        op.create_index(
+            "ix_daily_package_metrics_package_id",
+            "daily_package_metrics",
+            ["package_id"],
+        )
+
+    if not _table_exists("daily_package_tag_metrics"):
+        op.create_table(
+            "daily_package_tag_metrics",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column(
+                "date", sa.Date(), nullable=False, comment="汇总日期（业务时区）"
+            ),
+            sa.Column("package_id", sa.Integer(), nullable=False, comment="数据包 ID"),
+            sa.Column(
+                "tag_name", sa.String(length=100), nullable=False, comment="标签名称"
+            ),
+            sa.Column("tag_count", sa.Integer(), nullable=True, comment="标签出现次数"),
+            sa.Column("created_at", sa.DateTime(), nullable=True, comment="创建时间"),
+            sa.Column("updated_at", sa.DateTime(), nullable=True, comment="更新时间"),
+            sa.ForeignKeyConstraint(
+                ["package_id"], ["lead_packages.id"], ondelete="CASCADE"
+            ),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint(
+                "date", "package_id", "tag_name", name="uix_daily_package_tag"
+            ),
+        )
+        op.create_index(
+            "ix_daily_package_tag_metrics_package_id",
+            "daily_package_tag_metrics",
+            ["package_id"],
+        )
+
+
+def downgrade():
+    if _table_exists("daily_package_tag_metrics"):
+        op.drop_table("daily_package_tag_metrics")
+    if _table_exists("daily_package_metrics"):
+        op.drop_table("daily_package_metrics")
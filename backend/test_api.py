@@ -157,8 +157,8 @@ def test_api_queries():
             print(f"平均接通率: {summary['avg_contact_rate']:.2%}")
 
             # 测试获取数据包详情
-            print("\n📝 测试 GET /api/packages/1")
-            response = client.get("/api/packages/1")
+            print("\n📝 测试 GET /api/packages/1?include=dial_tasks")
+            response = client.get("/api/packages/1?include=dial_tasks")
             print(f"状态码: {response.status_code}")
             data = response.get_json()
             package = data["data"]
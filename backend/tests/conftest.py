@@ -3,6 +3,7 @@ Pytest configuration and fixtures
 """
 
 import pytest
+from sqlalchemy import event
 from app import create_app, db
 from app.models import User, LeadPackage, DialTask
 
@@ -105,3 +106,16 @@ def sample_task(sample_package):
     db.session.add(task)
     db.session.commit()
     return task
+
+
+@pytest.fixture
+def statements():
+    """记录执行的 SQL 语句"""
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,54 @@
+"""
+Admin API tests
+"""
+
+import pytest
+
+from app import db
+from app.models import LeadPackage
+
+
+class TestAdminStats:
+    """测试管理员统计API"""
+
+    def test_get_stats(self, client, auth_headers, sample_package, statements):
+        """测试系统统计使用聚合查询"""
+        db.session.add(
+            LeadPackage(
+                name="数据包2", source="采买", total_leads=500, total_cost=250.5
+            )
+        )
+        db.session.commit()
+
+        statements.clear()
+        response = client.get("/api/admin/stats", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.get_json()["data"] == {
+            "total_packages": 2,
+            "total_users": 1,
+            "total_leads": 1500,
+            "total_cost": pytest.approx(250.5),
+        }
+        assert not any("lead_packages.name" in s for s in statements)
+
+    def test_seed_test_data_statistics(self, client, auth_headers):
+        """测试生成测试数据后的统计，重复生成时跳过已存在的数据包"""
+        first = client.post("/api/admin/seed-test-data", headers=auth_headers)
+        second = client.post("/api/admin/seed-test-data", headers=auth_headers)
+
+        created = first.get_json()["data"]["created"]
+        assert created > 0
+        data = second.get_json()["data"]
+        assert data["created"] == 0
+        assert data["skipped"] == created
+
+        packages = LeadPackage.query.all()
+        assert data["statistics"] == {
+            "total_packages": created,
+            "total_leads": sum(p.total_leads for p in packages),
+            "total_cost": round(sum(p.total_cost for p in packages), 2),
+            "avg_contact_rate": round(
+                sum(p.contact_rate for p in packages) / len(packages) * 100, 1
+            ),
+        }
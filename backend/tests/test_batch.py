@@ -0,0 +1,94 @@
+"""
+Batch API tests
+"""
+
+from flask import jsonify
+
+from app import db
+from app.models import LeadPackage
+
+
+class TestBatch:
+    """测试批量请求API"""
+
+    def test_batch_matches_individual_requests(self, client, sample_task):
+        """测试子请求结果与单独调用一致，错误按子请求返回"""
+        package_id = sample_task.package_id
+        paths = [
+            "/api/metrics/dashboard",
+            f"/api/packages/{package_id}?include=dial_tasks",
+            f"/api/tasks/{sample_task.id}",
+            "/api/packages/99999",
+        ]
+
+        response = client.post(
+            "/api/batch",
+            json={
+                "requests": [{"id": i, "path": path} for i, path in enumerate(paths)]
+                + [{"path": "/api/packages", "method": "POST"}]
+            },
+        )
+
+        assert response.status_code == 200
+        results = response.get_json()["data"]
+        assert [r.get("id") for r in results] == [0, 1, 2, 3, None]
+        assert [r["status"] for r in results] == [200, 200, 200, 404, 405]
+
+        for path, result in zip(paths, results):
+            assert result["path"] == path
+            assert result["body"] == client.get(path).get_json()
+        assert results[1]["body"]["data"]["dial_tasks"][0]["id"] == sample_task.id
+
+    def test_batch_forwards_authorization(self, client, auth_headers):
+        """测试转发 Authorization 头（path 相对于 API 根路径）"""
+        body = {"requests": [{"path": "/auth/me"}]}
+
+        result = client.post("/api/batch", json=body, headers=auth_headers)
+        assert result.get_json()["data"][0]["status"] == 200
+        assert result.get_json()["data"][0]["body"]["data"]["username"] == "testuser"
+
+        result = client.post("/api/batch", json=body)
+        assert result.get_json()["data"][0]["status"] == 401
+
+    def test_batch_invalid(self, app, client, sample_task):
+        """测试请求体校验、数量限制和流式接口"""
+        assert client.post("/api/batch", json={}).status_code == 400
+        assert client.post("/api/batch", json=[{"path": "/"}]).status_code == 400
+
+        response = client.post(
+            "/api/batch",
+            json={
+                "requests": [
+                    {"path": f"/api/tasks/{sample_task.id}/calls/stream"},
+                    {"path": "api/packages"},
+                    {"method": "GET"},
+                ]
+            },
+        )
+        assert [r["status"] for r in response.get_json()["data"]] == [400, 400, 400]
+
+        app.config["BATCH_MAX_REQUESTS"] = 2
+        response = client.post(
+            "/api/batch", json={"requests": [{"path": "/api/packages"}] * 3}
+        )
+        assert response.status_code == 400
+
+    def test_batch_rolls_back_failed_sub_request(self, app, client, sample_package):
+        """测试子请求返回 5xx 时回滚共用的会话，后续子请求看不到未提交的修改"""
+
+        def broken():
+            db.session.add(LeadPackage(name="未提交", source="采买"))
+            db.session.flush()
+            return jsonify({"success": False, "error": "服务暂不可用"}), 503
+
+        app.add_url_rule("/api/broken", "broken", broken)
+
+        response = client.post(
+            "/api/batch",
+            json={"requests": [{"path": "/broken"}, {"path": "/packages"}]},
+        )
+
+        results = response.get_json()["data"]
+        assert [r["status"] for r in results] == [503, 200]
+        assert [p["name"] for p in results[1]["body"]["data"]] == [sample_package.name]
+        assert LeadPackage.query.count() == 1
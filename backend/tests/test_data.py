@@ -0,0 +1,185 @@
+"""
+Widget data API tests
+"""
+
+import pytest
+from datetime import datetime
+from app import db
+from app.models import LeadPackage, DialTask
+from app.utils import widget_snapshot
+
+
+@pytest.fixture
+def widget_data():
+    """创建两个年级的数据包和本月的外呼任务"""
+    now = datetime.utcnow()
+
+    high = LeadPackage(name="高中包", source="采买", industry="高中", valid_leads=1000)
+    middle = LeadPackage(name="初中包", source="采买", industry="初中", valid_leads=300)
+    empty = LeadPackage(name="空包", source="采买", industry="初中", valid_leads=200)
+    db.session.add_all([high, middle, empty])
+    db.session.flush()
+
+    db.session.add_all(
+        [
+            DialTask(
+                package_id=high.id,
+                task_name="任务1",
+                start_time=now,
+                total_calls=400,
+                connected_calls=100,
+            ),
+            DialTask(
+                package_id=high.id,
+                task_name="任务2",
+                start_time=now,
+                total_calls=100,
+                connected_calls=50,
+            ),
+            DialTask(
+                package_id=middle.id,
+                task_name="任务3",
+                start_time=now,
+                total_calls=500,
+                connected_calls=250,
+            ),
+        ]
+    )
+    db.session.commit()
+    return {"high": high, "middle": middle, "empty": empty}
+
+
+class TestRemaining:
+    """测试数据余量API"""
+
+    def test_remaining_by_level(self, client, widget_data):
+        """测试按年级统计剩余量（超出有效线索的包按 0 计）"""
+        response = client.get("/api/data/remaining")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data["by_level"] == {"高中": 500, "初中": 200}
+        assert data["total_remaining"] == 700
+        assert data["warning"]["is_low"] is True
+
+
+class TestMonthConsumption:
+    """测试本月消耗API"""
+
+    def test_month_total(self, client, widget_data):
+        """测试本月消耗按年级汇总"""
+        response = client.get("/api/data/consumption/month-total")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data["by_level"] == {"高中": 500, "初中": 500}
+        assert data["total_consumption"] == 1000
+
+
+class TestPackageProgress:
+    """测试数据包进度API"""
+
+    def test_package_progress(self, client, widget_data):
+        """测试每个数据包的外呼进度"""
+        response = client.get("/api/data/value/package-progress")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        progress = {pkg["name"]: pkg for pkg in data["packages"]}
+        assert progress["高中包"]["called"] == 500
+        assert progress["高中包"]["progress_rate"] == 50.0
+        assert progress["初中包"]["remaining"] == 0
+        assert progress["空包"]["called"] == 0
+        assert data["summary"]["total_packages"] == 3
+
+
+class TestConnectRate:
+    """测试接通率分析API"""
+
+    def test_connect_rate(self, client, widget_data):
+        """测试按年级统计接通率和近 7 天趋势"""
+        response = client.get("/api/data/value/connect-rate")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data["by_level"]["高中"] == {
+            "total_calls": 500,
+            "connected_calls": 150,
+            "contact_rate": 30.0,
+        }
+        assert data["overall_rate"] == 40.0
+        assert sum(day["total_calls"] for day in data["trend_7days"]) == 1000
+
+
+class TestWidgetSnapshot:
+    """测试 Widget 数据快照"""
+
+    def test_snapshot_matches_live_response(self, app, client, widget_data, tmp_path):
+        """测试快照响应与实时计算的响应逐字节一致"""
+        live = client.get("/api/data/value/package-progress")
+
+        app.config["WIDGET_SNAPSHOT_PATH"] = str(tmp_path / "snapshot.json")
+        response = client.get("/api/data/value/package-progress")
+
+        assert response.status_code == 200
+        assert response.data == live.data
+        assert response.headers["X-Snapshot-Age"] == "0"
+        assert (tmp_path / "snapshot.json").exists()
+
+    def test_snapshot_served_until_stale(self, app, client, widget_data, tmp_path):
+        """测试快照在有效期内不读数据库，过期后重新生成"""
+        app.config["WIDGET_SNAPSHOT_PATH"] = str(tmp_path / "snapshot.json")
+        client.get("/api/data/remaining")
+
+        widget_data["high"].valid_leads = 5000
+        db.session.commit()
+
+        cached = client.get("/api/data/remaining").get_json()
+        assert cached["data"]["by_level"]["高中"] == 500
+
+        app.config["WIDGET_SNAPSHOT_MAX_AGE"] = -1
+        fresh = client.get("/api/data/remaining").get_json()
+        assert fresh["data"]["by_level"]["高中"] == 4500
+
+    def test_stale_snapshot_rebuilt_by_one_request(
+        self, app, client, widget_data, tmp_path
+    ):
+        """测试快照过期时只有拿到锁的请求重新生成，其他请求返回旧快照"""
+        path = str(tmp_path / "snapshot.json")
+        app.config["WIDGET_SNAPSHOT_PATH"] = path
+        client.get("/api/data/remaining")
+
+        widget_data["high"].valid_leads = 5000
+        db.session.commit()
+        app.config["WIDGET_SNAPSHOT_MAX_AGE"] = -1
+
+        # 其他 worker 正在生成时，直接返回旧快照
+        with widget_snapshot._locked(path, blocking=True):
+            stale = client.get("/api/data/remaining").get_json()
+        assert stale["data"]["by_level"]["高中"] == 500
+
+        fresh = client.get("/api/data/remaining").get_json()
+        assert fresh["data"]["by_level"]["高中"] == 4500
+
+    def test_too_stale_snapshot_not_served(self, app, client, widget_data, tmp_path):
+        """测试超过最大容忍年龄的快照不再返回：等待锁重新生成，等待超时返回 503"""
+        path = str(tmp_path / "snapshot.json")
+        app.config.update(
+            WIDGET_SNAPSHOT_PATH=path,
+            WIDGET_SNAPSHOT_MAX_AGE=-1,
+            WIDGET_SNAPSHOT_MAX_STALE=-1,
+            WIDGET_SNAPSHOT_LOCK_TIMEOUT=0.1,
+        )
+        client.get("/api/data/remaining")
+
+        widget_data["high"].valid_leads = 5000
+        db.session.commit()
+
+        # 生成者一直占着锁
+        with widget_snapshot._locked(path, blocking=True):
+            response = client.get("/api/data/remaining")
+        assert response.status_code == 503
+        assert response.get_json()["success"] is False
+
+        fresh = client.get("/api/data/remaining").get_json()
+        assert fresh["data"]["by_level"]["高中"] == 4500
@@ -0,0 +1,91 @@
+"""
+Index usage tests
+
+检查热点查询在 SQLite 和 PostgreSQL 上确实使用了对应的索引。
+PostgreSQL 测试需要设置 TEST_POSTGRES_URL 环境变量（指向可随意清空的测试库）。
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from app import db
+
+# (期望使用的索引, 查询语句, 参数)
+HOT_QUERIES = [
+    (
+        "ix_calls_task_id_call_time",
+        "SELECT id FROM calls WHERE task_id = :task_id ORDER BY call_time DESC",
+        {"task_id": 1},
+    ),
+    (
+        "ix_calls_call_time_result",
+        "SELECT count(*) FROM calls "
+        "WHERE call_time >= :start AND call_time < :end AND result = 'connected'",
+        {"start": datetime(2025, 10, 17), "end": datetime(2025, 10, 18)},
+    ),
+    (
+        "ix_call_tags_call_id_tag",
+        "SELECT tag_name, tag_value, count(*) FROM call_tags "
+        "WHERE call_id = :call_id GROUP BY tag_name, tag_value",
+        {"call_id": 1},
+    ),
+    (
+        "ix_dial_tasks_package_id_status",
+        "SELECT id FROM dial_tasks WHERE package_id = :package_id "
+        "AND status = 'completed'",
+        {"package_id": 1},
+    ),
+    (
+        "ix_dial_tasks_start_time",
+        "SELECT id FROM dial_tasks WHERE start_time >= :start AND start_time < :end",
+        {"start": datetime(2025, 10, 1), "end": datetime(2025, 11, 1)},
+    ),
+    (
+        "ix_lead_packages_industry_created_at",
+        "SELECT id FROM lead_packages WHERE industry = :industry "
+        "ORDER BY created_at DESC",
+        {"industry": "高中"},
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "index_name,sql,params", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES]
+)
+def test_sqlite_uses_index(index_name, sql, params):
+    """测试 SQLite 查询计划使用索引"""
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+    plan = " ".join(str(row[-1]) for row in rows)
+
+    assert index_name in plan
+
+
+@pytest.fixture(scope="module")
+def postgres_engine():
+    """PostgreSQL 测试引擎（未配置时跳过）"""
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("未设置 TEST_POSTGRES_URL")
+
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    yield engine
+    db.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "index_name,sql,params", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES]
+)
+def test_postgres_uses_index(postgres_engine, index_name, sql, params):
+    """测试 PostgreSQL 查询计划使用索引"""
+    with postgres_engine.connect() as conn:
+        # 空表上顺序扫描总是更便宜，关闭后才能看出索引是否可用
+        conn.execute(text("SET enable_seqscan = off"))
+        rows = conn.execute(text(f"EXPLAIN {sql}"), params).fetchall()
+
+    plan = " ".join(row[0] for row in rows)
+
+    assert index_name in plan
@@ -0,0 +1,591 @@
+"""
+Metrics API tests
+"""
+
+import csv
+import io
+import json
+import time
+
+import pytest
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import (
+    Call,
+    DailyPackageMetrics,
+    DialTask,
+    DailyPackageTagMetrics,
+    LeadPackage,
+    MetricsSummary,
+)
+from app.utils.cache import MemoryBackend, SQLiteBackend, get_cache, invalidate
+from app.utils.date_range import (
+    business_today,
+    day_range,
+    month_range,
+    to_business_date,
+)
+
+
+class TestDateRange:
+    """测试业务日期区间"""
+
+    def test_day_range_uses_business_timezone(self, app):
+        """测试业务日期转换为 UTC 半开区间（默认 UTC+8）"""
+        start, end = day_range(date(2025, 10, 18))
+
+        assert start == datetime(2025, 10, 17, 16, 0, 0)
+        assert end == datetime(2025, 10, 18, 16, 0, 0)
+
+    def test_month_range_across_year(self, app):
+        """测试跨年月份区间"""
+        start, end = month_range(date(2025, 12, 5))
+
+        assert start == datetime(2025, 11, 30, 16, 0, 0)
+        assert end == datetime(2025, 12, 31, 16, 0, 0)
+
+    def test_to_business_date(self, app):
+        """测试 UTC 时间转换为业务日期"""
+        assert to_business_date(datetime(2025, 10, 17, 17, 0, 0)) == date(2025, 10, 18)
+        assert to_business_date(datetime(2025, 10, 17, 15, 59, 0)) == date(2025, 10, 17)
+
+
+class TestDashboard:
+    """测试仪表盘API"""
+
+    def test_dashboard_today_calls(self, client, sample_task):
+        """测试今日通话统计只包含业务时区今天的通话"""
+        now = datetime.utcnow()
+        db.session.add_all(
+            [
+                Call(
+                    task_id=sample_task.id,
+                    phone_number="1",
+                    call_time=now,
+                    result="connected",
+                ),
+                Call(
+                    task_id=sample_task.id,
+                    phone_number="2",
+                    call_time=now,
+                    result="busy",
+                ),
+                Call(
+                    task_id=sample_task.id,
+                    phone_number="3",
+                    call_time=now - timedelta(days=2),
+                    result="connected",
+                ),
+            ]
+        )
+        db.session.commit()
+
+        response = client.get("/api/metrics/dashboard")
+
+        assert response.status_code == 200
+        summary = response.get_json()["data"]["summary"]
+        assert summary["today_calls"] == 2
+        assert summary["today_connected"] == 1
+
+
+class TestDailyRollup:
+    """测试每日指标汇总"""
+
+    def test_trends_updated_on_call_insert(self, client, sample_task):
+        """测试写入通话时增量更新当天汇总"""
+        for result, duration in [("connected", 90), ("connected", 30), ("busy", 0)]:
+            client.post(
+                f"/api/tasks/{sample_task.id}/calls",
+                json={"phone_number": "1", "result": result, "duration": duration},
+            )
+
+        response = client.get("/api/metrics/trends?days=1")
+
+        today = response.get_json()["data"][-1]
+        assert today["total_calls"] == 3
+        assert today["connected_calls"] == 2
+        assert today["total_duration"] == 120
+        assert today["avg_call_duration"] == 60
+        assert today["avg_contact_rate"] == pytest.approx(2 / 3)
+
+    def test_new_summary_seeds_package_metrics(self, client, sample_task):
+        """测试写入通话时新建的当天汇总行带有数据包累计指标"""
+        db.session.add(
+            LeadPackage(
+                name="旧数据包",
+                source="采买",
+                total_leads=500,
+                total_cost=250.0,
+                created_at=datetime.utcnow() - timedelta(days=3),
+            )
+        )
+        db.session.commit()
+
+        client.post(
+            f"/api/tasks/{sample_task.id}/calls",
+            json={"phone_number": "1", "result": "connected", "duration": 60},
+        )
+
+        summary = MetricsSummary.query.one()
+        assert summary.total_calls == 1
+        assert summary.total_packages == 2
+        assert summary.new_packages == 1
+        assert summary.total_leads == 1500
+        assert summary.total_cost == pytest.approx(250.0)
+
+    def test_rebuild_range(self, sample_package, sample_task):
+        """测试按业务日期一次性重建区间汇总"""
+        db.session.add_all(
+            [
+                # UTC 10-17 17:00 = 业务日期 10-18
+                Call(
+                    task_id=sample_task.id,
+                    phone_number="1",
+                    call_time=datetime(2025, 10, 17, 17, 0, 0),
+                    duration=60,
+                    result="connected",
+                ),
+                Call(
+                    task_id=sample_task.id,
+                    phone_number="2",
+                    call_time=datetime(2025, 10, 17, 10, 0, 0),
+                    result="busy",
+                ),
+            ]
+        )
+        sample_package.created_at = datetime(2025, 10, 16, 12, 0, 0)
+        db.session.commit()
+
+        days = MetricsSummary.rebuild_range(date(2025, 10, 16), date(2025, 10, 18))
+        db.session.commit()
+
+        assert days == 3
+        summaries = {s.date: s for s in MetricsSummary.query.all()}
+        assert summaries[date(2025, 10, 16)].new_packages == 1
+        assert summaries[date(2025, 10, 16)].total_calls == 0
+        assert summaries[date(2025, 10, 17)].total_calls == 1
+        assert summaries[date(2025, 10, 17)].total_packages == 1
+        assert summaries[date(2025, 10, 18)].connected_calls == 1
+        assert summaries[date(2025, 10, 18)].avg_contact_rate == 1.0
+
+    def test_calculate_today_summary(self, client, sample_package):
+        """测试计算今日指标汇总"""
+        response = client.post("/api/metrics/summary/today")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data["total_packages"] == 1
+        assert data["new_packages"] == 1
+        assert data["total_leads"] == 1000
+
+
+class TestPackageRollup:
+    """测试数据包每日指标汇总"""
+
+    def _post_calls(self, client, task_id):
+        calls = [
+            {
+                "phone_number": "1",
+                "result": "connected",
+                "duration": 60,
+                "tags": [{"tag_name": "interest_level", "tag_value": "high"}],
+            },
+            {
+                "phone_number": "2",
+                "result": "connected",
+                "duration": 20,
+                "tags": [{"tag_name": "AS1", "tag_value": "有意向"}],
+            },
+            {"phone_number": "3", "result": "busy"},
+        ]
+        for call in calls:
+            client.post(f"/api/tasks/{task_id}/calls", json=call)
+
+    def test_rollup_by_industry(self, client, sample_task):
+        """测试按行业汇总"""
+        self._post_calls(client, sample_task.id)
+
+        response = client.get("/api/metrics/rollup?dimension=industry")
+
+        assert response.status_code == 200
+        assert response.get_json()["data"] == [
+            {
+                "key": "高中",
+                "total_calls": 3,
+                "connected_calls": 2,
+                "total_duration": 80,
+                "interested_calls": 1,
+                "contact_rate": pytest.approx(2 / 3),
+                "interest_rate": 0.5,
+            }
+        ]
+
+    def test_rollup_tags(self, client, sample_task):
+        """测试 tags=1 时返回标签统计"""
+        self._post_calls(client, sample_task.id)
+
+        response = client.get("/api/metrics/rollup?dimension=package&tags=1")
+
+        data = response.get_json()["data"]
+        assert data[0]["tags"] == {"AS1": 1, "interest_level": 1}
+
+        response = client.get("/api/metrics/rollup?dimension=source&by_date=1&tags=1")
+
+        data = response.get_json()["data"]
+        assert data[0]["date"] == business_today().isoformat()
+        assert data[0]["tags"] == {"AS1": 1, "interest_level": 1}
+
+        response = client.get("/api/metrics/rollup?dimension=source")
+
+        assert "tags" not in response.get_json()["data"][0]
+
+    def test_rollup_invalid_dimension(self, client):
+        """测试不支持的汇总维度"""
+        response = client.get("/api/metrics/rollup?dimension=phone")
+
+        assert response.status_code == 400
+
+    def test_rollup_invalid_date(self, client):
+        """测试日期格式错误"""
+        for query in ("start_date=2025-13-01", "end_date=yesterday"):
+            response = client.get(f"/api/metrics/rollup?{query}")
+
+            assert response.status_code == 400
+            assert "日期格式错误" in response.get_json()["error"]
+
+    def test_rebuild_matches_incremental(self, client, sample_task):
+        """测试全量重建与增量维护结果一致"""
+        self._post_calls(client, sample_task.id)
+
+        def snapshot():
+            rows = DailyPackageMetrics.query.all()
+            tags = DailyPackageTagMetrics.query.order_by("tag_name").all()
+            return (
+                [
+                    (r.date, r.total_calls, r.connected_calls, r.interested_calls)
+                    for r in rows
+                ],
+                [(t.tag_name, t.tag_count) for t in tags],
+            )
+
+        incremental = snapshot()
+
+        today = business_today()
+        DailyPackageMetrics.rebuild_range(today, today)
+        db.session.commit()
+
+        assert snapshot() == incremental
+
+    def test_delete_task_subtracts_calls(self, client, sample_package, sample_task):
+        """测试删除任务时从每日汇总和数据包每日指标中减去该任务的通话"""
+        other = DialTask(package_id=sample_package.id, task_name="保留任务")
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+
+        self._post_calls(client, sample_task.id)
+        client.post(
+            f"/api/tasks/{other_id}/calls",
+            json={"phone_number": "4", "result": "connected", "duration": 30},
+        )
+
+        response = client.delete(f"/api/tasks/{sample_task.id}")
+        assert response.status_code == 200
+
+        summary = MetricsSummary.query.one()
+        assert summary.total_calls == 1
+        assert summary.connected_calls == 1
+        assert summary.total_duration == 30
+        assert summary.avg_contact_rate == 1.0
+
+        metrics = DailyPackageMetrics.query.one()
+        assert (
+            metrics.total_calls,
+            metrics.connected_calls,
+            metrics.total_duration,
+            metrics.interested_calls,
+        ) == (1, 1, 30, 0)
+        assert {t.tag_name: t.tag_count for t in DailyPackageTagMetrics.query} == {
+            "AS1": 0,
+            "interest_level": 0,
+        }
+
+
+class TestPackageStats:
+    """测试数据包统计API"""
+
+    def test_package_stats_aggregates(self, client, sample_task, statements):
+        """测试任务状态和通话结果在数据库中分组统计"""
+        db.session.add(
+            DialTask(
+                package_id=sample_task.package_id,
+                task_name="已完成",
+                status="completed",
+            )
+        )
+        for i, result in enumerate(["connected", "connected", "busy", "rejected"]):
+            db.session.add(
+                Call(task_id=sample_task.id, phone_number=str(i), result=result)
+            )
+        db.session.commit()
+
+        statements.clear()
+        response = client.get(f"/api/metrics/package/{sample_task.package_id}/stats")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data["task_stats"] == {
+            "total": 2,
+            "completed": 1,
+            "in_progress": 0,
+            "pending": 1,
+        }
+        assert data["call_stats"] == {
+            "total": 4,
+            "result_distribution": {"connected": 2, "busy": 1, "rejected": 1},
+        }
+
+        # 不加载通话记录，只执行分组聚合
+        assert not any("calls.phone_number" in s for s in statements)
+        assert sum("GROUP BY" in s for s in statements) >= 2
+
+    def test_package_stats_not_found(self, client):
+        """测试数据包不存在"""
+        assert client.get("/api/metrics/package/99999/stats").status_code == 404
+
+
+class TestExport:
+    """测试指标流式导出"""
+
+    @pytest.fixture
+    def export_calls(self, sample_task):
+        """2025-10-17 ~ 2025-10-19（业务日期）各一条通话记录"""
+        for i, day in enumerate((17, 18, 19)):
+            db.session.add(
+                Call(
+                    task_id=sample_task.id,
+                    phone_number=f"1380013800{i}",
+                    call_time=datetime(2025, 10, day, 2, 0, 0),
+                    duration=30,
+                    result="connected" if i != 1 else "no_answer",
+                    customer_name="张三",
+                )
+            )
+        db.session.commit()
+
+    def test_export_calls_csv(self, app, client, sample_task, export_calls):
+        """测试 CSV 导出按日期和结果过滤"""
+        app.config["EXPORT_BATCH_SIZE"] = 1
+
+        response = client.get(
+            "/api/metrics/export?start_date=2025-10-17&end_date=2025-10-19"
+            "&result=connected"
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "text/csv"
+        assert "calls_20251017_20251019.csv" in response.headers["Content-Disposition"]
+
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert rows[0][0] == "\ufeffid"
+        assert rows[0][1:6] == [
+            "task_id",
+            "package_id",
+            "task_name",
+            "phone_number",
+            "call_time",
+        ]
+        assert [row[4] for row in rows[1:]] == ["13800138000", "13800138002"]
+        assert rows[1][5] == "2025-10-17T02:00:00"
+        assert rows[1][10] == ""
+
+    def test_export_calls_ndjson(self, client, sample_task, export_calls):
+        """测试 NDJSON 导出按数据包和日期过滤"""
+        response = client.get(
+            f"/api/metrics/export?format=ndjson&package_id={sample_task.package_id}"
+            "&start_date=2025-10-18"
+        )
+
+        assert response.mimetype == "application/x-ndjson"
+        rows = [
+            json.loads(line) for line in response.get_data(as_text=True).splitlines()
+        ]
+        assert [row["phone_number"] for row in rows] == ["13800138001", "13800138002"]
+        assert rows[0]["customer_name"] == "张三"
+        assert rows[0]["package_id"] == sample_task.package_id
+
+        response = client.get("/api/metrics/export?format=ndjson&package_id=99999")
+        assert response.get_data(as_text=True) == ""
+
+    def test_export_summaries(self, client, sample_task, export_calls):
+        """测试导出每日汇总"""
+        MetricsSummary.rebuild_range(date(2025, 10, 17), date(2025, 10, 19))
+        DailyPackageMetrics.rebuild_range(date(2025, 10, 17), date(2025, 10, 19))
+        db.session.commit()
+
+        response = client.get(
+            "/api/metrics/export?type=summaries&format=json&end_date=2025-10-18"
+        )
+        rows = [
+            json.loads(line) for line in response.get_data(as_text=True).splitlines()
+        ]
+        assert [(row["date"], row["total_calls"]) for row in rows] == [
+            ("2025-10-17", 1),
+            ("2025-10-18", 1),
+        ]
+
+        response = client.get("/api/metrics/export?type=package_summaries")
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True)[1:])))
+        assert len(rows) == 3
+        assert rows[0]["package_name"] == "测试数据包"
+
+    def test_export_invalid_params(self, client):
+        """测试非法参数"""
+        assert client.get("/api/metrics/export?type=users").status_code == 400
+        assert client.get("/api/metrics/export?format=xml").status_code == 400
+        assert (
+            client.get("/api/metrics/export?start_date=2025/10/01").status_code == 400
+        )
+
+
+class TestResponseCache:
+    """测试接口响应缓存"""
+
+    @pytest.fixture
+    def memory_cache(self, app):
+        app.config["CACHE_BACKEND"] = "memory"
+        return get_cache(app)
+
+    def test_dashboard_cached_until_write(self, client, sample_task, memory_cache):
+        """测试仪表盘命中缓存，写入通话记录后失效"""
+        first = client.get("/api/metrics/dashboard")
+        second = client.get("/api/metrics/dashboard")
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.get_json() == first.get_json()
+
+        client.post(
+            f"/api/tasks/{sample_task.id}/calls",
+            json={"phone_number": "13800138000", "result": "connected"},
+        )
+
+        third = client.get("/api/metrics/dashboard")
+        assert third.headers["X-Cache"] == "MISS"
+        assert third.get_json()["data"]["summary"]["today_calls"] == 1
+
+        stats = client.get("/api/metrics/cache").get_json()["data"]
+        assert stats["backend"] == "memory"
+        assert stats["endpoints"]["metrics.get_dashboard_metrics"] == {
+            "hits": 1,
+            "misses": 2,
+        }
+
+    def test_cache_key_includes_args(self, client, memory_cache):
+        """测试不同查询参数分别缓存，错误响应不缓存"""
+        assert client.get("/api/metrics/trends?days=7").headers["X-Cache"] == "MISS"
+        assert client.get("/api/metrics/trends?days=3").headers["X-Cache"] == "MISS"
+        assert client.get("/api/metrics/trends?days=7").headers["X-Cache"] == "HIT"
+
+        for _ in range(2):
+            response = client.get("/api/metrics/rollup?dimension=bad")
+            assert response.status_code == 400
+            assert response.headers["X-Cache"] == "MISS"
+
+    def test_dashboard_etag(self, client, sample_task):
+        """测试指标接口的条件请求：未变化时 304，写入通话记录后重新生成"""
+        etag = client.get("/api/metrics/dashboard").headers["ETag"]
+
+        response = client.get("/api/metrics/dashboard", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        client.post(
+            f"/api/tasks/{sample_task.id}/calls",
+            json={"phone_number": "13800138000", "result": "connected"},
+        )
+
+        response = client.get("/api/metrics/dashboard", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.get_json()["data"]["summary"]["today_calls"] == 1
+
+    def test_cached_etag_matches_body(self, client, sample_package, memory_cache):
+        """测试命中缓存时 ETag 与缓存的响应体一致（未经 invalidate 的写入不改变 ETag）"""
+        first = client.get("/api/metrics/dashboard")
+        etag = first.headers["ETag"]
+
+        # 其他进程直接写库，没有使 packages 版本号失效
+        db.session.add(LeadPackage(name="数据包2", source="采买", total_leads=10))
+        db.session.commit()
+
+        second = client.get("/api/metrics/dashboard")
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.headers["ETag"] == etag
+        assert second.get_json() == first.get_json()
+
+        response = client.get("/api/metrics/dashboard", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["X-Cache"] == "HIT"
+
+        invalidate("packages")
+        response = client.get("/api/metrics/dashboard", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.get_json()["data"]["summary"]["total_packages"] == 2
+
+    def test_not_modified_skips_view(
+        self, client, sample_package, memory_cache, statements
+    ):
+        """测试 If-None-Match 一致时不执行接口查询（缓存条目被淘汰后也一样）"""
+        etag = client.get("/api/metrics/dashboard").headers["ETag"]
+        assert etag.startswith('W/"')
+
+        memory_cache.backend.clear()
+        statements.clear()
+
+        response = client.get("/api/metrics/dashboard", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert statements == []
+
+    def test_etag_changes_with_time_slice(self, client, memory_cache, monkeypatch):
+        """测试 ETag 至少每个 TTL 变化一次（“今天”的数据随时间变化）"""
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now)
+        etag = client.get("/api/metrics/dashboard").headers["ETag"]
+
+        monkeypatch.setattr(time, "time", lambda: now + memory_cache.default_ttl)
+        response = client.get("/api/metrics/dashboard", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.headers["ETag"] != etag
+
+    def test_memory_backend_lru_and_ttl(self):
+        """测试 LRU 淘汰和过期"""
+        backend = MemoryBackend(max_entries=2)
+        backend.set("a", b"1", ttl=60)
+        backend.set("b", b"2", ttl=60)
+        backend.get("a")
+        backend.set("c", b"3", ttl=60)
+
+        assert backend.get("a") == b"1"
+        assert backend.get("b") is None
+
+        backend.set("d", b"4", ttl=0)
+        assert backend.get("d") is None
+
+    def test_sqlite_backend_shared(self, tmp_path):
+        """测试 SQLite 后端在多个实例（进程）之间共享缓存和版本号"""
+        path = str(tmp_path / "cache.db")
+        worker_a, worker_b = SQLiteBackend(path), SQLiteBackend(path)
+
+        worker_a.set("key", b"value", ttl=60)
+        assert worker_b.get("key") == b"value"
+
+        worker_a.incr("generation:calls")
+        worker_a.incr("generation:calls")
+        assert worker_b.get_counters(["generation:calls", "generation:tasks"]) == [
+            2,
+            0,
+        ]
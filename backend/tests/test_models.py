@@ -4,7 +4,7 @@ Model tests
 
 import pytest
 from app import db
-from app.models import User, LeadPackage, DialTask, Call
+from app.models import User, LeadPackage, DialTask, Call, CallTag, PackageTagSummary
 from datetime import datetime
 
 
@@ -112,6 +112,70 @@ class TestLeadPackageModel:
             sample_package.total_cost == 1000.0
         )  # total_leads * cost_per_lead = 1000 * 1.0
 
+    def test_get_call_statistics(self, sample_package, sample_task):
+        """测试通话统计（duration > 0 也算接通）"""
+        db.session.add_all(
+            [
+                Call(
+                    task_id=sample_task.id,
+                    phone_number="13800138000",
+                    duration=30,
+                    result="voicemail",
+                ),
+                Call(
+                    task_id=sample_task.id,
+                    phone_number="13800138001",
+                    duration=0,
+                    result="connected",
+                ),
+                Call(
+                    task_id=sample_task.id,
+                    phone_number="13800138002",
+                    duration=0,
+                    result="no_answer",
+                ),
+            ]
+        )
+        db.session.commit()
+
+        stats = sample_package.get_call_statistics()
+
+        assert stats["total_calls"] == 3
+        assert stats["connected_calls"] == 2
+        assert stats["has_call_data"] is True
+
+    def test_get_call_statistics_without_calls(self, sample_package):
+        """测试没有通话记录时的统计"""
+        stats = sample_package.get_call_statistics()
+
+        assert stats == {
+            "total_calls": 0,
+            "connected_calls": 0,
+            "contact_rate": 0.0,
+            "has_call_data": False,
+        }
+
+    def test_get_call_statistics_batch(self, sample_package, sample_task):
+        """测试批量获取通话统计"""
+        empty_package = LeadPackage(name="空数据包", source="采买")
+        db.session.add(empty_package)
+        db.session.add_all(
+            [
+                Call(task_id=sample_task.id, phone_number="1", result="connected"),
+                Call(task_id=sample_task.id, phone_number="2", result="busy"),
+            ]
+        )
+        db.session.commit()
+
+        stats = LeadPackage.get_call_statistics_batch()
+
+        assert stats[sample_package.id]["total_calls"] == 2
+        assert stats[sample_package.id]["contact_rate"] == 0.5
+        assert stats[empty_package.id]["has_call_data"] is False
+
+        stats = LeadPackage.get_call_statistics_batch([empty_package.id])
+        assert list(stats) == [empty_package.id]
+
 
 class TestDialTaskModel:
     """测试DialTask模型"""
@@ -145,3 +209,52 @@ class TestDialTaskModel:
         """测试任务和数据包的关系"""
         assert sample_task.package.id == sample_package.id
         assert sample_task in sample_package.dial_tasks.all()
+
+
+class TestPackageTagSummaryModel:
+    """测试数据包标签汇总模型"""
+
+    def add_call(self, task, tags):
+        call = Call(task_id=task.id, phone_number="13800138000")
+        db.session.add(call)
+        db.session.flush()
+        for tag_name, tag_value in tags:
+            db.session.add(
+                CallTag(call_id=call.id, tag_name=tag_name, tag_value=tag_value)
+            )
+
+    def summaries(self, package):
+        return {
+            (s.tag_name, s.tag_value): (s.tag_count, s.percentage)
+            for s in PackageTagSummary.query.filter_by(package_id=package.id)
+        }
+
+    def test_rebuild_all(self, sample_package, sample_task):
+        """测试一次聚合生成所有数据包的汇总，重复执行结果不变并删除过期记录"""
+        other = LeadPackage(name="其他数据包", source="采买")
+        db.session.add(other)
+        db.session.flush()
+        other_task = DialTask(package_id=other.id, task_name="其他任务")
+        db.session.add(other_task)
+        db.session.flush()
+
+        self.add_call(sample_task, [("AS1", "高意向"), ("AS2", None)])
+        self.add_call(sample_task, [("AS1", "高意向"), ("AS2", None)])
+        self.add_call(other_task, [("AF1", "无意向")])
+        db.session.add(
+            PackageTagSummary(
+                package_id=sample_package.id, tag_name="OLD", tag_value="x", tag_count=9
+            )
+        )
+        db.session.commit()
+
+        assert PackageTagSummary.rebuild_all() == 3
+        db.session.commit()
+        assert PackageTagSummary.rebuild_all() == 3
+        db.session.commit()
+
+        assert self.summaries(sample_package) == {
+            ("AS1", "高意向"): (2, 0.5),
+            ("AS2", None): (2, 0.5),
+        }
+        assert self.summaries(other) == {("AF1", "无意向"): (1, 1.0)}
@@ -2,9 +2,14 @@
 Lead Package API tests
 """
 
+import csv
+import io
+import os
+
 import pytest
 from app import db
 from app.models import LeadPackage
+from app.utils.package_import import PackageImporter, import_file, read_rows
 
 
 class TestPackageList:
@@ -29,6 +34,99 @@ class TestPackageList:
         assert len(data["data"]) == 1
         assert data["data"][0]["name"] == "测试数据包"
 
+    def test_get_packages_cursor(self, client):
+        """测试数据包列表游标分页"""
+        for i in range(3):
+            db.session.add(LeadPackage(name=f"数据包{i}", source="采买"))
+        db.session.commit()
+
+        response = client.get("/api/packages?per_page=2&cursor=&with_total=1")
+        body = response.get_json()
+        assert len(body["data"]) == 2
+        assert body["pagination"]["total"] == 3
+        assert body["pagination"]["has_more"] is True
+
+        cursor = body["pagination"]["next_cursor"]
+        response = client.get(f"/api/packages?per_page=2&cursor={cursor}")
+        body = response.get_json()
+        assert len(body["data"]) == 1
+        assert body["pagination"]["next_cursor"] is None
+
+    def test_get_packages_cursor_per_page_bounds(self, client):
+        """测试游标分页的 per_page 为 0 或负数时按 1 处理"""
+        for i in range(3):
+            db.session.add(LeadPackage(name=f"数据包{i}", source="采买"))
+        db.session.commit()
+
+        for per_page in (0, -3):
+            response = client.get(f"/api/packages?cursor=&per_page={per_page}")
+            assert response.status_code == 200
+            body = response.get_json()
+            assert len(body["data"]) == 1
+            assert body["pagination"]["next_cursor"] is not None
+
+    def test_get_packages_cursor_null_created_at(self, client):
+        """测试创建时间为空的数据包排在最后并按 id 分页"""
+        packages = [LeadPackage(name=f"数据包{i}", source="采买") for i in range(4)]
+        db.session.add_all(packages)
+        db.session.commit()
+        ids = [package.id for package in packages]
+        LeadPackage.query.filter(LeadPackage.id.in_(ids[1:])).update(
+            {LeadPackage.created_at: None}, synchronize_session=False
+        )
+        db.session.commit()
+
+        seen = []
+        cursor = ""
+        while True:
+            response = client.get(f"/api/packages?per_page=1&cursor={cursor}")
+            body = response.get_json()
+            seen.extend(package["id"] for package in body["data"])
+
+            cursor = body["pagination"]["next_cursor"]
+            if cursor is None:
+                break
+
+        assert seen == [ids[0], ids[3], ids[2], ids[1]]
+
+    def test_get_packages_fields(self, client, statements):
+        """测试列表 fields 参数只查询指定列，游标分页仍然可用"""
+        for i in range(3):
+            db.session.add(LeadPackage(name=f"数据包{i}", source="采买"))
+        db.session.commit()
+
+        statements.clear()
+        response = client.get(
+            "/api/packages?fields=name,contact_rate&per_page=2&cursor="
+        )
+        body = response.get_json()
+        assert [set(item) for item in body["data"]] == [
+            {"id", "name", "contact_rate"}
+        ] * 2
+
+        select = [s for s in statements if "FROM lead_packages" in s][-1]
+        assert "lead_packages.total_cost" not in select
+
+        cursor = body["pagination"]["next_cursor"]
+        response = client.get(f"/api/packages?fields=name&per_page=2&cursor={cursor}")
+        assert response.get_json()["data"] == [{"id": 1, "name": "数据包0"}]
+
+        assert client.get("/api/packages?fields=nope").status_code == 400
+
+    def test_get_packages_etag(self, client, sample_package):
+        """测试数据包列表的 ETag 随过滤条件和数据变化"""
+        etag = client.get("/api/packages").headers["ETag"]
+        assert client.get("/api/packages?industry=高中").headers["ETag"] != etag
+
+        response = client.get("/api/packages", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        client.put(f"/api/packages/{sample_package.id}", json={"region": "上海"})
+
+        response = client.get("/api/packages", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.get_json()["data"][0]["region"] == "上海"
+
 
 class TestPackageCreate:
     """测试创建数据包API"""
@@ -70,8 +168,10 @@ class TestPackageDetail:
     """测试数据包详情API"""
 
     def test_get_package_success(self, client, sample_package):
-        """测试获取数据包详情"""
-        response = client.get(f"/api/packages/{sample_package.id}")
+        """测试获取数据包详情（按 include 内嵌关联数据）"""
+        response = client.get(
+            f"/api/packages/{sample_package.id}?include=dial_tasks,tag_summaries"
+        )
 
         assert response.status_code == 200
         data = response.get_json()
@@ -80,12 +180,61 @@ class TestPackageDetail:
         assert "dial_tasks" in data["data"]
         assert "tag_summaries" in data["data"]
 
+    def test_get_package_default_no_embedding(self, client, sample_package):
+        """测试默认不内嵌关联数据，fields 只返回指定字段"""
+        data = client.get(f"/api/packages/{sample_package.id}").get_json()["data"]
+        assert data == sample_package.to_dict()
+
+        response = client.get(
+            f"/api/packages/{sample_package.id}?fields=name,total_leads"
+            "&include=tag_summaries"
+        )
+        assert response.get_json()["data"] == {
+            "id": sample_package.id,
+            "name": "测试数据包",
+            "total_leads": 1000,
+            "tag_summaries": [],
+        }
+
+    def test_get_package_invalid_params(self, client, sample_package):
+        """测试不支持的 fields / include"""
+        url = f"/api/packages/{sample_package.id}"
+        assert client.get(f"{url}?fields=password").status_code == 400
+        assert client.get(f"{url}?include=calls").status_code == 400
+
     def test_get_package_not_found(self, client):
         """测试获取不存在的数据包"""
         response = client.get("/api/packages/99999")
 
         assert response.status_code == 404
 
+    def test_get_package_etag(self, client, sample_package):
+        """测试数据包详情的条件请求：未变化时返回 304，更新后 ETag 改变"""
+        url = f"/api/packages/{sample_package.id}"
+        first = client.get(f"{url}?include=dial_tasks")
+        assert first.status_code == 200
+        assert first.headers["ETag"]
+
+        second = client.get(
+            f"{url}?include=dial_tasks",
+            headers={"If-None-Match": first.headers["ETag"]},
+        )
+        assert second.status_code == 304
+        assert second.data == b""
+        assert second.headers["ETag"] == first.headers["ETag"]
+
+        client.post(f"{url}/tasks", json={"task_name": "新任务"})
+
+        third = client.get(
+            f"{url}?include=dial_tasks",
+            headers={"If-None-Match": first.headers["ETag"]},
+        )
+        assert third.status_code == 200
+        assert third.headers["ETag"] != first.headers["ETag"]
+        assert len(third.get_json()["data"]["dial_tasks"]) == 1
+
+        assert "ETag" not in client.get("/api/packages/99999").headers
+
 
 class TestPackageUpdate:
     """测试更新数据包API"""
@@ -135,3 +284,113 @@ class TestPackageDelete:
         response = client.delete("/api/packages/99999")
 
         assert response.status_code == 404
+
+
+REGISTER_CSV = """name,source,grade,region,total,valid,单价
+dy1-20250905-高中加购.csv,采买,高中,禹州,5000,4000,
+测试数据包,采买,高中,江苏,1000,900,
+dy2-20250905-高中加购.csv,,高中,淮安,5000,5000,
+dy3-20250905-高中加购.csv,采买,高中,淮安,abc,5000,
+dy1-20250905-高中加购.csv,采买,高中,禹州,5000,5000,
+dy4-20250905-高中加购.csv,练习,高中,宜宾,2000,2000,2.5
+"""
+
+
+class TestPackageImport:
+    """测试数据包批量导入"""
+
+    def test_import_api(self, client, sample_package):
+        """测试上传 CSV 导入：去重、逐行校验、指标计算"""
+        response = client.post(
+            "/api/packages/import",
+            data={
+                "file": (io.BytesIO(REGISTER_CSV.encode("utf-8-sig")), "登记表.csv"),
+                "cost_per_lead": "1",
+            },
+            content_type="multipart/form-data",
+        )
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data["total"] == 6
+        assert data["inserted"] == 2
+        assert data["skipped"] == 2
+        assert data["failed"] == 2
+        assert [error["line"] for error in data["errors"]] == [4, 5]
+
+        package = LeadPackage.query.filter_by(name="dy1-20250905-高中加购.csv").one()
+        assert package.industry == "高中"
+        assert package.valid_leads == 4000
+        assert package.cost_per_lead == 1.0
+        assert package.total_cost == 5000.0
+        assert package.contact_rate == 0.8
+
+        package = LeadPackage.query.filter_by(name="dy4-20250905-高中加购.csv").one()
+        assert package.cost_per_lead == 2.5
+
+    def test_import_rejects_fractional_counts(self, client):
+        """测试线索数为小数时拒绝该行，不截断；Excel 的 1000.0 照常导入"""
+        body = (
+            "name,source,total,valid\n"
+            "小数,采买,1000.7,900\n"
+            "整数,采买,1000.0,900.0\n"
+        )
+        response = client.post(
+            "/api/packages/import",
+            data={"file": (io.BytesIO(body.encode("utf-8")), "登记表.csv")},
+            content_type="multipart/form-data",
+        )
+
+        data = response.get_json()["data"]
+        assert data["inserted"] == 1
+        assert data["errors"][0]["line"] == 2
+        assert "必须是整数" in data["errors"][0]["error"]
+        assert LeadPackage.query.filter_by(name="整数").one().total_leads == 1000
+        assert LeadPackage.query.filter_by(name="小数").first() is None
+
+    def test_import_api_unsupported_file(self, client):
+        """测试不支持的文件格式"""
+        response = client.post(
+            "/api/packages/import",
+            data={"file": (io.BytesIO(b"x"), "packages.txt")},
+            content_type="multipart/form-data",
+        )
+
+        assert response.status_code == 400
+
+    def test_import_file_resumes_from_checkpoint(self, tmp_path, sample_package):
+        """测试中断后从断点继续，错误文件不重复"""
+        path = tmp_path / "register.csv"
+        path.write_text(REGISTER_CSV, encoding="utf-8")
+
+        def interrupted(rows):
+            for line_no, raw in rows:
+                if line_no == 6:
+                    raise KeyboardInterrupt
+                yield line_no, raw
+
+        stat = os.stat(path)
+        importer = PackageImporter(
+            chunk_size=1,
+            checkpoint_path=f"{path}.checkpoint.json",
+            error_path=f"{path}.errors.csv",
+        )
+        with open(path, "rb") as f, pytest.raises(KeyboardInterrupt):
+            importer.run(
+                interrupted(read_rows(f, str(path))),
+                source_id=f"{stat.st_size}:{stat.st_mtime_ns}",
+            )
+        assert LeadPackage.query.count() == 2
+
+        result = import_file(str(path))
+
+        # 断点在最后一次提交之后（第 2 行），之后的行重新处理
+        assert result["resumed_from"] == 2
+        assert result["inserted"] == 2
+        assert result["failed"] == 2
+        assert LeadPackage.query.count() == 3
+        assert not os.path.exists(f"{path}.checkpoint.json")
+
+        with open(result["error_path"], encoding="utf-8-sig") as f:
+            lines = list(csv.reader(f))
+        assert [line[0] for line in lines] == ["line", "4", "5"]
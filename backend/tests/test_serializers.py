@@ -0,0 +1,180 @@
+"""
+Serializer and JSON encoder tests
+"""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app, db
+from app.models import Call, CallTag, LeadPackage, MetricsSummary, PackageTagSummary
+from app.utils import json_provider
+from app.utils.json_provider import OrjsonProvider, create_json_provider
+from app.utils.serializers import (
+    CALL,
+    METRICS_SUMMARY,
+    PACKAGE,
+    TASK,
+    dump_calls,
+    dump_tag_summaries,
+)
+
+
+@pytest.fixture
+def sample_calls(sample_task):
+    """创建带标签的示例通话记录（含空值字段）"""
+    for i in range(3):
+        call = Call(
+            task_id=sample_task.id,
+            phone_number=f"1380013800{i}",
+            duration=i * 30,
+            result="connected" if i else "no_answer",
+            notes="意向较高" if i else None,
+        )
+        db.session.add(call)
+        db.session.flush()
+        for j in range(i):
+            db.session.add(CallTag(call_id=call.id, tag_name="意向", tag_value=f"L{j}"))
+    db.session.commit()
+
+
+class TestProjection:
+    """测试列投影序列化与 to_dict() 输出一致"""
+
+    def test_package_and_task(self, sample_task):
+        """测试数据包和任务"""
+        package = db.session.get(LeadPackage, sample_task.package_id)
+
+        assert PACKAGE.dump_many(PACKAGE.query()) == [package.to_dict()]
+        assert TASK.dump_many(TASK.query()) == [sample_task.to_dict()]
+
+    def test_calls_with_tags(self, sample_task, sample_calls):
+        """测试通话记录及标签"""
+        rows = CALL.query().order_by(Call.id).all()
+        expected = Call.to_dict_many(Call.query.order_by(Call.id).all())
+
+        assert dump_calls(rows) == expected
+        assert [len(call["tags"]) for call in expected] == [0, 1, 2]
+
+    def test_tag_summaries_and_metrics(self, client, sample_task, sample_calls):
+        """测试标签汇总占比和每日指标（日期列）"""
+        PackageTagSummary.rebuild_all()
+        MetricsSummary.calculate_today_metrics()
+        db.session.commit()
+
+        package = db.session.get(LeadPackage, sample_task.package_id)
+        assert dump_tag_summaries(package.id, package.tag_total) == [
+            summary.to_dict() for summary in package.tag_summaries
+        ]
+        assert METRICS_SUMMARY.dump_many(METRICS_SUMMARY.query()) == [
+            summary.to_dict() for summary in MetricsSummary.query.all()
+        ]
+
+
+@pytest.mark.skipif(json_provider.orjson is None, reason="未安装 orjson")
+class TestJSONProvider:
+    """测试 JSON 编码器"""
+
+    DATA = {
+        "b": [1, 2.5, None, True],
+        "a": {"名称": "数据包"},
+        "c": {3: "三", 1: "一"},
+        "time": datetime(2025, 10, 18, 9, 30),
+        "amount": Decimal("1.10"),
+    }
+
+    def test_select_encoder(self, app):
+        """测试按配置选择编码器"""
+        app.config["JSON_ENCODER"] = "auto"
+        assert isinstance(create_json_provider(app), OrjsonProvider)
+
+        app.config["JSON_ENCODER"] = "stdlib"
+        provider = create_json_provider(app)
+        assert not isinstance(provider, OrjsonProvider)
+        assert isinstance(provider, DefaultJSONProvider)
+
+        app.config["JSON_ENCODER"] = "ujson"
+        with pytest.raises(ValueError):
+            create_json_provider(app)
+
+    def test_same_as_stdlib(self, app):
+        """测试 orjson 编码结果解析后与标准库一致（键排序、日期、Decimal）"""
+        fast = OrjsonProvider(app)
+        stdlib = DefaultJSONProvider(app)
+
+        encoded = fast.dumps(self.DATA)
+        assert json.loads(encoded) == json.loads(stdlib.dumps(self.DATA))
+        assert encoded.index('"a"') < encoded.index('"b"')
+        assert json.loads(encoded)["time"] == "Sat, 18 Oct 2025 09:30:00 GMT"
+
+        with app.test_request_context():
+            response = fast.response(self.DATA)
+            assert response.mimetype == "application/json"
+            assert json.loads(response.data) == json.loads(
+                stdlib.response(self.DATA).data
+            )
+
+    def test_escape_non_ascii(self, app):
+        """测试默认把非 ASCII 字符转义为 \\uXXXX，接口响应与标准库逐字节一致"""
+        fast = OrjsonProvider(app)
+        stdlib = DefaultJSONProvider(app)
+        value = {"名称": "数据包 é ÿ 😀 \\x41 \\U0001f600 \x7f", "tags": ["意向", "\\"]}
+
+        with app.test_request_context():
+            assert fast.response(value).data == stdlib.response(value).data
+        assert fast.dumps(value).isascii()
+        assert json.loads(fast.dumps(value)) == value
+
+        raw = fast.dumps(value, ensure_ascii=False)
+        assert "数据包" in raw
+        assert json.loads(raw) == value
+
+    def test_floats_same_as_stdlib(self, app):
+        """测试很小、很大的浮点数和 NaN、Infinity 与标准库输出逐字节一致"""
+        fast = OrjsonProvider(app)
+        stdlib = DefaultJSONProvider(app)
+        values = [
+            {"contact_rate": 1 / 100000, "total_cost": 1e16, "notes": None},
+            {"values": [1e-7, 1.5e300, -2e-100, 0.0001, 123.5, 10**17]},
+            {"text": '1e5 0.00001 \\" 2e-7', "rate": 1e-5},
+            {"rate": float("nan"), "notes": None},
+            [float("inf"), float("-inf")],
+            1e-7,
+        ]
+
+        with app.test_request_context():
+            for value in values:
+                assert fast.response(value).data == stdlib.response(value).data
+                compact = {"separators": (",", ":")}
+                assert fast.dumps(value, **compact) == stdlib.dumps(value, **compact)
+
+    def test_fallback_to_stdlib(self, app):
+        """测试 orjson 不支持的数据和参数回退到标准库"""
+        fast = OrjsonProvider(app)
+
+        assert fast.dumps({"n": 2**70}) == '{"n": 1180591620717411303424}'
+        assert fast.dumps([1, 2], indent=4) == json.dumps([1, 2], indent=4)
+
+    def test_endpoint_output_unchanged(self, sample_task, sample_calls):
+        """测试接口在两种编码器下输出逐字节一致"""
+        urls = [
+            "/api/packages",
+            f"/api/packages/{sample_task.package_id}?include=dial_tasks,tag_summaries",
+            f"/api/tasks/{sample_task.id}",
+            f"/api/tasks/{sample_task.id}/calls?per_page=2",
+            "/api/metrics/dashboard",
+        ]
+
+        results = {}
+        for encoder in ("stdlib", "orjson"):
+            app = create_app("testing")
+            app.config["JSON_ENCODER"] = encoder
+            app.json = create_json_provider(app)
+            client = app.test_client()
+            results[encoder] = [client.get(url).data for url in urls]
+
+        assert results["orjson"] == results["stdlib"]
+        assert json.loads(results["stdlib"][3])["pagination"]["total"] == 3
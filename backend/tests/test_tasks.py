@@ -0,0 +1,661 @@
+"""
+Dial Task API tests
+"""
+
+import json
+import threading
+import time
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import (
+    Call,
+    CallTag,
+    DailyPackageMetrics,
+    DialTask,
+    LeadPackage,
+    PackageTagSummary,
+)
+from app.routes import tasks as tasks_routes
+from app.utils import ingest_buffer
+from app.utils.call_ingest import parse_call
+from app.utils.ingest_buffer import IngestBuffer
+
+
+@pytest.fixture
+def sample_calls(sample_task):
+    """创建带标签的示例通话记录"""
+    calls = []
+    for i in range(5):
+        call = Call(
+            task_id=sample_task.id,
+            phone_number=f"1380013800{i}",
+            result="connected" if i % 2 == 0 else "no_answer",
+        )
+        db.session.add(call)
+        db.session.flush()
+        db.session.add(CallTag(call_id=call.id, tag_name="AS1", tag_value=str(i)))
+        calls.append(call)
+    db.session.commit()
+    return calls
+
+
+class TestCallList:
+    """测试通话记录列表API"""
+
+    def test_get_task_calls(self, client, sample_task, sample_calls):
+        """测试通话记录列表与逐条序列化结果一致"""
+        expected = {call.id: call.to_dict() for call in sample_calls}
+        db.session.expire_all()
+
+        response = client.get(f"/api/tasks/{sample_task.id}/calls")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert len(data) == 5
+        for item in data:
+            assert item == expected[item["id"]]
+
+    def test_to_dict_many_query_count(self, sample_calls, statements):
+        """测试批量序列化的查询次数与通话数量无关"""
+        calls = Call.query.all()
+        del statements[:]
+
+        Call.to_dict_many(calls)
+
+        assert len([s for s in statements if "FROM call_tags" in s]) == 1
+
+    def test_get_task_calls_cursor(self, client, sample_task, sample_calls):
+        """测试游标分页按 (call_time, id) 倒序遍历所有通话"""
+        seen = []
+        cursor = ""
+        while True:
+            response = client.get(
+                f"/api/tasks/{sample_task.id}/calls?per_page=2&cursor={cursor}"
+            )
+            assert response.status_code == 200
+            body = response.get_json()
+            assert "total" not in body["pagination"]
+            seen.extend(call["id"] for call in body["data"])
+
+            cursor = body["pagination"]["next_cursor"]
+            if cursor is None:
+                break
+
+        expected = sorted(sample_calls, key=lambda c: (c.call_time, c.id), reverse=True)
+        assert seen == [call.id for call in expected]
+
+    def test_get_task_calls_cursor_null_call_time(
+        self, client, sample_task, sample_calls
+    ):
+        """测试拨打时间为空的通话排在最后，翻页时不会遗漏或重复"""
+        null_ids = [sample_calls[1].id, sample_calls[3].id]
+        Call.query.filter(Call.id.in_(null_ids)).update(
+            {Call.call_time: None}, synchronize_session=False
+        )
+        db.session.commit()
+
+        seen = []
+        cursor = ""
+        while True:
+            response = client.get(
+                f"/api/tasks/{sample_task.id}/calls?per_page=2&cursor={cursor}"
+            )
+            body = response.get_json()
+            seen.extend(call["id"] for call in body["data"])
+
+            cursor = body["pagination"]["next_cursor"]
+            if cursor is None:
+                break
+
+        timed = [call for call in sample_calls if call.id not in null_ids]
+        expected = sorted(timed, key=lambda c: (c.call_time, c.id), reverse=True)
+        assert seen == [call.id for call in expected] + sorted(null_ids, reverse=True)
+
+    def test_get_task_calls_cursor_with_total(self, client, sample_task, sample_calls):
+        """测试游标分页按需返回总数"""
+        response = client.get(
+            f"/api/tasks/{sample_task.id}/calls?cursor=&with_total=1&result=connected"
+        )
+
+        pagination = response.get_json()["pagination"]
+        assert pagination["total"] == 3
+        assert pagination["has_more"] is False
+
+    def test_get_task_calls_cursor_per_page_bounds(
+        self, app, client, sample_task, sample_calls
+    ):
+        """测试游标分页的每页数量限制在 [1, MAX_PAGE_SIZE] 之间"""
+        url = f"/api/tasks/{sample_task.id}/calls?cursor="
+
+        for per_page in (0, -3):
+            response = client.get(f"{url}&per_page={per_page}")
+            assert response.status_code == 200
+            body = response.get_json()
+            assert len(body["data"]) == 1
+            assert body["pagination"]["per_page"] == 1
+            assert body["pagination"]["has_more"] is True
+
+        app.config["MAX_PAGE_SIZE"] = 2
+        body = client.get(f"{url}&per_page=50").get_json()
+        assert len(body["data"]) == 2
+
+    def test_get_task_calls_invalid_cursor(self, client, sample_task):
+        """测试无效游标"""
+        response = client.get(f"/api/tasks/{sample_task.id}/calls?cursor=not-a-cursor")
+
+        assert response.status_code == 400
+
+
+class TestTaskDetail:
+    """测试任务详情API"""
+
+    def test_get_task_embeds_first_page(self, app, client, sample_task, sample_calls):
+        """测试任务详情只内嵌第一页通话记录"""
+        app.config["TASK_DETAIL_CALLS_LIMIT"] = 2
+
+        response = client.get(f"/api/tasks/{sample_task.id}")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert len(data["calls"]) == 2
+        assert data["calls_pagination"]["has_more"] is True
+
+        cursor = data["calls_pagination"]["next_cursor"]
+        response = client.get(f"/api/tasks/{sample_task.id}/calls?cursor={cursor}")
+        assert len(response.get_json()["data"]) == 3
+
+    def test_get_task_fields_and_include(
+        self, client, sample_task, sample_calls, statements
+    ):
+        """测试任务详情的 fields 和 include 参数"""
+        url = f"/api/tasks/{sample_task.id}"
+
+        data = client.get(f"{url}?include=calls").get_json()["data"]
+        assert data == client.get(url).get_json()["data"]
+        assert len(data["calls"]) == 5
+
+        statements.clear()
+        response = client.get(f"{url}?fields=task_name,status&include=")
+        assert response.get_json()["data"] == {
+            "id": sample_task.id,
+            "task_name": sample_task.task_name,
+            "status": sample_task.status,
+        }
+        assert not any("FROM calls" in s and "LIMIT" in s for s in statements)
+
+        assert client.get(f"{url}?fields=secret").status_code == 400
+        assert client.get(f"{url}?include=package").status_code == 400
+        assert client.get("/api/tasks/99999?include=").status_code == 404
+
+    def test_stream_task_calls(self, app, client, sample_task, sample_calls):
+        """测试流式获取全部通话记录"""
+        app.config["CALL_STREAM_BATCH_SIZE"] = 2
+
+        response = client.get(f"/api/tasks/{sample_task.id}/calls/stream")
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        calls = [json.loads(line) for line in response.data.splitlines()]
+        assert sorted(call["id"] for call in calls) == sorted(
+            call.id for call in sample_calls
+        )
+        assert all(len(call["tags"]) == 1 for call in calls)
+
+    def test_get_task_etag(self, client, sample_task):
+        """测试任务详情的条件请求：新增通话记录后 ETag 改变"""
+        url = f"/api/tasks/{sample_task.id}"
+        etag = client.get(url).headers["ETag"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        client.post(f"{url}/calls", json={"phone_number": "13800138000"})
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.get_json()["data"]["total_calls"] == 1
+
+        assert client.get("/api/tasks/99999").status_code == 404
+
+
+class TestCallCreate:
+    """测试创建通话记录API"""
+
+    def test_create_call_updates_counters(self, client, sample_task):
+        """测试创建通话记录时增量更新任务计数器"""
+        response = client.post(
+            f"/api/tasks/{sample_task.id}/calls",
+            json={
+                "phone_number": "13800138000",
+                "duration": 60,
+                "result": "connected",
+                "tags": [{"tag_name": "interest_level", "tag_value": "high"}],
+            },
+        )
+        assert response.status_code == 201
+
+        response = client.post(
+            f"/api/tasks/{sample_task.id}/calls",
+            json={"phone_number": "13800138001", "result": "no_answer"},
+        )
+        assert response.status_code == 201
+
+        task = db.session.get(DialTask, sample_task.id)
+        assert task.total_calls == 2
+        assert task.connected_calls == 1
+        assert task.interested_calls == 1
+
+    def test_create_call_missing_phone(self, client, sample_task):
+        """测试缺少电话号码"""
+        response = client.post(f"/api/tasks/{sample_task.id}/calls", json={})
+
+        assert response.status_code == 400
+
+    def test_create_call_with_offset(self, client, sample_task):
+        """测试带时区偏移的拨打时间换算为 UTC 存储，并计入正确的业务日期"""
+        response = client.post(
+            f"/api/tasks/{sample_task.id}/calls",
+            json={"phone_number": "13800138000", "call_time": "2025-10-17T07:00+08:00"},
+        )
+        assert response.status_code == 201
+
+        call = Call.query.one()
+        assert call.call_time == datetime(2025, 10, 16, 23, 0)
+        assert call.call_time.tzinfo is None
+
+        # 10-17 20:00 UTC 即业务时区 10-18 04:00
+        client.post(
+            f"/api/tasks/{sample_task.id}/calls",
+            json={"phone_number": "13800138001", "call_time": "2025-10-17T10:00-10:00"},
+        )
+        dates = [m.date for m in DailyPackageMetrics.query.order_by("date")]
+        assert dates == [date(2025, 10, 17), date(2025, 10, 18)]
+
+        row = parse_call({"phone_number": "1", "call_time": "2025-10-16T23:00:00"})
+        assert row["call_time"] == datetime(2025, 10, 16, 23, 0)
+
+
+class TestCallBulkCreate:
+    """测试批量导入通话记录API"""
+
+    def bulk_url(self, task):
+        return f"/api/tasks/{task.id}/calls:bulk"
+
+    def test_bulk_ndjson(self, client, sample_task):
+        """测试 NDJSON 批量导入并按批更新计数器"""
+        lines = [
+            {
+                "phone_number": f"1380013800{i}",
+                "call_time": "2025-10-18T02:00:00",
+                "duration": 30,
+                "result": "connected" if i < 3 else "no_answer",
+                "tags": (
+                    [{"tag_name": "interest_level", "tag_value": "high"}]
+                    if i == 0
+                    else []
+                ),
+            }
+            for i in range(5)
+        ]
+        body = "\n".join(json.dumps(line) for line in lines) + "\n"
+
+        response = client.post(
+            self.bulk_url(sample_task),
+            data=body,
+            content_type="application/x-ndjson",
+        )
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data == {"received": 5, "inserted": 5, "failed": 0, "errors": []}
+
+        task = db.session.get(DialTask, sample_task.id)
+        assert task.total_calls == 5
+        assert task.connected_calls == 3
+        assert task.interested_calls == 1
+        assert CallTag.query.count() == 1
+
+    def test_bulk_json_array_in_chunks(self, app, client, sample_task):
+        """测试 JSON 数组分批写入，结果与逐条创建一致"""
+        app.config["CALL_BULK_CHUNK_SIZE"] = 2
+        calls = [
+            {"phone_number": f"1390013900{i}", "tags": [{"tag_name": "AS1"}]}
+            for i in range(5)
+        ]
+
+        response = client.post(self.bulk_url(sample_task), json=calls)
+
+        assert response.status_code == 200
+        assert response.get_json()["data"]["inserted"] == 5
+
+        stored = Call.query.order_by(Call.id).all()
+        assert [call.phone_number for call in stored] == [
+            call["phone_number"] for call in calls
+        ]
+        assert all(call.tags.count() == 1 for call in stored)
+        assert db.session.get(DialTask, sample_task.id).total_calls == 5
+
+    def test_bulk_reports_row_errors(self, client, sample_task):
+        """测试不合法的记录跳过并返回行号"""
+        body = "\n".join(
+            [
+                json.dumps({"phone_number": "13800138000"}),
+                json.dumps({"duration": 10}),
+                "{not json",
+                json.dumps({"phone_number": "13800138001", "duration": -1}),
+                json.dumps({"phone_number": "13800138002"}),
+            ]
+        )
+
+        response = client.post(
+            self.bulk_url(sample_task),
+            data=body,
+            content_type="application/x-ndjson",
+        )
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data["received"] == 5
+        assert data["inserted"] == 2
+        assert data["failed"] == 3
+        assert [error["index"] for error in data["errors"]] == [1, 2, 3]
+        assert data["errors"][0]["error"] == "缺少必填字段: phone_number"
+        assert Call.query.count() == 2
+
+    def test_bulk_malformed_array(self, client, sample_task):
+        """测试数组格式错误时保留已解析的记录"""
+        body = '[{"phone_number": "13800138000"}, {"phone_number": "1380'
+
+        response = client.post(
+            self.bulk_url(sample_task),
+            data=body,
+            content_type="application/json",
+        )
+
+        data = response.get_json()["data"]
+        assert data["inserted"] == 1
+        assert data["failed"] == 1
+        assert data["errors"][0]["index"] == 1
+
+    def test_bulk_write_error_not_format_error(self, client, sample_task, monkeypatch):
+        """测试写入时的 ValueError 不会被当作请求体格式错误"""
+
+        def fail(task, rows):
+            raise ValueError("boom")
+
+        monkeypatch.setattr(tasks_routes, "insert_calls", fail)
+
+        with pytest.raises(ValueError, match="boom"):
+            client.post(self.bulk_url(sample_task), json=[{"phone_number": "1"}])
+
+        assert Call.query.count() == 0
+
+    def test_bulk_all_invalid(self, client, sample_task):
+        """测试全部记录不合法"""
+        response = client.post(self.bulk_url(sample_task), json=[{}])
+
+        assert response.status_code == 400
+        assert response.get_json()["success"] is False
+
+
+class TestIngestBuffer:
+    """测试通话记录写入缓冲区（组提交）"""
+
+    @pytest.fixture
+    def buffer(self, app):
+        buffer = IngestBuffer(app, flush_interval=0.2, max_rows=100)
+        yield buffer
+        buffer.close()
+
+    def test_group_commit(self, buffer, sample_task):
+        """测试多个线程提交的记录合并为一次提交"""
+        task_id = sample_task.id
+        futures = []
+
+        def submit(i):
+            futures.append(
+                buffer.submit(
+                    task_id,
+                    parse_call(
+                        {"phone_number": f"1380013800{i}", "result": "connected"}
+                    ),
+                )
+            )
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        call_ids = [future.result(timeout=5) for future in futures]
+
+        assert len(set(call_ids)) == 10
+        assert buffer.stats["groups"] == 1
+        assert buffer.stats["rows"] == 10
+
+        db.session.expire_all()
+        task = db.session.get(DialTask, sample_task.id)
+        assert task.total_calls == 10
+        assert task.connected_calls == 10
+
+    def test_failed_group_retries_rows(self, buffer, sample_task):
+        """测试整组写入失败时逐条重试，只有出错的记录失败"""
+        good = buffer.submit(sample_task.id, parse_call({"phone_number": "1"}))
+        bad_row = parse_call({"phone_number": "2"})
+        bad_row["call_time"] = "not a datetime"
+        bad = buffer.submit(sample_task.id, bad_row)
+        missing = buffer.submit(99999, parse_call({"phone_number": "3"}))
+
+        assert good.result(timeout=5)
+        assert bad.exception(timeout=5) is not None
+        assert isinstance(missing.exception(timeout=5), LookupError)
+        assert buffer.stats["retried_groups"] == 1
+
+        db.session.expire_all()
+        assert Call.query.count() == 1
+        assert db.session.get(DialTask, sample_task.id).total_calls == 1
+
+    def test_create_call_with_buffer(self, app, client, sample_task):
+        """测试启用缓冲区时创建通话记录"""
+        app.config["INGEST_BUFFER_ENABLED"] = True
+        try:
+            response = client.post(
+                f"/api/tasks/{sample_task.id}/calls",
+                json={"phone_number": "13800138000", "result": "connected"},
+            )
+        finally:
+            app.extensions.pop("ingest_buffer").close()
+
+        assert response.status_code == 201
+        assert response.get_json()["data"]["phone_number"] == "13800138000"
+
+        db.session.expire_all()
+        assert db.session.get(DialTask, sample_task.id).connected_calls == 1
+
+    def test_cancelled_row_not_written(self, buffer, sample_task):
+        """测试写入前取消的记录不会写入"""
+        cancelled = buffer.submit(sample_task.id, parse_call({"phone_number": "1"}))
+        assert cancelled.cancel()
+        kept = buffer.submit(sample_task.id, parse_call({"phone_number": "2"}))
+
+        call_id = kept.result(timeout=5)
+
+        assert [call.id for call in Call.query.all()] == [call_id]
+        assert buffer.stats["rows"] == 1
+
+    def test_create_call_timeout_cancels_row(self, app, client, sample_task):
+        """测试等待超时返回 503，且记录不会在之后写入（重试不会重复）"""
+        app.config.update(
+            INGEST_BUFFER_ENABLED=True,
+            INGEST_BUFFER_FLUSH_INTERVAL_MS=500,
+            INGEST_BUFFER_TIMEOUT=0.01,
+        )
+        try:
+            response = client.post(
+                f"/api/tasks/{sample_task.id}/calls",
+                json={"phone_number": "13800138000"},
+            )
+        finally:
+            app.extensions.pop("ingest_buffer").close()
+
+        assert response.status_code == 503
+        assert response.get_json()["success"] is False
+        assert Call.query.count() == 0
+
+    def test_create_call_write_in_progress(self, app, client, sample_task, monkeypatch):
+        """测试记录已开始写入但迟迟没有结果时，有限等待后返回 503"""
+        app.config.update(
+            INGEST_BUFFER_ENABLED=True,
+            INGEST_BUFFER_FLUSH_INTERVAL_MS=0,
+            INGEST_BUFFER_TIMEOUT=0.05,
+        )
+        insert = ingest_buffer.insert_calls
+
+        def slow_insert(task, rows):
+            time.sleep(0.5)
+            return insert(task, rows)
+
+        monkeypatch.setattr(ingest_buffer, "insert_calls", slow_insert)
+        try:
+            response = client.post(
+                f"/api/tasks/{sample_task.id}/calls",
+                json={"phone_number": "13800138000"},
+            )
+        finally:
+            app.extensions.pop("ingest_buffer").close()
+
+        assert response.status_code == 503
+        assert "记录可能已保存" in response.get_json()["error"]
+        # 已开始的写入照常完成
+        assert Call.query.count() == 1
+
+    def test_flush_error_resolves_futures(self, buffer, sample_task, monkeypatch):
+        """测试写入线程在事务之外出错时，等待中的请求也会得到异常"""
+
+        class BrokenApp:
+            def app_context(self):
+                raise RuntimeError("no app context")
+
+        monkeypatch.setattr(buffer, "app", BrokenApp())
+
+        future = buffer.submit(sample_task.id, parse_call({"phone_number": "1"}))
+
+        assert isinstance(future.exception(timeout=5), RuntimeError)
+
+    def test_create_call_buffer_errors(self, app, client, sample_task, monkeypatch):
+        """测试缓冲区已关闭和写入失败时返回 JSON 错误"""
+        app.config["INGEST_BUFFER_ENABLED"] = True
+        url = f"/api/tasks/{sample_task.id}/calls"
+
+        def fail(task, rows):
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+        monkeypatch.setattr(ingest_buffer, "insert_calls", fail)
+        try:
+            response = client.post(url, json={"phone_number": "13800138000"})
+            assert response.status_code == 503
+            assert response.get_json()["error"] == "写入数据库失败，请重试"
+        finally:
+            app.extensions["ingest_buffer"].close()
+
+        response = client.post(url, json={"phone_number": "13800138000"})
+        app.extensions.pop("ingest_buffer")
+        assert response.status_code == 503
+        assert response.get_json()["error"] == "写入缓冲区已关闭，请重试"
+
+
+class TestTagSummaryIncremental:
+    """测试标签汇总随通话记录写入和任务删除增量更新"""
+
+    def summaries(self, client, package_id):
+        url = f"/api/packages/{package_id}?include=tag_summaries"
+        data = client.get(url).get_json()["data"]
+        return {
+            (s["tag_name"], s["tag_value"]): (s["tag_count"], s["percentage"])
+            for s in data["tag_summaries"]
+        }
+
+    def test_tag_summary_follows_writes(self, client, sample_task):
+        """测试写入标签后汇总实时更新，占比按标签总数计算"""
+        package_id = sample_task.package_id
+        client.post(
+            f"/api/tasks/{sample_task.id}/calls",
+            json={
+                "phone_number": "13800138000",
+                "tags": [
+                    {"tag_name": "AS1", "tag_value": "高意向"},
+                    {"tag_name": "AS2"},
+                ],
+            },
+        )
+        client.post(
+            f"/api/tasks/{sample_task.id}/calls:bulk",
+            json=[
+                {
+                    "phone_number": "1",
+                    "tags": [{"tag_name": "AS1", "tag_value": "高意向"}],
+                },
+                {"phone_number": "2", "tags": [{"tag_name": "AS2"}]},
+            ],
+        )
+
+        assert self.summaries(client, package_id) == {
+            ("AS1", "高意向"): (2, 0.5),
+            ("AS2", None): (2, 0.5),
+        }
+
+        # 增量结果与全量重建一致
+        PackageTagSummary.rebuild_all()
+        db.session.commit()
+        assert self.summaries(client, package_id) == {
+            ("AS1", "高意向"): (2, 0.5),
+            ("AS2", None): (2, 0.5),
+        }
+
+    def test_delete_task_removes_tags(self, client, sample_task):
+        """测试删除任务时从汇总中减去该任务的标签"""
+        package_id = sample_task.package_id
+        other = DialTask(package_id=package_id, task_name="其他任务")
+        db.session.add(other)
+        db.session.commit()
+
+        for task_id, tag_name in ((sample_task.id, "AS1"), (other.id, "AF1")):
+            client.post(
+                f"/api/tasks/{task_id}/calls",
+                json={"phone_number": "1", "tags": [{"tag_name": tag_name}]},
+            )
+
+        response = client.delete(f"/api/tasks/{sample_task.id}")
+        assert response.status_code == 200
+
+        assert self.summaries(client, package_id) == {("AF1", None): (1, 1.0)}
+        db.session.expire_all()
+        assert db.session.get(LeadPackage, package_id).tag_total == 1
+
+
+class TestTaskMetrics:
+    """测试任务指标重算API"""
+
+    def test_recalculate_metrics(self, client, sample_task):
+        """测试全量重算修复失准的计数器"""
+        db.session.add_all(
+            [
+                Call(task_id=sample_task.id, phone_number="1", result="connected"),
+                Call(task_id=sample_task.id, phone_number="2", result="busy"),
+            ]
+        )
+        sample_task.total_calls = 99
+        db.session.commit()
+
+        response = client.post(f"/api/tasks/{sample_task.id}/metrics")
+
+        assert response.status_code == 200
+        data = response.get_json()["data"]
+        assert data["total_calls"] == 2
+        assert data["connected_calls"] == 1
+        assert data["interested_calls"] == 0
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { useParams, useNavigate } from "react-router-dom";
-import apiClient from "../utils/apiClient";
+import { batchGet } from "../utils/apiClient";
 import { formatNumber, formatPercent, formatCurrency } from "../utils/formatNumber";
 import toast from "react-hot-toast";
 
@@ -20,15 +20,22 @@ const PackageDetail = () => {
     try {
       setLoading(true);
       
-      // 获取数据包详情
-      const response = await apiClient.get(`/packages/${id}`);
-      
-      if (response.success) {
-        const data = response.data;
-        setPackageData(data);
-        setDialTasks(data.dial_tasks || []);
-        setTagSummaries(data.tag_summaries || []);
+      // 数据包详情、统计（含标签汇总）和外呼任务合并为一次批量请求
+      const [packageResult, statsResult, tasksResult] = await batchGet([
+        { id: "package", path: `/packages/${id}` },
+        { id: "stats", path: `/metrics/package/${id}/stats` },
+        { id: "tasks", path: `/packages/${id}/tasks` },
+      ]);
+
+      if (packageResult.status !== 200) {
+        throw new Error(packageResult.body?.error || `HTTP ${packageResult.status}`);
       }
+
+      setPackageData(packageResult.body.data);
+      setDialTasks(tasksResult.status === 200 ? tasksResult.body.data : []);
+      setTagSummaries(
+        statsResult.status === 200 ? statsResult.body.data.tag_summaries : []
+      );
     } catch (error) {
       console.error("Failed to fetch package detail:", error);
       toast.error("加载数据失败");
@@ -105,4 +105,14 @@ export const del = (url) => {
   return apiClient.delete(url);
 };
 
+/**
+ * 批量 GET 请求（多个只读接口合并为一次往返）
+ * @param {Array<{id?: string, path: string}>} requests - 子请求，path 相对于 API 根路径，如 "/packages/1"
+ * @returns {Promise<Array>} 与 requests 顺序一致的 { id, path, status, body } 列表
+ */
+export const batchGet = async (requests) => {
+  const response = await apiClient.post("/batch", { requests });
+  return response.data;
+};
+
 export default apiClient;